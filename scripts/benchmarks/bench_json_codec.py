@@ -0,0 +1,152 @@
+"""
+Micro-benchmark for the JSON codecs in valhalla/utils/json_utils.py on synthetic, but realistically
+sized Valhalla matrix & expansion bodies. Runs without QGIS, e.g.:
+
+    python scripts/benchmarks/bench_json_codec.py --matrix-size 500 --expansion-edges 200000
+"""
+
+import argparse
+import importlib.util
+import json
+import random
+import time
+from pathlib import Path
+from typing import Callable
+
+JSON_UTILS_PATH = Path(__file__).parents[2].joinpath("valhalla", "utils", "json_utils.py")
+
+
+def load_json_utils():
+    # don't import the plugin package, that needs QGIS
+    spec = importlib.util.spec_from_file_location("json_utils", JSON_UTILS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def make_matrix(size: int) -> dict:
+    locations = [{"lon": 13 + random.random(), "lat": 52 + random.random()} for _ in range(size)]
+    return {
+        "sources": [locations],
+        "targets": [locations],
+        "sources_to_targets": [
+            [
+                {
+                    "distance": round(random.uniform(0, 100), 3),
+                    "time": random.randint(0, 10000),
+                    "from_index": i,
+                    "to_index": j,
+                }
+                for j in range(size)
+            ]
+            for i in range(size)
+        ],
+        "units": "kilometers",
+    }
+
+
+def make_expansion(edges: int) -> dict:
+    features = []
+    for _ in range(edges):
+        x, y = 13 + random.random(), 52 + random.random()
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [
+                        [round(x, 6), round(y, 6)],
+                        [round(x + 0.001, 6), round(y + 0.001, 6)],
+                    ],
+                },
+                "properties": {
+                    "duration": random.randint(0, 3600),
+                    "distance": random.randint(0, 50000),
+                },
+            }
+        )
+
+    return {"type": "FeatureCollection", "properties": {"algorithm": "dijkstras"}, "features": features}
+
+
+def best_of(fn: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def report(name: str, seconds: float, baseline: float):
+    print(f"  {name:<40} {seconds * 1000:>10.1f} ms {baseline / seconds:>8.2f}x")
+
+
+def bench_body(json_utils, label: str, body: dict, array_key: str, repeat: int):
+    raw = json.dumps(body).encode()
+    print(f"\n{label}: {len(raw) / 1024**2:.1f} MB")
+
+    print(" encode")
+    baseline = best_of(lambda: json.dumps(body).encode(), repeat)
+    report("json.dumps (previous)", baseline, baseline)
+    for name, (dumps, _) in json_utils.BACKENDS.items():
+        report(f"{name} dumps", best_of(lambda: dumps(body), repeat), baseline)
+
+    print(" decode")
+    baseline = best_of(lambda: json.loads(raw), repeat)
+    report("json.loads (previous)", baseline, baseline)
+    for name, (_, loads) in json_utils.BACKENDS.items():
+        report(f"{name} loads", best_of(lambda: loads(raw), repeat), baseline)
+    report(
+        "iter_json_array (incremental)",
+        best_of(lambda: sum(1 for _ in json_utils.iter_json_array(raw.decode(), array_key)), repeat),
+        baseline,
+    )
+
+
+def bench_options(json_utils, features: int, repeat: int):
+    params = {
+        "costing_options": {"auto": {"use_highways": 0.5, "use_tolls": 0.2, "shortest": False}},
+        "interval_type": "time",
+        "exclude_polygons": [[[13 + i / 100, 52 + i / 100] for i in range(50)]],
+    }
+    print(f"\nOPTIONS field for {features} features")
+    baseline = best_of(lambda: [json.dumps(params) for _ in range(features)], repeat)
+    report("json.dumps per feature (previous)", baseline, baseline)
+    report(
+        "dumps once", best_of(lambda: [json_utils.dumps(params).decode()] * features, repeat), baseline
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--matrix-size", type=int, default=300, help="number of sources & targets")
+    parser.add_argument("--expansion-edges", type=int, default=100000, help="number of expansion edges")
+    parser.add_argument("--repeat", type=int, default=5, help="best of how many runs")
+    args = parser.parse_args()
+
+    json_utils = load_json_utils()
+    print(f"available backends: {', '.join(json_utils.BACKENDS)}; default: {json_utils.JSON_BACKEND}")
+
+    random.seed(42)
+    bench_body(
+        json_utils,
+        f"matrix {args.matrix_size}x{args.matrix_size}",
+        make_matrix(args.matrix_size),
+        "sources_to_targets",
+        args.repeat,
+    )
+    bench_body(
+        json_utils,
+        f"expansion with {args.expansion_edges} edges",
+        make_expansion(args.expansion_edges),
+        "features",
+        args.repeat,
+    )
+    bench_options(json_utils, args.matrix_size**2, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark of the polyline6 decoding & line geometry construction for long route shapes: the
+per-vertex Python path (decode to tuples, one QgsPoint per vertex) vs. the NumPy decoder in
+valhalla/utils/polyline_utils.py feeding WKB to QgsGeometry.fromWkb(). Runs without QGIS, then
+only the decoding is compared, e.g.:
+
+    python scripts/benchmarks/bench_polyline.py --vertices 50000 200000
+"""
+
+import argparse
+import importlib.util
+import random
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+POLYLINE_UTILS_PATH = Path(__file__).parents[2].joinpath("valhalla", "utils", "polyline_utils.py")
+
+try:
+    from qgis.core import QgsGeometry, QgsLineString, QgsPoint
+except ImportError:
+    QgsGeometry = None
+
+
+def load_polyline_utils():
+    # don't import the plugin package, that needs QGIS
+    spec = importlib.util.spec_from_file_location("polyline_utils", POLYLINE_UTILS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def encode_polyline6(coords: List[Tuple[float, float]]) -> str:
+    """Encodes lon/lat coordinates like Valhalla does, i.e. in lat/lon order."""
+    chars = list()
+    prev_lat = prev_lon = 0
+    for lon, lat in coords:
+        lat, lon = round(lat * 1e6), round(lon * 1e6)
+        for delta in (lat - prev_lat, lon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chars.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            chars.append(chr(value + 63))
+        prev_lat, prev_lon = lat, lon
+
+    return "".join(chars)
+
+
+def decode_polyline6(encoded: str) -> List[Tuple[float, float]]:
+    """The per-value Python decoder, like routingpy's decode_polyline6."""
+    coords = list()
+    idx = lat = lon = 0
+    while idx < len(encoded):
+        deltas = list()
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[idx]) - 63
+                idx += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        coords.append((lon / 1e6, lat / 1e6))
+
+    return coords
+
+
+def make_route(vertices: int) -> List[Tuple[float, float]]:
+    """A random walk with street-like vertex spacing."""
+    lon, lat = 13.4, 52.5
+    coords = list()
+    for _ in range(vertices):
+        lon += random.uniform(-0.0005, 0.0005)
+        lat += random.uniform(-0.0005, 0.0005)
+        coords.append((lon, lat))
+
+    return coords
+
+
+def best_of(fn: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def report(name: str, seconds: float, baseline: float):
+    print(f"  {name:<40} {seconds * 1000:>10.1f} ms {baseline / seconds:>8.2f}x")
+
+
+def bench_route(polyline_utils, vertices: int, repeat: int):
+    encoded = encode_polyline6(make_route(vertices))
+    print(f"\nroute with {vertices} vertices, {len(encoded) / 1024:.0f} kB polyline6")
+
+    print(" decode")
+    baseline = best_of(lambda: decode_polyline6(encoded), repeat)
+    report("Python decoder (previous)", baseline, baseline)
+    report(
+        "NumPy decoder", best_of(lambda: polyline_utils.decode_polyline_array(encoded), repeat), baseline
+    )
+    report(
+        "NumPy decoder + WKB",
+        best_of(
+            lambda: polyline_utils.linestring_wkb(polyline_utils.decode_polyline_array(encoded)), repeat
+        ),
+        baseline,
+    )
+
+    if QgsGeometry is None:
+        return
+
+    def from_wkb():
+        geom = QgsGeometry()
+        geom.fromWkb(polyline_utils.linestring_wkb(polyline_utils.decode_polyline_array(encoded)))
+        return geom
+
+    print(" decode + geometry")
+    baseline = best_of(
+        lambda: QgsGeometry(QgsLineString([QgsPoint(*c) for c in decode_polyline6(encoded)])), repeat
+    )
+    report("QgsPoint per vertex (previous)", baseline, baseline)
+    report("QgsGeometry.fromWkb", best_of(from_wkb, repeat), baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument(
+        "--vertices", type=int, nargs="+", default=[10000, 50000, 200000], help="route lengths"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="best of how many runs")
+    args = parser.parse_args()
+
+    polyline_utils = load_polyline_utils()
+    if QgsGeometry is None:
+        print("QGIS isn't available, only the decoding is compared")
+
+    random.seed(42)
+    for vertices in args.vertices:
+        bench_route(polyline_utils, vertices, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
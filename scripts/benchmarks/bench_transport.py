@@ -0,0 +1,140 @@
+"""
+Benchmark of the connection handling for many small /route requests against a local stand-in
+server, i.e. a new connection per request (keep-alive off) vs. reused connections (keep-alive on).
+Pass a certificate to compare over TLS, where the handshakes make the difference a lot bigger, e.g.:
+
+    openssl req -x509 -newkey rsa:2048 -nodes -subj /CN=localhost -keyout key.pem -out cert.pem
+    python scripts/benchmarks/bench_transport.py --requests 2000 --certfile cert.pem --keyfile key.pem
+
+It runs without QGIS and uses the standard library's HTTP/1.1 client, so HTTP/2 isn't covered; Qt
+negotiates it with HTTPS servers supporting it, when the provider's "Use HTTP/2" is checked.
+"""
+
+import argparse
+import http.client
+import json
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+ROUTE_REQUEST = json.dumps(
+    {
+        "locations": [{"lon": 13.38, "lat": 52.51}, {"lon": 13.41, "lat": 52.52}],
+        "costing": "auto",
+        "directions_type": "none",
+    }
+).encode()
+ROUTE_RESPONSE = json.dumps(
+    {
+        "trip": {
+            "locations": [{"lon": 13.38, "lat": 52.51}, {"lon": 13.41, "lat": 52.52}],
+            "legs": [{"shape": "ouvdaBqjxnXqAgBoCsEwBoF", "summary": {"length": 2.5, "time": 300}}],
+            "summary": {"length": 2.5, "time": 300},
+            "status": 0,
+            "units": "kilometers",
+        }
+    }
+).encode()
+
+
+class RouteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # else every connection is closed after the response
+    disable_nagle_algorithm = True  # else the body waits for the ACK of the headers
+    server_delay = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server_delay:
+            time.sleep(self.server_delay)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(ROUTE_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(ROUTE_RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(certfile: Optional[str], keyfile: Optional[str]) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RouteHandler)
+    server.daemon_threads = True
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def make_connection_factory(port: int, tls: bool) -> Callable[[], http.client.HTTPConnection]:
+    if not tls:
+        return lambda: http.client.HTTPConnection("127.0.0.1", port)
+
+    context = ssl.create_default_context()
+    # the stand-in server's certificate is self-signed
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+
+    return lambda: http.client.HTTPSConnection("127.0.0.1", port, context=context)
+
+
+def run(new_connection: Callable, requests: int, threads: int, keep_alive: bool) -> float:
+    """Sends ``requests`` /route requests from ``threads`` threads and returns the requests/sec."""
+    local = threading.local()
+
+    def send(_):
+        conn = getattr(local, "conn", None) if keep_alive else None
+        if conn is None:
+            conn = local.conn = new_connection()
+        headers = {"Content-Type": "application/json"}
+        if not keep_alive:
+            headers["Connection"] = "close"
+        conn.request("POST", "/route", body=ROUTE_REQUEST, headers=headers)
+        response = conn.getresponse()
+        json.loads(response.read())
+        if not keep_alive:
+            conn.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(send, range(requests)))
+
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="number of /route requests")
+    parser.add_argument(
+        "--threads", type=int, nargs="+", default=[1, 8], help="parallel requests, i.e. the pool size"
+    )
+    parser.add_argument("--server-delay", type=float, default=0, help="server time per request in ms")
+    parser.add_argument("--certfile", help="serve HTTPS with this certificate")
+    parser.add_argument("--keyfile", help="the certificate's private key")
+    args = parser.parse_args()
+
+    RouteHandler.server_delay = args.server_delay / 1000
+    server = start_server(args.certfile, args.keyfile)
+    tls = bool(args.certfile)
+    new_connection = make_connection_factory(server.server_address[1], tls)
+    print(f"{args.requests} small /route requests over {'HTTPS' if tls else 'HTTP'}/1.1")
+
+    try:
+        for threads in args.threads:
+            baseline = run(new_connection, args.requests, threads, keep_alive=False)
+            reused = run(new_connection, args.requests, threads, keep_alive=True)
+            print(f" {threads} thread(s)")
+            print(f"  {'new connection per request':<30} {baseline:>10.0f} req/s {1:>8.2f}x")
+            print(f"  {'keep-alive':<30} {reused:>10.0f} req/s {reused / baseline:>8.2f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
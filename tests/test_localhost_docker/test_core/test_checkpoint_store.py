@@ -0,0 +1,72 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from qgis.core import QgsFeature, QgsField, QgsFields, QgsGeometry, QgsPointXY
+from qgis.PyQt.QtCore import QVariant
+
+from valhalla.core.checkpoint_store import CheckpointStore
+
+from ... import LocalhostDockerTestCase
+
+
+class TestCheckpointStore(LocalhostDockerTestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.path = Path(self.temp_dir.name).joinpath("checkpoints.sqlite")
+        self.store = CheckpointStore(self.path, CheckpointStore.make_run_key("alg", {"a": 1}))
+
+        self.fields = QgsFields()
+        self.fields.append(QgsField("duration", QVariant.Double))
+        self.fields.append(QgsField("options", QVariant.String))
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def make_feature(self, x: float, duration: float) -> QgsFeature:
+        feature = QgsFeature(self.fields)
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, 1)))
+        feature.setAttributes([duration, None])
+
+        return feature
+
+    def test_run_key(self):
+        self.assertEqual(
+            CheckpointStore.make_run_key("alg", {"a": 1, "b": "x"}),
+            CheckpointStore.make_run_key("alg", {"b": "x", "a": 1}),
+        )
+        self.assertNotEqual(
+            CheckpointStore.make_run_key("alg", {"a": 1}), CheckpointStore.make_run_key("alg", {"a": 2})
+        )
+
+    def test_resume(self):
+        self.store.add(("a", 1), 0, [self.make_feature(1, 10), self.make_feature(2, 20)])
+        self.store.add(5, 1, [])
+        self.assertEqual(
+            self.store.completed(),
+            {CheckpointStore.make_job_key(("a", 1)), CheckpointStore.make_job_key(5)},
+        )
+
+        # another run's jobs aren't mixed in
+        other = CheckpointStore(self.path, CheckpointStore.make_run_key("alg", {"a": 2}))
+        self.assertEqual(other.completed(), set())
+        other.close()
+
+        results = list(self.store.iter_results(self.fields))
+        self.assertEqual([key for key, _ in results], [("a", 1), 5])
+        features = results[0][1]
+        self.assertEqual([f["duration"] for f in features], [10, 20])
+        self.assertEqual(features[1].geometry().asPoint(), QgsPointXY(2, 1))
+
+        self.store.clear()
+        self.assertEqual(self.store.completed(), set())
+
+    def test_resume_across_runs(self):
+        # the 1st run skips the failed job at position 1, the 2nd run completes it but fails
+        # another job, so the 3rd run reads them in the order of the jobs, not of the runs
+        for position in (0, 2, 3, 4, 5, 1):
+            self.store.add(("id", position), position, [self.make_feature(position, position)])
+
+        results = list(self.store.iter_results(self.fields))
+        self.assertEqual([key for key, _ in results], [("id", position) for position in range(6)])
+        self.assertEqual([features[0]["duration"] for _, features in results], list(range(6)))
@@ -0,0 +1,71 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from valhalla.core.matrix_export import NPY_FILES, MatrixArrayWriter, get_matrix_writer
+from valhalla.core.matrix_result import MatrixResult
+from valhalla.global_definitions import MatrixArrayFormat
+
+from ... import LocalhostDockerTestCase
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+MATRIX = MatrixResult(
+    np.array([[0, 120], [100, np.nan], [30, 60]]), np.array([[0, 1500], [1234, np.nan], [300, 600]])
+)
+SOURCE_IDS = ["a", "b", "c"]
+TARGET_IDS = [10, 20]
+
+
+class TestMatrixExport(LocalhostDockerTestCase):
+    def write(self, array_format: MatrixArrayFormat, folder: str):
+        writer = get_matrix_writer(array_format, Path(folder), SOURCE_IDS, TARGET_IDS)
+        # two block rows
+        writer.write_rows(range(0, 2), MatrixResult(MATRIX.durations[:2], MATRIX.distances[:2]))
+        writer.write_rows(range(2, 3), MatrixResult(MATRIX.durations[2:], MATRIX.distances[2:]))
+
+        return writer.close()
+
+    def test_npy(self):
+        with tempfile.TemporaryDirectory() as folder:
+            self.write(MatrixArrayFormat.NPY, folder)
+
+            arrays = {
+                name: np.load(Path(folder, file_name), mmap_mode="r")
+                for name, file_name in NPY_FILES.items()
+            }
+            self.assertEqual(arrays["sources"].tolist(), SOURCE_IDS)
+            self.assertEqual(arrays["targets"].tolist(), TARGET_IDS)
+            np.testing.assert_array_equal(arrays["durations"], MATRIX.durations)
+            np.testing.assert_array_equal(arrays["distances"], MATRIX.distances)
+            del arrays
+
+    @unittest.skipIf(pq is None, "pyarrow isn't installed")
+    def test_parquet(self):
+        with tempfile.TemporaryDirectory() as folder:
+            (path,) = self.write(MatrixArrayFormat.PARQUET, folder)
+            table = pq.read_table(path).to_pydict()
+
+        self.assertEqual(table["source"], ["a", "a", "b", "b", "c", "c"])
+        self.assertEqual(table["target"], [10, 20] * 3)
+        self.assertEqual(table["duration"], [0, 120, 100, None, 30, 60])
+        self.assertEqual(table["distance"][2], 1234)
+
+    def test_incomplete_writer(self):
+        class Incomplete(MatrixArrayWriter):
+            def write_rows(self, rows, matrix):
+                pass
+
+        with tempfile.TemporaryDirectory() as folder, self.assertRaises(TypeError):
+            Incomplete(Path(folder), SOURCE_IDS, TARGET_IDS)
+
+    def test_iter_wide_rows(self):
+        rows = list(MATRIX.iter_wide_rows(SOURCE_IDS))
+        self.assertEqual(rows[1], ("b", [100, None], [1234, None]))
+        with self.assertRaises(ValueError):
+            next(MATRIX.iter_wide_rows(["a"]))
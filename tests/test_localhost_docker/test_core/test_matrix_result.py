@@ -0,0 +1,80 @@
+import json
+
+from valhalla.core.matrix_result import MatrixResult, plan_blocks
+
+from ... import LocalhostDockerTestCase
+
+RESPONSE = json.dumps(
+    {
+        "sources_to_targets": [
+            [{"time": 0, "distance": 0.0}, {"time": 120, "distance": 1.5}],
+            [{"time": 100, "distance": 1.2345}, {"time": None, "distance": None}],
+            [{"time": 30, "distance": 0.3}, {"time": 60, "distance": 0.6}],
+        ],
+        "units": "kilometers",
+    }
+).encode()
+
+
+class TestMatrixResult(LocalhostDockerTestCase):
+    def test_from_json(self):
+        matrix = MatrixResult.from_json(RESPONSE)
+        self.assertEqual((matrix.sources, matrix.targets), (3, 2))
+        self.assertEqual(len(matrix), 6)
+        self.assertEqual(matrix.durations[0, 1], 120)
+        self.assertEqual(matrix.distances[1, 0], 1234)
+
+        self.assertEqual(len(MatrixResult.from_json(b"")), 0)
+
+    def test_iter_rows(self):
+        matrix = MatrixResult.from_json(RESPONSE)
+        batches = list(matrix.iter_rows(["a", "b", "c"], batch_size=4))
+        self.assertEqual([len(b) for b in batches], [4, 2])
+
+        rows = [row for batch in batches for row in batch]
+        self.assertEqual(rows[1], ("a", 1, 120, 1500))
+        self.assertEqual(rows[3], ("b", 1, None, None))
+
+        with self.assertRaises(ValueError):
+            next(matrix.iter_rows(["a"]))
+
+    def test_plan_blocks(self):
+        blocks = plan_blocks(20000, 20000, 2500)
+        self.assertEqual(len(blocks), 400 * 400)
+        self.assertEqual(blocks[1], (range(0, 50), range(50, 100)))
+        self.assertEqual(blocks[400].sources, range(50, 100))
+
+        # the remaining pairs go to the longer side, every cell is covered exactly once
+        for args in (
+            (3, 20000, 2500),
+            (1001, 7, 100),
+            (5, 5, 2500),
+            (10, 10, 30, 3),
+            (10, 10, 30, 0, 4),
+        ):
+            blocks = plan_blocks(*args)
+            self.assertTrue(all(len(b.sources) * len(b.targets) <= args[2] for b in blocks))
+            cells = [(s, t) for b in blocks for s in b.sources for t in b.targets]
+            self.assertEqual(sorted(cells), [(s, t) for s in range(args[0]) for t in range(args[1])])
+        self.assertEqual(len(plan_blocks(3, 20000, 2500)), 25)
+
+        self.assertEqual(plan_blocks(0, 10, 2500), [])
+
+    def test_concatenate(self):
+        matrix = MatrixResult.from_json(RESPONSE)
+        row = MatrixResult.concatenate([matrix, MatrixResult.unreachable(3, 4)])
+        self.assertEqual((row.sources, row.targets), (3, 6))
+        self.assertEqual(list(row.iter_rows())[0][5], (0, 5, None, None))
+
+    def test_nearest_targets(self):
+        matrix = MatrixResult.from_json(RESPONSE)
+        self.assertEqual(matrix.nearest_targets(1), [[0], [0], [0]])
+        # unreachable targets are dropped
+        self.assertEqual(matrix.nearest_targets(), [[0, 1], [0], [0, 1]])
+        self.assertEqual(matrix.nearest_targets(max_cost=50), [[0], [], [0]])
+        self.assertEqual(matrix.nearest_targets(max_cost=1000, by_distance=True), [[0], [], [0, 1]])
+
+    def test_repeat(self):
+        matrix = MatrixResult.from_json(RESPONSE).repeat([1, 0, 2], [2, 1])
+        self.assertEqual((matrix.sources, matrix.targets), (3, 3))
+        self.assertEqual(matrix.durations.tolist(), [[0, 0, 120], [30, 30, 60], [30, 30, 60]])
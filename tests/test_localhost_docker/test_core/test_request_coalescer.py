@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from valhalla.core.http.request_coalescer import RequestCoalescer
+
+from ... import LocalhostDockerTestCase
+
+
+class TestRequestCoalescer(LocalhostDockerTestCase):
+    def test_in_flight(self):
+        coalescer = RequestCoalescer()
+        release = threading.Event()
+        calls = list()
+
+        def request(value):
+            calls.append(value)
+            release.wait()
+            return value
+
+        with ThreadPoolExecutor(2) as executor:
+            futures = [coalescer.submit("a", lambda: executor.submit(request, 1)) for _ in range(5)]
+            other = coalescer.submit("b", lambda: executor.submit(request, 2))
+            release.set()
+
+            self.assertEqual([f.result() for f in futures], [1] * 5)
+            self.assertEqual(other.result(), 2)
+
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertEqual(coalescer.coalesced, 4)
+
+    def test_recent(self):
+        coalescer = RequestCoalescer(max_recent=1)
+
+        def done(value) -> Future:
+            future = Future()
+            future.set_result(value)
+            return future
+
+        self.assertEqual(coalescer.submit("a", lambda: done(1)).result(), 1)
+        self.assertEqual(coalescer.submit("a", lambda: done(2)).result(), 1)
+
+        # "a" is evicted by "b"
+        coalescer.submit("b", lambda: done(3))
+        self.assertEqual(coalescer.submit("a", lambda: done(4)).result(), 4)
+
+        # failed requests are tried again
+        failed = Future()
+        failed.set_exception(RuntimeError())
+        coalescer.submit("c", lambda: failed)
+        self.assertEqual(coalescer.submit("c", lambda: done(5)).result(), 5)
+
+        coalescer.clear()
+        self.assertEqual(coalescer.submit("c", lambda: done(6)).result(), 6)
+
+    def test_not_kept(self):
+        coalescer = RequestCoalescer()
+        for value in (1, 2):
+            future = Future()
+            future.set_result(value)
+            self.assertEqual(coalescer.submit("a", lambda: future, keep=False).result(), value)
+        self.assertEqual(coalescer.coalesced, 0)
+
+    def test_ttl(self):
+        coalescer = RequestCoalescer(ttl=-1)
+        for value in (1, 2):
+            future = Future()
+            future.set_result(value)
+            self.assertEqual(coalescer.submit("a", lambda: future).result(), value)
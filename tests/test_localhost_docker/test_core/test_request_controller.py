@@ -0,0 +1,70 @@
+from valhalla.core.http.request_controller import (
+    BACKOFF_MAX,
+    RequestController,
+    is_retriable,
+    parse_retry_after,
+)
+from valhalla.third_party.routingpy.routingpy import exceptions
+
+from ... import LocalhostDockerTestCase
+
+
+class TestRequestController(LocalhostDockerTestCase):
+    def test_aimd(self):
+        controller = RequestController(8)
+        self.assertEqual(controller.limit, 8)
+
+        controller.on_failure()
+        self.assertEqual(controller.limit, 4)
+        for _ in range(3):
+            controller.on_failure()
+        self.assertEqual(controller.limit, 1)
+
+        # additive increase, but never above the maximum
+        for _ in range(100):
+            controller.on_success(0.1)
+        self.assertEqual(controller.limit, 8)
+
+    def test_latency_decrease(self):
+        controller = RequestController(8)
+        for _ in range(10):
+            controller.on_success(0.1)
+        for _ in range(20):
+            controller.on_success(5)
+        self.assertLess(controller.limit, 8)
+
+    def test_latency_per_endpoint(self):
+        # fast health checks don't make the slower endpoints look congested
+        controller = RequestController(8)
+        for _ in range(100):
+            controller.on_success(0.01, "/status")
+            controller.on_success(2, "/isochrone")
+        self.assertEqual(controller.limit, 8)
+
+    def test_latency_baseline_drift(self):
+        # a lasting slowdown becomes the new baseline, the limit recovers
+        controller = RequestController(8)
+        for _ in range(10):
+            controller.on_success(0.1, "/matrix")
+        for _ in range(20):
+            controller.on_success(5, "/matrix")
+        self.assertLess(controller.limit, 8)
+        for _ in range(500):
+            controller.on_success(5, "/matrix")
+        self.assertEqual(controller.limit, 8)
+
+    def test_backoff(self):
+        self.assertEqual(RequestController.backoff(3, retry_after=7), 7)
+        for attempt in range(20):
+            self.assertLessEqual(RequestController.backoff(attempt), BACKOFF_MAX)
+
+    def test_retry_after(self):
+        self.assertEqual(parse_retry_after("12"), 12)
+        self.assertIsNone(parse_retry_after(""))
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+
+    def test_is_retriable(self):
+        self.assertTrue(is_retriable(exceptions.OverQueryLimit(429, "")))
+        self.assertTrue(is_retriable(exceptions.RouterServerError(503, "")))
+        self.assertFalse(is_retriable(exceptions.RouterServerError(500, "")))
+        self.assertFalse(is_retriable(exceptions.RouterApiError(400, "")))
@@ -0,0 +1,74 @@
+import csv
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from valhalla.core.http.request_stats import (
+    HISTOGRAM_BOUNDS,
+    RECORD_FIELDS,
+    RequestStats,
+    get_request_context,
+    percentile,
+    request_context,
+)
+
+from ... import URL, LocalhostDockerTestCase
+
+
+class TestRequestStats(LocalhostDockerTestCase):
+    def test_summary(self):
+        stats = RequestStats()
+        for ms in range(1, 101):
+            stats.record(URL, "isochrones", status=200, round_trip=ms / 1000, bytes_in=1024)
+        stats.record(URL, "isochrones", features=3, build=0.5)
+
+        summary = {row["metric"]: row for row in stats.summary()}
+        self.assertEqual(set(summary), {"round_trip", "bytes_in", "build"})
+        self.assertEqual(summary["round_trip"]["count"], 100)
+        self.assertAlmostEqual(summary["round_trip"]["p50"], 0.0505)
+        self.assertAlmostEqual(summary["round_trip"]["max"], 0.1)
+        self.assertEqual(summary["build"]["count"], 1)
+
+        histogram = dict(stats.histogram(URL, "isochrones", "round_trip"))
+        self.assertEqual(sum(histogram.values()), 100)
+        self.assertEqual(histogram[HISTOGRAM_BOUNDS[0]], 1)
+
+        with self.assertRaises(ValueError):
+            stats.record(URL, "isochrones", foo=1)
+        with self.assertRaises(ValueError):
+            stats.histogram(URL, "isochrones", "bytes_in")
+
+    def test_export(self):
+        stats = RequestStats()
+        stats.record(URL, "route", status=200, round_trip=0.1, bytes_out=10)
+        stats.record(URL, "route", features=1, build=0.01)
+
+        with TemporaryDirectory() as tmp_dir:
+            csv_path = Path(tmp_dir, "stats.csv")
+            stats.to_csv(csv_path)
+            with open(csv_path) as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(tuple(rows[0]), RECORD_FIELDS)
+            self.assertEqual(len(rows), 2)
+            self.assertEqual(rows[0]["bytes_out"], "10")
+
+            json_path = Path(tmp_dir, "stats.json")
+            stats.to_json(json_path)
+            with open(json_path) as f:
+                exported = json.load(f)
+            self.assertEqual(len(exported["records"]), 2)
+            self.assertEqual(len(exported["summary"]), 3)
+
+        stats.clear()
+        self.assertEqual(stats.records(), [])
+
+    def test_request_context(self):
+        self.assertEqual(get_request_context("endpoint", "/route"), "/route")
+        with request_context(endpoint="directions"):
+            self.assertEqual(get_request_context("endpoint"), "directions")
+        self.assertIsNone(get_request_context("endpoint"))
+
+    def test_percentile(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 0), 1)
+        self.assertEqual(percentile([1, 2, 3, 4], 100), 4)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2.5)
@@ -0,0 +1,51 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from valhalla.core.http.response_cache import ResponseCache
+
+from ... import URL, LocalhostDockerTestCase
+
+
+class TestResponseCache(LocalhostDockerTestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.cache = ResponseCache(Path(self.temp_dir.name).joinpath("cache.sqlite"), max_size=1024)
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_key_is_canonical(self):
+        key_1 = ResponseCache.make_key(URL, "/route", {}, {"a": 1, "b": [1, 2]})
+        key_2 = ResponseCache.make_key(URL + "/", "route", None, {"b": [1, 2], "a": 1})
+        self.assertEqual(key_1, key_2)
+        self.assertNotEqual(key_1, ResponseCache.make_key(URL, "/route", {}, {"a": 2, "b": [1, 2]}))
+
+    def test_hit_miss(self):
+        key = ResponseCache.make_key(URL, "/route", {}, {"a": 1})
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, URL, {"trip": {"legs": []}})
+        self.assertEqual(self.cache.get(key), {"trip": {"legs": []}})
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_lru_eviction(self):
+        keys = [ResponseCache.make_key(URL, "/route", {}, {"a": i}) for i in range(3)]
+        for key in keys:
+            self.cache.put(key, URL, "x" * 400)
+        # the oldest entry had to go
+        self.assertLessEqual(self.cache.size, 1024)
+        self.assertIsNone(self.cache.get(keys[0]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+    def test_invalidation(self):
+        key = ResponseCache.make_key(URL, "/route", {}, {"a": 1})
+        self.cache.validate(URL, 1)
+        self.cache.put(key, URL, {"foo": "bar"})
+
+        self.cache.validate(URL, 1)
+        self.assertIsNotNone(self.cache.get(key))
+
+        self.cache.validate(URL, 2)
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(self.cache.size, 0)
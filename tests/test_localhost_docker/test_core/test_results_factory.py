@@ -1,3 +1,7 @@
+import unittest
+from unittest import mock
+
+import numpy as np
 from qgis.core import QgsWkbTypes
 
 from ... import LocalhostDockerTestCase
@@ -5,13 +9,24 @@ from ...utilities import get_qgis_app
 
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 
+from valhalla.core.http.router_client import RouterClient
 from valhalla.core.results_factory import ResultsFactory
+from valhalla.core.settings import ProviderSetting
 from valhalla.global_definitions import (
+    FieldNames,
+    LoadBalancing,
+    OptionsStorage,
+    ResponseFormat,
     RouterEndpoint,
     RouterMethod,
     RouterProfile,
     RouterType,
 )
+from valhalla.utils.pbf_utils import PBF_AVAILABLE
+from valhalla.utils.polyline_utils import encode_polyline_array
+
+from ... import URL
+from ...constants import WAYPOINTS_4326
 
 
 class TestResultsFactory(LocalhostDockerTestCase):
@@ -44,3 +59,170 @@ class TestResultsFactory(LocalhostDockerTestCase):
         factory_with_url.profile = RouterProfile.BIKE
 
         self.assertTrue(factory_with_url.url, url)
+
+    def test_get_results_many(self):
+        """Checks that concurrent requests hand back every job's key in both orders."""
+        factory = ResultsFactory(
+            RouterType.VALHALLA,
+            RouterMethod.REMOTE,
+            RouterProfile.CAR,
+            url=URL,
+            max_concurrent_requests=2,
+        )
+        jobs = [(idx, coords) for idx, coords in enumerate(WAYPOINTS_4326)]
+        params = {"intervals": [100], "polygons": True}
+
+        ordered = list(factory.get_results_many(RouterEndpoint.ISOCHRONES, jobs, params))
+        self.assertEqual([key for key, _ in ordered], list(range(len(WAYPOINTS_4326))))
+        for _, feats in ordered:
+            self.assertEqual(len(feats), 1)
+
+        unordered = factory.get_results_many(RouterEndpoint.ISOCHRONES, jobs, params, ordered=False)
+        self.assertEqual(sorted(key for key, _ in unordered), list(range(len(WAYPOINTS_4326))))
+
+    def test_provider_group(self):
+        """Checks that a group of providers fails over to the healthy one and takes turns."""
+        dead_url = "http://localhost:1"
+        providers = [
+            ProviderSetting("dead", dead_url, "", ""),
+            ProviderSetting("localhost", URL, "", ""),
+        ]
+        factory = ResultsFactory(
+            RouterType.VALHALLA,
+            RouterMethod.REMOTE,
+            RouterProfile.CAR,
+            url=dead_url,
+            providers=providers,
+        )
+        params = {"intervals": [100], "polygons": True}
+
+        feats = list(factory.get_results(RouterEndpoint.ISOCHRONES, WAYPOINTS_4326, params))
+        self.assertEqual(len(feats), len(WAYPOINTS_4326))
+
+        # the failed one is tried last
+        client = factory.router.client
+        self.assertEqual(client.candidates()[-1].base_url, dead_url)
+
+        # the healthy ones take turns
+        client.members[0] = RouterClient(URL)
+        self.assertEqual(client.balancing, LoadBalancing.ROUND_ROBIN)
+        first, second = (client.candidates()[0] for _ in range(2))
+        self.assertIsNot(first, second)
+
+    def test_provider_group_busy_member(self):
+        """Checks that a group member doesn't get more requests than its own pool allows."""
+        providers = [
+            ProviderSetting("slow", URL, "", "", max_concurrent_requests=1),
+            ProviderSetting("fast", URL, "", "", max_concurrent_requests=2),
+        ]
+        factory = ResultsFactory(
+            RouterType.VALHALLA, RouterMethod.REMOTE, RouterProfile.CAR, url=URL, providers=providers
+        )
+        client = factory.router.client
+        slow, fast = client.members
+        self.assertEqual(client.max_concurrent_requests, 3)
+
+        # the slow one is busy, so the next requests go to the fast one, even if it's tried last
+        self.assertIs(client._acquire([slow, fast]), slow)
+        self.assertIs(client._acquire([slow, fast]), fast)
+        self.assertIs(client._acquire([slow, fast]), fast)
+
+        client._release(slow)
+        self.assertIs(client._acquire([slow, fast]), slow)
+        for member in (slow, fast, fast):
+            client._release(member)
+
+    @unittest.skipUnless(PBF_AVAILABLE, "needs the protobuf package")
+    def test_pbf_response_format(self):
+        """Checks that protobuf responses result in the same features as JSON responses."""
+        factories = [
+            ResultsFactory(
+                RouterType.VALHALLA,
+                RouterMethod.REMOTE,
+                RouterProfile.CAR,
+                url=URL,
+                response_format=response_format,
+            )
+            for response_format in ResponseFormat
+        ]
+        for endpoint, params in (
+            (RouterEndpoint.DIRECTIONS, dict()),
+            (RouterEndpoint.MATRIX, dict()),
+            (RouterEndpoint.ISOCHRONES, {"intervals": [100], "polygons": True}),
+        ):
+            json_feats, pbf_feats = (
+                list(factory.get_results(endpoint, WAYPOINTS_4326, params)) for factory in factories
+            )
+            self.assertEqual(len(json_feats), len(pbf_feats))
+            for json_feat, pbf_feat in zip(json_feats, pbf_feats):
+                for field in (FieldNames.DURATION, FieldNames.DISTANCE, FieldNames.CONTOUR):
+                    if json_feat.fieldNameIndex(field) >= 0:
+                        self.assertAlmostEqual(json_feat[field], pbf_feat[field], delta=1)
+
+    def test_options_id(self):
+        """Checks that the features only hold the options' ID, the options are kept once per run."""
+        factory = ResultsFactory(
+            RouterType.VALHALLA,
+            RouterMethod.REMOTE,
+            RouterProfile.CAR,
+            url=URL,
+            options_storage=OptionsStorage.OPTIONS_ID,
+        )
+        params = {"costing_options": {"auto": {"shortest": True}}}
+        feats = list(factory.get_results(RouterEndpoint.MATRIX, WAYPOINTS_4326, params))
+        feats += list(factory.get_results(RouterEndpoint.DIRECTIONS, WAYPOINTS_4326, params))
+
+        self.assertEqual(len(factory.run_options), 1)
+        options_id, options = next(iter(factory.run_options.items()))
+        self.assertEqual(options, ResultsFactory.serialize_options(params))
+        self.assertTrue(all(feat[FieldNames.OPTIONS] == options_id for feat in feats))
+
+    def test_get_snap_groups(self):
+        """Checks that duplicate locations snap to the same place, also across /locate batches."""
+        factory = ResultsFactory(RouterType.VALHALLA, RouterMethod.REMOTE, RouterProfile.CAR, url=URL)
+        locations = [*WAYPOINTS_4326, WAYPOINTS_4326[0], WAYPOINTS_4326[2]]
+
+        self.assertEqual(len(factory.locate(locations, batch_size=2)), len(locations))
+        self.assertEqual(factory.get_snap_groups(locations), [[0, 3], [1], [2, 4]])
+
+    def test_skip_failures(self):
+        """Checks that failed jobs are handed to the error callback instead of raising."""
+        factory = ResultsFactory(RouterType.VALHALLA, RouterMethod.REMOTE, RouterProfile.CAR, url=URL)
+        # the middle one is far outside of the graph
+        jobs = [(0, WAYPOINTS_4326[0]), (1, [0.0, 0.0]), (2, WAYPOINTS_4326[1])]
+        params = {"intervals": [100], "polygons": True}
+
+        failures = list()
+        results = factory.get_results_many(
+            RouterEndpoint.ISOCHRONES, jobs, params, on_error=lambda key, e: failures.append(key)
+        )
+        self.assertEqual([key for key, _ in results], [0, 2])
+        self.assertEqual(failures, [1])
+
+    def test_mapmatch_windows_alternates(self):
+        """Checks that only the trips of a long trace's windows are stitched, not the alternates."""
+        factory = ResultsFactory(RouterType.VALHALLA, RouterMethod.REMOTE, RouterProfile.CAR, url=URL)
+        trace = np.column_stack((np.linspace(13, 13.1, 100), np.full(100, 52.5)))
+
+        def trip(coords) -> dict:
+            summary = {"time": 10, "length": 1}
+            return {"legs": [{"shape": encode_polyline_array(coords)}], "summary": summary}
+
+        def iter_responses(endpoint, jobs, params, on_error=None):
+            # the windows match the trace itself, the alternate is 1 km further north
+            for job_key, coords in jobs:
+                alternate = np.asarray(coords) + (0, 0.01)
+                yield job_key, {"trip": trip(coords), "alternates": [{"trip": trip(alternate)}]}
+
+        with mock.patch.object(factory, "iter_responses", iter_responses):
+            results = list(factory.get_mapmatch_results([(0, trace)], {}, max_points=40, overlap=10))
+
+        features = [feat for _, feats in results for feat in feats]
+        trips = [feat for feat in features if feat.geometry().boundingBox().yMaximum() < 52.505]
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(features), 4)
+        # one trip along the whole trace & every window's alternate on its own
+        self.assertEqual(len(trips), 1)
+        line = trips[0].geometry().constGet()
+        self.assertAlmostEqual(line.startPoint().x(), 13, places=6)
+        self.assertAlmostEqual(line.endPoint().x(), 13.1, places=6)
@@ -14,6 +14,7 @@ from valhalla.global_definitions import (
     RouterMethod,
     RoutingMetric,
 )
+from valhalla.processing.processing_definitions import MergeStrategy
 from valhalla.processing.routing.valhalla.directions import ValhallaDirectionsPedestrian
 
 
@@ -120,3 +121,22 @@ class TestValhallaDirections(ProcessingBase):
         feats, _ = self.run_routing_algorithm(alg, params)
 
         self.assertEqual(len(feats), 1)
+
+    def test_join_pairs(self):
+        features_1 = [(1, [0, 0]), (2, [1, 1]), (3, [2, 2])]
+        features_2 = [(3, [5, 5]), (1, [3, 3]), (1, [4, 4])]
+
+        count, pairs = ValhallaDirectionsPedestrian.get_join_pairs(
+            MergeStrategy.ROW_BY_ROW, features_1, features_2
+        )
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            list(pairs),
+            [((1, 1), [[0, 0], [3, 3]]), ((1, 1), [[0, 0], [4, 4]]), ((3, 3), [[2, 2], [5, 5]])],
+        )
+
+        count, pairs = ValhallaDirectionsPedestrian.get_join_pairs(
+            MergeStrategy.ALL_BY_ALL, features_1, features_2
+        )
+        self.assertEqual(count, 9)
+        self.assertEqual([key for key, _ in pairs][:3], [(1, 3), (1, 1), (1, 1)])
@@ -1,4 +1,11 @@
-from qgis.core import QgsWkbTypes
+from qgis.core import (
+    QgsFeature,
+    QgsGeometry,
+    QgsLineString,
+    QgsPoint,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
 
 from ....utilities import get_qgis_app
 from ...test_processing.processing_base import ProcessingBase
@@ -19,3 +26,69 @@ class TestValhallaHeight(ProcessingBase):
         self.assertEqual(len(feats), self.layer_1.featureCount())
         for feat in feats:
             QgsWkbTypes.hasZ(feat.geometry().wkbType())
+
+    def test_batches(self):
+        params = {"INPUT_LAYER_1": self.layer_1, "INPUT_PROVIDER": 1, "INPUT_BATCH_SIZE": 2}
+
+        alg = ValhallaElevation()
+        feats, _ = self.run_routing_algorithm(alg, params)
+
+        # the batches' points come back in the order of the input
+        self.assertEqual([f["id"] for f in feats], [f.id() for f in self.layer_1.getFeatures()])
+
+    def test_points_z(self):
+        # 3D points have their own z, which mustn't end up in the requested shape
+        layer = QgsVectorLayer("PointZ?crs=EPSG:4326", "layer_z", "memory")
+        for coords in self.WAYPOINTS:
+            feat = QgsFeature()
+            feat.setGeometry(QgsPoint(*coords, 1000))
+            layer.dataProvider().addFeature(feat)
+
+        params = {"INPUT_LAYER_1": layer, "INPUT_PROVIDER": 1}
+        feats, _ = self.run_routing_algorithm(ValhallaElevation(), params)
+
+        self.assertEqual(len(feats), len(self.WAYPOINTS))
+        for feat, coords in zip(feats, self.WAYPOINTS):
+            point = feat.geometry().constGet()
+            self.assertAlmostEqual(point.x(), coords[0], places=6)
+            self.assertAlmostEqual(point.y(), coords[1], places=6)
+            self.assertNotEqual(point.z(), 1000)
+
+    def test_lines(self):
+        params = {"INPUT_LAYER_1": self.layer_line, "INPUT_PROVIDER": 1}
+
+        alg = ValhallaElevation()
+        feats, _ = self.run_routing_algorithm(alg, params)
+
+        self.assertEqual(len(feats), 1)
+        line = feats[0].geometry().constGet()
+        self.assertTrue(QgsWkbTypes.hasZ(line.wkbType()) and QgsWkbTypes.hasM(line.wkbType()))
+        self.assertEqual(line.numPoints(), len(self.WAYPOINTS))
+        # m is the distance along the line
+        self.assertEqual(line.mAt(0), 0)
+        self.assertTrue(all(line.mAt(i) < line.mAt(i + 1) for i in range(line.numPoints() - 1)))
+
+        params["INPUT_RESAMPLE_DISTANCE"] = 50
+        feats, _ = self.run_routing_algorithm(ValhallaElevation(), params)
+        self.assertGreater(feats[0].geometry().constGet().numPoints(), len(self.WAYPOINTS))
+
+    def test_lines_z(self):
+        # 3D lines' vertices have their own z, which mustn't end up in the geometry's x & y
+        for wkb_type in ("LineStringZ", "MultiLineStringZ"):
+            layer = QgsVectorLayer(f"{wkb_type}?crs=EPSG:4326", "layer_z", "memory")
+            feat = QgsFeature()
+            feat.setGeometry(QgsLineString([QgsPoint(*coords, 1000) for coords in self.WAYPOINTS]))
+            if wkb_type.startswith("Multi"):
+                feat.setGeometry(QgsGeometry.collectGeometry([feat.geometry()]))
+            layer.dataProvider().addFeature(feat)
+
+            params = {"INPUT_LAYER_1": layer, "INPUT_PROVIDER": 1}
+            feats, _ = self.run_routing_algorithm(ValhallaElevation(), params)
+
+            self.assertEqual(len(feats), 1)
+            line = feats[0].geometry().constGet()
+            self.assertEqual(line.numPoints(), len(self.WAYPOINTS))
+            for idx, coords in enumerate(self.WAYPOINTS):
+                self.assertAlmostEqual(line.xAt(idx), coords[0], places=6)
+                self.assertAlmostEqual(line.yAt(idx), coords[1], places=6)
+                self.assertNotEqual(line.zAt(idx), 1000)
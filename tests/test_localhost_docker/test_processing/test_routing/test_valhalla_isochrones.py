@@ -1,3 +1,5 @@
+from qgis.core import QgsFeature, QgsVectorLayer
+
 from ....utilities import get_qgis_app
 from ..processing_base import ProcessingBase
 
@@ -19,3 +21,24 @@ class TestValhallaIsochrones(ProcessingBase):
 
         self.assertEqual(len(feats), 6)
         self.assertEqual(progress_changed_vals, [33, 66, 100])
+
+    def test_checkpoints_duplicate_ids(self):
+        """Features with the same ID are separate jobs, also with saved progress."""
+        layer = QgsVectorLayer("Point?crs=EPSG:4326&field=ID:integer", "duplicate_ids", "memory")
+        for feature in self.layer_1.getFeatures():
+            feat = QgsFeature(layer.fields())
+            feat.setGeometry(feature.geometry())
+            feat["ID"] = 0
+            layer.dataProvider().addFeature(feat)
+
+        params = {
+            "INPUT_LAYER_1": layer,
+            "INPUT_FIELD_1": "ID",
+            "INPUT_INTERVALS": "50, 100",
+            "INPUT_PROVIDER": 1,
+            "INPUT_CHECKPOINTS": True,
+        }
+        feats, progress_changed_vals = self.run_routing_algorithm(ValhallaIsochroneCar(), params)
+
+        self.assertEqual(len(feats), 6)
+        self.assertEqual(progress_changed_vals, [33, 66, 100])
@@ -0,0 +1,51 @@
+import json
+import unittest
+
+from valhalla.utils.json_utils import iter_json_array
+
+
+class TestJsonUtils(unittest.TestCase):
+    def test_iter_json_array(self):
+        doc = {
+            "type": "FeatureCollection",
+            "properties": {"features": ["nested, not top-level"]},
+            "features": [{"properties": {"duration": 1}}, {"properties": {"duration": 2}}, None],
+            "algorithm": "bidirectional_a*",
+        }
+        members = dict()
+        items = iter_json_array(json.dumps(doc, indent=2), "features", members)
+
+        self.assertEqual(next(items), doc["features"][0])
+        self.assertNotIn("algorithm", members)
+        self.assertEqual(list(items), doc["features"][1:])
+        self.assertEqual(
+            members,
+            {"type": doc["type"], "properties": doc["properties"], "algorithm": doc["algorithm"]},
+        )
+
+        self.assertEqual(list(iter_json_array('{"features": [] }', "features")), [])
+        self.assertEqual(list(iter_json_array("{}", "features")), [])
+
+    def test_iter_json_array_bytes(self):
+        doc = {
+            "name": "Straße ☃",
+            "features": [12345.678, {"name": "Ünïcödé ☃", "values": list(range(50))}, "x" * 100],
+            "after": -1.5e-7,
+        }
+        raw = json.dumps(doc, ensure_ascii=False).encode()
+        # chunks split numbers, strings & multi-byte characters
+        for chunk_size in (1, 2, 3, 7, len(raw)):
+            with self.subTest(chunk_size=chunk_size):
+                members = dict()
+                items = list(iter_json_array(raw, "features", members, chunk_size=chunk_size))
+                self.assertEqual(items, doc["features"])
+                self.assertEqual(members, {"name": doc["name"], "after": doc["after"]})
+
+    def test_iter_json_array_invalid(self):
+        for doc in ('{"features": [1 2]}', '{"features": [1, 2]', "[1, 2]", '{"features" [1]}'):
+            with self.subTest(doc=doc), self.assertRaises(json.JSONDecodeError):
+                list(iter_json_array(doc, "features"))
+            with self.subTest(doc=doc), self.assertRaises(json.JSONDecodeError):
+                list(iter_json_array(doc.encode(), "features", chunk_size=2))
+        with self.assertRaises(UnicodeDecodeError):
+            list(iter_json_array(b'{"features": ["\xff"]}', "features"))
@@ -0,0 +1,17 @@
+import unittest
+
+from valhalla.utils.misc_utils import chunked, format_duration
+
+
+class TestMiscUtils(unittest.TestCase):
+    def test_format_duration(self):
+        self.assertEqual(format_duration(0), "0s")
+        self.assertEqual(format_duration(9.4), "9s")
+        self.assertEqual(format_duration(252), "4m 12s")
+        self.assertEqual(format_duration(3900), "1h 05m")
+        self.assertEqual(format_duration(-3), "0s")
+
+    def test_chunked(self):
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunked(iter(range(4)), 2)), [[0, 1], [2, 3]])
+        self.assertEqual(list(chunked([], 2)), [])
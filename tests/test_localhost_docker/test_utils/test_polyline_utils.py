@@ -0,0 +1,46 @@
+import struct
+import unittest
+
+import numpy as np
+
+from valhalla.utils.polyline_utils import (
+    decode_polyline_array,
+    encode_polyline_array,
+    linestring_wkb,
+    linestring_zm_wkb,
+    polygon_wkb,
+)
+
+
+class TestPolylineUtils(unittest.TestCase):
+    def test_decode_polyline_array(self):
+        # Google's reference example
+        coords = decode_polyline_array("_p~iF~ps|U_ulLnnqC_mqNvxq`@", precision=5)
+        self.assertEqual(coords.tolist(), [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]])
+
+        self.assertEqual(decode_polyline_array("").shape, (0, 2))
+        for invalid in ("_p~iF~ps|U_", "_p~iF", " "):
+            with self.assertRaises(ValueError):
+                decode_polyline_array(invalid)
+
+    def test_encode_polyline_array(self):
+        coords = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+        self.assertEqual(encode_polyline_array(coords, precision=5), "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+        self.assertEqual(encode_polyline_array([]), "")
+        # the z of 3D coordinates is dropped
+        coords_z = [(*coord, 100.0) for coord in coords]
+        self.assertEqual(encode_polyline_array(coords_z, precision=5), "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+
+        coords = np.column_stack((np.linspace(-180, 180, 1001), np.linspace(-90, 90, 1001)))
+        np.testing.assert_allclose(decode_polyline_array(encode_polyline_array(coords)), coords)
+
+    def test_wkb(self):
+        wkb = linestring_wkb([(1, 2, 3), (4, 5, 6)])
+        self.assertEqual(wkb, struct.pack("<BII4d", 1, 2, 2, 1, 2, 4, 5))
+
+        wkb = linestring_zm_wkb([(1, 2, 3, 0), (4, 5, 6, 7)])
+        self.assertEqual(wkb, struct.pack("<BII8d", 1, 3002, 2, 1, 2, 3, 0, 4, 5, 6, 7))
+
+        wkb = polygon_wkb([[(0, 0), (1, 0), (1, 1), (0, 0)]])
+        self.assertEqual(wkb[:13], struct.pack("<BIII", 1, 3, 1, 4))
+        self.assertEqual(len(wkb), 13 + 4 * 16)
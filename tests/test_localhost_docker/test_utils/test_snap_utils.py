@@ -0,0 +1,28 @@
+import unittest
+
+from valhalla.utils.snap_utils import group_locations, snap_key
+
+
+def locate_result(lon: float, lat: float, way_id: int = 1, side: str = "right") -> dict:
+    edge = {"way_id": way_id, "correlated_lon": lon, "correlated_lat": lat, "side_of_street": side}
+    return {"input_lon": lon, "input_lat": lat, "edges": [edge], "nodes": []}
+
+
+class TestSnapUtils(unittest.TestCase):
+    def test_snap_key(self):
+        key = snap_key(locate_result(13.4, 52.5))
+        self.assertEqual(key, snap_key(locate_result(13.4000001, 52.5)))
+        self.assertNotEqual(key, snap_key(locate_result(13.4, 52.5, way_id=2)))
+        self.assertNotEqual(key, snap_key(locate_result(13.4, 52.5, side="left")))
+        self.assertNotEqual(key, snap_key(locate_result(13.4001, 52.5)))
+        # ~7 m apart, within a 20 m grid cell
+        self.assertEqual(
+            snap_key(locate_result(13.4, 52.5), 20), snap_key(locate_result(13.4001, 52.5), 20)
+        )
+
+        self.assertIsNone(snap_key(None))
+        self.assertIsNone(snap_key({"edges": None, "nodes": None}))
+
+    def test_group_locations(self):
+        self.assertEqual(group_locations(["a", "b", None, "a", None, "b"]), [[0, 3], [1, 5], [2], [4]])
+        self.assertEqual(group_locations([]), [])
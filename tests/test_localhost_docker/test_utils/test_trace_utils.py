@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+
+from valhalla.utils.trace_utils import (
+    TracePart,
+    cut_indices,
+    cut_part,
+    join_parts,
+    line_length,
+    split_trace,
+)
+
+# a straight east-west trace of ~68 km with a point every ~0.7 m
+TRACE = np.column_stack((np.linspace(13, 14, 100001), np.full(100001, 52.5)))
+
+
+class TestTraceUtils(unittest.TestCase):
+    def test_split_trace(self):
+        windows = split_trace(TRACE, 16000, overlap=50)
+        self.assertEqual(windows[0], (0, 16000))
+        self.assertEqual(windows[-1][1], len(TRACE))
+        for (_, stop), (next_start, _) in zip(windows, windows[1:]):
+            self.assertEqual(stop - next_start, 50)
+
+        windows = split_trace(TRACE, 16000, overlap=50, max_distance=2000)
+        self.assertTrue(all(line_length(TRACE[start:stop]) <= 2000 for start, stop in windows))
+        self.assertEqual(windows[-1][1], len(TRACE))
+
+        # short traces aren't split, the overlap can't stall the windows
+        self.assertEqual(split_trace(TRACE[:100], 16000, overlap=50), [(0, 100)])
+        self.assertEqual(split_trace(TRACE[:4], 2, overlap=5), [(0, 2), (1, 3), (2, 4)])
+        with self.assertRaises(ValueError):
+            split_trace(TRACE, 1)
+
+    def test_cut_indices(self):
+        self.assertEqual(cut_indices([(0, 10), (8, 20), (20, 30)]), [8, None, None])
+
+    def test_cut_and_join(self):
+        part = TracePart(TRACE[:1000], 100, line_length(TRACE[:1000]))
+        head = cut_part(part, TRACE[500] + (0, 0.0001), keep_head=True)
+        tail = cut_part(part, TRACE[500], keep_head=False)
+
+        self.assertEqual(len(head.coords), 501)
+        np.testing.assert_allclose(head.coords[-1], TRACE[500])
+        np.testing.assert_allclose(tail.coords[0], TRACE[500])
+
+        joined = join_parts(head, tail)
+        self.assertAlmostEqual(joined.duration, part.duration)
+        self.assertAlmostEqual(joined.distance, part.distance)
+        self.assertAlmostEqual(line_length(joined.coords), part.distance)
+
+    def test_cut_looped_trace(self):
+        # out & back on the same road, the way back ~1 m north of the way out
+        outbound = TRACE[:1000]
+        back = outbound[::-1] + (0, 0.00001)
+        coords = np.vstack((outbound, back))
+        part = TracePart(coords, 200, line_length(coords))
+        # the trace's point on the way back, closer to the way out
+        point = outbound[99]
+
+        # the window's end overlaps with the next window on the way back
+        head = cut_part(part, point, keep_head=True, within=line_length(back[-100:]))
+        self.assertEqual(len(head.coords), 1000 + len(back) - 100 + 1)
+        np.testing.assert_allclose(head.coords[-1], back[-100])
+
+        # without the overlap's distance the closer way out is picked
+        self.assertLess(len(cut_part(part, point, keep_head=True).coords), 1000)
+
+        tail = cut_part(part, outbound[100], keep_head=False, within=line_length(outbound[:101]))
+        self.assertGreater(len(tail.coords), 1000)
+        np.testing.assert_allclose(tail.coords[0], outbound[100])
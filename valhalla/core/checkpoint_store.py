@@ -0,0 +1,146 @@
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Iterator, List, Set, Tuple
+
+from qgis.core import QgsFeature, QgsFields, QgsGeometry
+from qgis.PyQt.QtCore import QVariant
+
+from .settings import get_settings_dir
+
+CHECKPOINT_FILENAME = "checkpoints.sqlite"
+
+
+def _plain_value(value: Any) -> Any:
+    """Returns an attribute value which can be pickled, i.e. None for NULL."""
+    if isinstance(value, QVariant):
+        return None if value.isNull() else value.value()
+
+    return value
+
+
+class CheckpointStore:
+    def __init__(self, path: Path, run_key: str):
+        """
+        Persistent store of the completed jobs of a batch run and their result features, so an
+        interrupted or failed run resumes where it stopped, see make_run_key().
+
+        The features are stored pickled as their geometry's WKB & their attributes, per job key,
+        along with the job's position in the run, which the results are read back in the order of.
+
+        :param path: the SQLite database file, shared by all runs
+        :param run_key: the run's identity
+        """
+        self.path = path
+        self.run_key = run_key
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS jobs (
+                run_key TEXT NOT NULL,
+                job_key TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                key BLOB NOT NULL,
+                features BLOB NOT NULL,
+                PRIMARY KEY (run_key, job_key)
+            );
+            """
+        )
+
+    @staticmethod
+    def make_run_key(algorithm_id: str, values: dict) -> str:
+        """
+        Returns the identity of a run, i.e. the hash of its algorithm and its inputs & parameters.
+
+        :param values: the run's parameter values, the input layers' by their source
+        """
+        canonical = json.dumps(
+            {"algorithm": algorithm_id, "values": values},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @staticmethod
+    def make_job_key(key: Any) -> str:
+        """Returns the canonical form of a job's key, e.g. a feature ID or a pair of them."""
+        return json.dumps(key, separators=(",", ":"), default=str)
+
+    def completed(self) -> Set[str]:
+        """Returns the job keys of the completed jobs, see make_job_key()."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_key FROM jobs WHERE run_key = ?", (self.run_key,)
+            ).fetchall()
+
+        return {job_key for (job_key,) in rows}
+
+    def add(self, key: Any, position: int, features: List[QgsFeature]):
+        """
+        Stores the result features of the completed job ``key``.
+
+        :param position: the job's position in the run, jobs may complete in any order, e.g. a
+            failed one only in a later run
+        """
+        records = [
+            (
+                bytes(f.geometry().asWkb()) if f.hasGeometry() else b"",
+                [_plain_value(value) for value in f.attributes()],
+            )
+            for f in features
+        ]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (run_key, job_key, position, key, features) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.run_key,
+                    self.make_job_key(key),
+                    position,
+                    pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL),
+                    pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL),
+                ),
+            )
+
+    def iter_results(self, fields: QgsFields) -> Iterator[Tuple[Any, List[QgsFeature]]]:
+        """Yields the stored (key, features) of the completed jobs in the order of their positions."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, features FROM jobs WHERE run_key = ? ORDER BY position, rowid",
+                (self.run_key,),
+            ).fetchall()
+
+        for key, records in rows:
+            features = list()
+            for wkb, attributes in pickle.loads(records):
+                feature = QgsFeature(fields)
+                if wkb:
+                    geometry = QgsGeometry()
+                    geometry.fromWkb(wkb)
+                    feature.setGeometry(geometry)
+                feature.setAttributes(attributes)
+                features.append(feature)
+            yield pickle.loads(key), features
+
+    def clear(self):
+        """Removes the run's jobs, e.g. once it completed."""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE run_key = ?", (self.run_key,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_checkpoint_store(run_key: str) -> CheckpointStore:
+    """Returns the checkpoints of the run, located in the plugin's settings directory."""
+    return CheckpointStore(get_settings_dir().joinpath(CHECKPOINT_FILENAME), run_key)
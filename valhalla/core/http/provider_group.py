@@ -0,0 +1,190 @@
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from qgis.core import Qgis
+
+from ...global_definitions import LoadBalancing
+from ...third_party.routingpy.routingpy import exceptions
+from ...utils.http_utils import get_status_response
+from ...utils.logger_utils import qgis_log
+from ..settings import ProviderSetting
+from .router_client import DryRunRequest, RouterClient
+
+# the members retry only briefly themselves, after that another member is tried
+FAILOVER_RETRY_TIMEOUT = 5  # seconds
+# how long a failed member is left alone before its /status is checked again
+HEALTH_CHECK_INTERVAL = 30  # seconds
+
+
+class ProviderGroupClient(RouterClient):
+    def __init__(
+        self,
+        base_url,
+        user_agent=None,
+        timeout=None,
+        retry_timeout=None,
+        retry_over_query_limit=None,
+        skip_api_error=False,
+        providers: Sequence[ProviderSetting] = (),
+        balancing: LoadBalancing = LoadBalancing.ROUND_ROBIN,
+        **kwargs,
+    ):
+        """
+        Spreads the requests across a group of identical providers and fails over to the next member
+        if one errors or times out. Failed members are taken out of the rotation until their /status
+        responds again, which is checked every ``HEALTH_CHECK_INTERVAL`` seconds.
+
+        Each member is a regular RouterClient with its own concurrency control and statistics. The
+        requests run on the group's pool, which has as many threads as the members' pools together,
+        and each member is busy with at most as many requests as its own pool allows, so a slow
+        member can't take up the threads of the others.
+
+        :param base_url: the URL of the first member, used as the group's identity, e.g. for the cache
+        :param providers: the members of the group
+        :param balancing: how the member for the next request is chosen
+        :param kwargs: passed on to RouterClient, e.g. ``cache_responses``
+        """
+        if not providers:
+            raise ValueError("A provider group needs at least one provider")
+
+        client_kwargs = dict(user_agent=user_agent) if user_agent else dict()
+        self.members: List[RouterClient] = list()
+        for p in providers:
+            member_kwargs = {**p.client_kwargs(), **client_kwargs}
+            # the member's own timeout takes precedence
+            member_kwargs["timeout"] = member_kwargs["timeout"] or timeout
+            self.members.append(
+                RouterClient(
+                    p.url,
+                    retry_timeout=FAILOVER_RETRY_TIMEOUT,
+                    skip_api_error=skip_api_error,
+                    **member_kwargs,
+                )
+            )
+        kwargs["max_concurrent_requests"] = sum(m.max_concurrent_requests for m in self.members)
+        super(ProviderGroupClient, self).__init__(
+            base_url,
+            timeout=timeout,
+            retry_timeout=retry_timeout,
+            skip_api_error=skip_api_error,
+            **kwargs,
+            **client_kwargs,
+        )
+        self.pool_key = "|".join(m.base_url for m in self.members)
+        self.balancing = balancing
+
+        self._failed: Dict[str, float] = dict()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        # the requests each member is busy with, notified when one is done
+        self._busy: Dict[RouterClient, int] = dict()
+        self._cond = threading.Condition(self._lock)
+
+    def _request(self, url, get_params={}, post_params=None, dry_run=None, raw=False):
+        """
+        Sends the request to the members in the order of :meth:`candidates` until one succeeds,
+        skipping the ones which are busy with as many requests as they allow, see :meth:`_acquire`.
+        """
+        if dry_run:
+            raise DryRunRequest(url, get_params, post_params)
+
+        error: Optional[Exception] = None
+        remaining = self.candidates()
+        while remaining:
+            member = self._acquire(remaining)
+            remaining.remove(member)
+            try:
+                result = member._request(url, get_params, post_params, raw=raw)
+            except (exceptions.RouterError, exceptions.Timeout) as e:
+                if isinstance(e, exceptions.RouterApiError) and not isinstance(
+                    e, exceptions.OverQueryLimit
+                ):
+                    raise  # it's the request, another member won't like it either
+                self._on_failure(member, e)
+                error = e
+                continue
+            finally:
+                self._release(member)
+
+            self._on_success(member)
+            return result
+
+        raise error
+
+    def _acquire(self, candidates: List[RouterClient]) -> RouterClient:
+        """
+        Returns the first of the candidates which isn't busy with ``max_concurrent_requests`` and
+        counts the request, waiting for one to be done if they all are. Failed candidates are only
+        chosen if there's no healthy one left.
+        """
+        with self._cond:
+            healthy = [m for m in candidates if m.base_url not in self._failed]
+            while True:
+                for member in healthy or candidates:
+                    if self._busy.get(member, 0) < member.max_concurrent_requests:
+                        self._busy[member] = self._busy.get(member, 0) + 1
+                        return member
+                self._cond.wait()
+
+    def _release(self, member: RouterClient):
+        """Counts a request of :meth:`_acquire` as done."""
+        with self._cond:
+            self._busy[member] -= 1
+            self._cond.notify_all()
+
+    def candidates(self) -> List[RouterClient]:
+        """
+        Returns the members in the order they should be tried: the healthy ones ordered by the
+        ``balancing`` strategy, then the failed ones, in case all of them are failing.
+        """
+        healthy = [m for m in self.members if self._is_healthy(m)]
+        failed = [m for m in self.members if m not in healthy]
+        if self.balancing == LoadBalancing.LEAST_LATENCY:
+            healthy.sort(key=self._expected_wait)
+        elif healthy:
+            with self._lock:
+                offset = next(self._counter) % len(healthy)
+            healthy = healthy[offset:] + healthy[:offset]
+
+        return healthy + failed
+
+    @staticmethod
+    def _expected_wait(member: RouterClient) -> float:
+        """The time a new request would take, estimated from the member's latency and load."""
+        controller = member.controller
+        latency = controller.latency or 0.0  # untested members first
+
+        return latency * (controller.in_flight + 1) / controller.limit
+
+    def _is_healthy(self, member: RouterClient) -> bool:
+        """Whether the member isn't failed or its /status is fine again after ``HEALTH_CHECK_INTERVAL``."""
+        with self._lock:
+            failed = self._failed.get(member.base_url)
+            if failed is None:
+                return True
+            elif time.monotonic() - failed < HEALTH_CHECK_INTERVAL:
+                return False
+            # only one thread checks
+            self._failed[member.base_url] = time.monotonic()
+
+        try:
+            get_status_response(member.base_url)
+        except (exceptions.RouterError, exceptions.Timeout):
+            return False
+
+        self._on_success(member)
+        return True
+
+    def _on_failure(self, member: RouterClient, error: Exception):
+        with self._lock:
+            self._failed[member.base_url] = time.monotonic()
+        qgis_log(
+            f"Provider {member.base_url} failed with '{error}', trying the next one",
+            Qgis.MessageLevel.Warning,
+        )
+
+    def _on_success(self, member: RouterClient):
+        with self._lock:
+            self._failed.pop(member.base_url, None)
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+
+# how many completed responses are kept around for identical follow-up requests
+DEFAULT_RECENT_SIZE = 128
+RECENT_TTL = 300  # seconds
+
+
+class RequestCoalescer:
+    def __init__(self, max_recent: int = DEFAULT_RECENT_SIZE, ttl: float = RECENT_TTL):
+        """
+        Lets identical requests share one server call: a request whose key is already in flight gets
+        that request's future, one whose key completed recently gets its response right away.
+
+        The keys are content addresses of the requests, see ResponseCache.make_key(). Only successful
+        responses are kept, failed requests are tried again by the next identical one. Requests
+        submitted with ``keep=False``, e.g. those with huge responses, are only shared while in flight.
+
+        :param max_recent: the maximum number of completed responses to keep, least recently used go first
+        :param ttl: the seconds a completed response may be handed out again
+        """
+        self.max_recent = max_recent
+        self.ttl = ttl
+        self.coalesced = 0
+
+        self._in_flight: Dict[str, Future] = dict()
+        self._recent: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, fn: Callable[[], Future], keep: bool = True) -> Future:
+        """
+        Returns the future of the request identified by ``key``, only calls ``fn`` if there's
+        neither an identical request in flight nor a recently completed one.
+
+        :param key: the request's content address
+        :param fn: schedules the request and returns its future
+        :param keep: whether the response is kept for identical requests after it completed
+        """
+        with self._lock:
+            if (future := self._get_recent(key)) is None:
+                future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+
+            future = fn()
+            self._in_flight[key] = future
+
+        future.add_done_callback(lambda f: self._on_done(key, f, keep))
+
+        return future
+
+    def _get_recent(self, key: str):
+        """Returns a finished future for a recently completed response of ``key``, if any. Needs the lock."""
+        if (recent := self._recent.get(key)) is None:
+            return None
+
+        completed, response = recent
+        if time.monotonic() - completed > self.ttl:
+            del self._recent[key]
+            return None
+
+        self._recent.move_to_end(key)
+        future = Future()
+        future.set_result(response)
+
+        return future
+
+    def _on_done(self, key: str, future: Future, keep: bool):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+            if not keep or not self.max_recent or future.cancelled() or future.exception() is not None:
+                return
+
+            self._recent[key] = (time.monotonic(), future.result())
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_recent:
+                self._recent.popitem(last=False)
+
+    def clear(self):
+        """Forgets about completed responses, requests in flight are still shared."""
+        with self._lock:
+            self._recent.clear()
@@ -0,0 +1,158 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, Optional
+
+from ...third_party.routingpy.routingpy import exceptions
+
+DEFAULT_RETRY_TIMEOUT = 60  # seconds
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_MAX = 30  # seconds
+# multiplicative decrease of the concurrency limit on errors
+DECREASE_FACTOR = 0.5
+# and the smaller one when the server is merely slower than usual
+LATENCY_DECREASE_FACTOR = 0.9
+# a response slower than this factor times the baseline latency counts as congestion
+LATENCY_TOLERANCE = 3
+LATENCY_SMOOTHING = 0.2
+# the share by which the baseline follows a slower smoothed latency per response, so a lasting
+# slowdown, e.g. a busier server, becomes the new normal instead of throttling forever
+BASELINE_DRIFT = 0.02
+
+RETRIABLE_STATUS = (502, 503, 504)
+
+_controllers: Dict[str, "RequestController"] = dict()
+_controllers_lock = threading.Lock()
+
+
+def is_retriable(error: Exception) -> bool:
+    """Whether a request which failed with ``error`` should be tried again."""
+    if isinstance(error, (exceptions.OverQueryLimit, exceptions.Timeout)):
+        return True
+    if isinstance(error, exceptions.RouterServerError):
+        return error.status in RETRIABLE_STATUS
+
+    return False
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header value, i.e. either seconds or a HTTP date, into seconds from now."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestController:
+    def __init__(self, max_limit: int):
+        """
+        Limits the requests in flight to a provider and adapts that limit in an AIMD fashion:
+        every successful request raises the limit by roughly one per "window" of requests, every
+        error (or a response which took much longer than usual) cuts it multiplicatively. It also
+        calculates the jittered, exponential backoff for retries.
+
+        What's usual is tracked per endpoint, since e.g. a /status call is a lot faster than a matrix.
+
+        :param max_limit: the upper bound of requests in flight, i.e. the provider's configured maximum
+        """
+        self.max_limit = max_limit
+        self._limit = float(max_limit)
+        self._in_flight = 0
+        self._latency: Optional[float] = None
+        # per endpoint: the smoothed latency and its baseline
+        self._latencies: Dict[str, float] = dict()
+        self._baselines: Dict[str, float] = dict()
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """The current number of allowed requests in flight."""
+        return max(1, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        """The current number of requests in flight."""
+        return self._in_flight
+
+    @property
+    def latency(self) -> Optional[float]:
+        """The smoothed latency of the recent requests in seconds, None if there weren't any yet."""
+        return self._latency
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Blocks until a request may be sent and holds the slot while it's in flight."""
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self, latency: float, endpoint: str = ""):
+        """
+        Additive increase, unless the endpoint got a lot slower than it used to be.
+
+        :param latency: the request's round trip in seconds
+        :param endpoint: the request's URL path, whose latencies are compared with each other only
+        """
+        with self._cond:
+            if self._latency is None:
+                self._latency = latency
+            else:
+                self._latency += LATENCY_SMOOTHING * (latency - self._latency)
+
+            smoothed = self._latencies.get(endpoint, latency)
+            smoothed += LATENCY_SMOOTHING * (latency - smoothed)
+            self._latencies[endpoint] = smoothed
+            baseline = self._baselines.get(endpoint, smoothed)
+            baseline = min(smoothed, baseline + BASELINE_DRIFT * (smoothed - baseline))
+            self._baselines[endpoint] = baseline
+
+            if smoothed > LATENCY_TOLERANCE * baseline:
+                self._limit = max(1.0, self._limit * LATENCY_DECREASE_FACTOR)
+            else:
+                self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+    def on_failure(self):
+        """Multiplicative decrease."""
+        with self._cond:
+            self._limit = max(1.0, self._limit * DECREASE_FACTOR)
+
+    @staticmethod
+    def backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Returns the seconds to wait before the next attempt: the server's Retry-After if given,
+        else an exponential backoff with full jitter.
+
+        :param attempt: the number of the failed attempt, starting at 0
+        :param retry_after: the server's Retry-After in seconds, if any
+        """
+        if retry_after is not None:
+            return retry_after
+
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def get_controller(base_url: str, max_limit: int) -> RequestController:
+    """Returns the controller for ``base_url``, it's recreated if ``max_limit`` changed."""
+    with _controllers_lock:
+        controller = _controllers.get(base_url)
+        if controller is None or controller.max_limit != max_limit:
+            controller = RequestController(max_limit)
+            _controllers[base_url] = controller
+
+    return controller
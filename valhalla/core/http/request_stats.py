@@ -0,0 +1,184 @@
+import csv
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_MAX_RECORDS = 50000
+
+# the timings are in seconds, the sizes in bytes
+TIME_METRICS = ("queue_wait", "round_trip", "decode", "build")
+SIZE_METRICS = ("bytes_out", "bytes_in")
+METRICS = TIME_METRICS + SIZE_METRICS
+RECORD_FIELDS = ("timestamp", "provider", "endpoint", "status", "features") + METRICS
+
+PERCENTILES = (50, 90, 99)
+# upper bounds of the histogram buckets for the timing metrics, in seconds
+HISTOGRAM_BOUNDS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, math.inf)
+
+_stats: Optional["RequestStats"] = None
+_stats_lock = threading.Lock()
+_context = threading.local()
+
+
+@contextmanager
+def request_context(**kwargs) -> Iterator[None]:
+    """
+    Sets information about the current request for this thread, which the HTTP client can't know
+    itself, e.g. the ``endpoint`` name it's requested for or the ``pool_wait`` until a pool's thread
+    picked it up.
+    """
+    previous = {key: getattr(_context, key, None) for key in kwargs}
+    for key, value in kwargs.items():
+        setattr(_context, key, value)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            setattr(_context, key, value)
+
+
+def get_request_context(key: str, default=None):
+    """Returns the value of ``key`` set by :func:`request_context` for this thread."""
+    value = getattr(_context, key, None)
+    return default if value is None else value
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Returns the ``q``-th percentile of the sorted ``values``, linearly interpolated."""
+    if not values:
+        return math.nan
+    pos = (len(values) - 1) * q / 100
+    lower = math.floor(pos)
+    upper = min(lower + 1, len(values) - 1)
+
+    return values[lower] + (values[upper] - values[lower]) * (pos - lower)
+
+
+class RequestStats:
+    def __init__(self, max_records: int = DEFAULT_MAX_RECORDS):
+        """
+        Collects timing records of requests, i.e. the time spent waiting for a free slot, the network
+        round trip, the sizes sent & received, the JSON decode and the feature construction, and
+        aggregates them per provider & endpoint.
+
+        :param max_records: how many records are kept, the oldest are dropped first
+        """
+        self._records: Deque[dict] = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(
+        self, provider: str, endpoint: str, status: Optional[int] = None, features=None, **metrics
+    ):
+        """
+        Adds a record, all metrics are optional, e.g. the feature construction is recorded separately.
+
+        :param provider: the provider's base URL
+        :param endpoint: the endpoint's name, e.g. "isochrones"
+        :param status: the HTTP status, if it's a network record
+        :param features: the number of features which were built
+        :param metrics: any of ``METRICS``
+        """
+        unknown = set(metrics).difference(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+
+        record = dict.fromkeys(RECORD_FIELDS)
+        record.update(
+            timestamp=time.time(), provider=provider, endpoint=endpoint, status=status, features=features
+        )
+        record.update(metrics)
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> List[dict]:
+        """Returns a copy of all records, oldest first."""
+        with self._lock:
+            return [dict(r) for r in self._records]
+
+    def _samples(self) -> Dict[Tuple[str, str], Dict[str, List[float]]]:
+        """Returns the sorted values of each metric per (provider, endpoint)."""
+        samples: Dict[Tuple[str, str], Dict[str, List[float]]] = dict()
+        for record in self.records():
+            group = samples.setdefault((record["provider"], record["endpoint"]), dict())
+            for metric in METRICS:
+                if record[metric] is not None:
+                    group.setdefault(metric, list()).append(record[metric])
+
+        for group in samples.values():
+            for values in group.values():
+                values.sort()
+
+        return samples
+
+    def summary(self) -> List[dict]:
+        """
+        Returns one row per provider, endpoint & metric with its count, mean, max and ``PERCENTILES``,
+        e.g. ``{"provider": ..., "endpoint": ..., "metric": "round_trip", "count": 10, "p50": ...}``.
+        """
+        rows = list()
+        for (provider, endpoint), group in sorted(self._samples().items()):
+            for metric in METRICS:
+                values = group.get(metric)
+                if not values:
+                    continue
+                row = {
+                    "provider": provider,
+                    "endpoint": endpoint,
+                    "metric": metric,
+                    "count": len(values),
+                    "mean": sum(values) / len(values),
+                    "max": values[-1],
+                }
+                row.update({f"p{q}": percentile(values, q) for q in PERCENTILES})
+                rows.append(row)
+
+        return rows
+
+    def histogram(self, provider: str, endpoint: str, metric: str) -> List[Tuple[float, int]]:
+        """
+        Returns the number of values per ``HISTOGRAM_BOUNDS`` bucket of a timing metric.
+
+        :returns: list of (upper bound in seconds, count) tuples
+        """
+        if metric not in TIME_METRICS:
+            raise ValueError(f"No histogram for metric {metric}")
+
+        counts = [0] * len(HISTOGRAM_BOUNDS)
+        bucket = 0
+        for value in self._samples().get((provider, endpoint), dict()).get(metric, list()):
+            while value > HISTOGRAM_BOUNDS[bucket]:
+                bucket += 1
+            counts[bucket] += 1
+
+        return list(zip(HISTOGRAM_BOUNDS, counts))
+
+    def to_csv(self, path: Path):
+        """Writes all records to a CSV file."""
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.records())
+
+    def to_json(self, path: Path):
+        """Writes the summary and all records to a JSON file."""
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "records": self.records()}, f, indent=2)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+def get_request_stats() -> RequestStats:
+    """Returns the plugin's request statistics."""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = RequestStats()
+
+    return _stats
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..settings import get_settings_dir
+
+DEFAULT_CACHE_SIZE = 512 * 1024**2  # bytes
+CACHE_FILENAME = "response_cache.sqlite"
+# how long we trust a provider's tileset_last_modified before asking /status again
+STATUS_CHECK_INTERVAL = 300  # seconds
+
+_cache: Optional["ResponseCache"] = None
+_cache_lock = threading.Lock()
+
+
+class ResponseCache:
+    def __init__(self, path: Path, max_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Persistent, content-addressed cache for parsed routing responses with LRU eviction.
+
+        The responses are stored pickled, so a hit neither touches the network nor decodes JSON.
+        All entries of a provider are dropped once its graph changed, i.e. its /status
+        ``tileset_last_modified`` differs from the one we recorded.
+
+        :param path: the SQLite database file
+        :param max_size: the maximum size of all cached responses in bytes
+        """
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._validated: Dict[str, float] = dict()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                base_url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+            CREATE TABLE IF NOT EXISTS tilesets (
+                base_url TEXT PRIMARY KEY,
+                last_modified INTEGER
+            );
+            """
+        )
+        (self._size,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    @staticmethod
+    def make_key(
+        base_url: str,
+        url: str,
+        get_params: Optional[dict],
+        post_params: Optional[dict],
+        variant: str = "",
+    ) -> str:
+        """
+        Returns the content address of a request, i.e. the hash of its canonicalised endpoint and body.
+
+        :param variant: distinguishes different representations of the same response, e.g. raw bytes
+        """
+        canonical = json.dumps(
+            {
+                "endpoint": base_url.rstrip("/") + "/" + url.lstrip("/"),
+                "query": get_params or {},
+                "body": post_params or {},
+                "variant": variant,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached response for ``key`` or None and bumps the hit/miss counters."""
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+
+        return pickle.loads(row[0])
+
+    def put(self, key: str, base_url: str, response: Any):
+        """Stores the parsed ``response`` and evicts the least recently used entries if needed."""
+        body = pickle.dumps(response, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(body) > self.max_size:
+            return
+
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, base_url, body, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, base_url, body, len(body), time.time()),
+            )
+            self._size += len(body) - (old[0] if old else 0)
+            self._evict()
+
+    def _evict(self):
+        """Drops the least recently used entries until we're below the size cap. Needs the lock."""
+        while self._size > self.max_size:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                if self._size <= self.max_size:
+                    break
+
+    def is_validated(self, base_url: str) -> bool:
+        """Whether the provider's graph version was checked within the last ``STATUS_CHECK_INTERVAL``."""
+        with self._lock:
+            checked = self._validated.get(base_url)
+
+        return checked is not None and time.monotonic() - checked < STATUS_CHECK_INTERVAL
+
+    def validate(self, base_url: str, tileset_last_modified: Optional[int]):
+        """Invalidates all entries of ``base_url`` if its graph changed since we last saw it."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_modified FROM tilesets WHERE base_url = ?", (base_url,)
+            ).fetchone()
+            if row is None or row[0] != tileset_last_modified:
+                self._remove_provider(base_url)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO tilesets (base_url, last_modified) VALUES (?, ?)",
+                    (base_url, tileset_last_modified),
+                )
+            self._validated[base_url] = time.monotonic()
+
+    def _remove_provider(self, base_url: str):
+        """Removes all entries of ``base_url``. Needs the lock."""
+        removed = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses WHERE base_url = ?", (base_url,)
+        ).fetchone()[0]
+        self._conn.execute("DELETE FROM responses WHERE base_url = ?", (base_url,))
+        self._size -= removed
+
+    def clear(self):
+        """Removes all entries and resets the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("DELETE FROM tilesets")
+            self._conn.execute("VACUUM")
+            self._validated.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def size(self) -> int:
+        """The size of all cached responses in bytes."""
+        return self._size
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss counters and the current size in bytes."""
+        return {"hits": self.hits, "misses": self.misses, "size": self._size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the plugin's response cache, located in the plugin's settings directory."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(get_settings_dir().joinpath(CACHE_FILENAME))
+
+    return _cache
@@ -1,15 +1,111 @@
+import gzip
 import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from qgis.core import Qgis, QgsNetworkAccessManager, QgsNetworkReplyContent
-from qgis.PyQt.QtCore import QJsonDocument, QUrl
+from qgis.PyQt.QtCore import QCoreApplication, QThread, QUrl
 from qgis.PyQt.QtNetwork import QNetworkRequest
 
+try:
+    # Qt >= 6.5
+    from qgis.PyQt.QtNetwork import QHttp1Configuration
+except ImportError:
+    QHttp1Configuration = None
+
 from ... import PLUGIN_NAME, __version__
 from ...third_party.routingpy.routingpy import exceptions
 from ...third_party.routingpy.routingpy.client_base import BaseClient
+from ...utils.http_utils import get_status_response
+from ...utils.json_utils import dumps
 from ...utils.logger_utils import qgis_log
-from ...utils.resource_utils import get_json_body
-from ..settings import ValhallaSettings
+from ...utils.resource_utils import get_json_body, get_response_body
+from ..settings import (
+    DEFAULT_CONNECTIONS_PER_HOST,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    get_settings_snapshot,
+)
+from .request_controller import (
+    DEFAULT_RETRY_TIMEOUT,
+    RequestController,
+    get_controller,
+    is_retriable,
+    parse_retry_after,
+)
+from .request_stats import get_request_context, get_request_stats, request_context
+from .response_cache import ResponseCache, get_response_cache
+
+# request bodies smaller than this aren't worth compressing
+COMPRESSION_THRESHOLD = 64 * 1024  # bytes
+COMPRESSION_LEVEL = 6
+# the seconds between processing the GUI's events while waiting for a request, see wait_for()
+GUI_WAIT_INTERVAL = 0.02
+
+# one request pool per provider base URL, shared by all clients talking to it
+_executors: Dict[str, ThreadPoolExecutor] = dict()
+_executors_lock = threading.Lock()
+
+
+def get_executor(key: str, max_workers: int) -> ThreadPoolExecutor:
+    """
+    Returns the request pool for ``key``, the pool is recreated if ``max_workers`` changed.
+
+    :param key: the provider's base URL, or the URLs of a group of providers
+    :param max_workers: the maximum number of requests in flight for this provider
+    """
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None or executor._max_workers != max_workers:
+            if executor is not None:
+                executor.shutdown(wait=False)
+            executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix=f"{PLUGIN_NAME.replace(' ', '_')}_http"
+            )
+            _executors[key] = executor
+
+    return executor
+
+
+def wait_for(future: Future) -> Any:
+    """
+    Returns the result of a request scheduled on a request pool. On the GUI thread, the GUI's events
+    are processed while waiting: QGIS shows SSL error & authentication prompts of the pool's network
+    requests on the GUI thread, which would deadlock if it was blocked, and the UI stays responsive.
+
+    :raises: whatever the request raised
+    """
+    app = QCoreApplication.instance()
+    if app is None or QThread.currentThread() != app.thread():
+        return future.result()
+
+    while True:
+        try:
+            return future.result(timeout=GUI_WAIT_INTERVAL)
+        except FutureTimeoutError:
+            QCoreApplication.processEvents()
+
+
+def shutdown_executors():
+    """Shuts down all request pools, e.g. when the plugin is unloaded."""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+class DryRunRequest(Exception):
+    def __init__(self, url: str, get_params: dict, post_params: Optional[dict]):
+        """
+        Raised by :meth:`RouterClient._request` on dry runs instead of sending the request,
+        so callers can get hold of the request routingpy built.
+        """
+        super(DryRunRequest, self).__init__(url)
+        self.url = url
+        self.get_params = get_params
+        self.post_params = post_params
 
 
 class RouterClient(BaseClient):
@@ -21,51 +117,294 @@ class RouterClient(BaseClient):
         retry_timeout=None,
         retry_over_query_limit=None,
         skip_api_error=False,
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+        cache_responses: bool = False,
+        compress_responses: bool = False,
+        compress_requests: bool = False,
+        http2: bool = True,
+        keep_alive: bool = True,
+        pipelining: bool = False,
+        connections_per_host: int = DEFAULT_CONNECTIONS_PER_HOST,
     ):
-
+        """
+        :param timeout: the seconds a request may go without transferring any data before it's aborted;
+            None (or routingpy's default) leaves it to QGIS' network timeout
+        :param compress_responses: ask for gzip/deflate encoded responses, which servers are free to
+            ignore, so it's safe with any of them
+        :param compress_requests: send large request bodies gzip encoded; only works if the server, or
+            a proxy in front of it, decodes them, stock Valhalla doesn't
+        :param http2: negotiate HTTP/2 with HTTPS servers, which multiplexes all requests over a
+            single connection and saves most of the TLS handshakes
+        :param keep_alive: reuse HTTP/1.1 connections for subsequent requests
+        :param pipelining: send HTTP/1.1 requests without waiting for the previous response; only
+            safe if the server (and any proxy) supports it
+        :param connections_per_host: the maximum number of parallel HTTP/1.1 connections per thread,
+            needs Qt >= 6.5
+        """
         super(RouterClient, self).__init__(
             base_url, user_agent=user_agent, skip_api_error=skip_api_error
         )
-        self.nam = QgsNetworkAccessManager.instance()
+        self.max_concurrent_requests = max(1, int(max_concurrent_requests))
+        self.cache_responses = cache_responses
+        self.compress_responses = compress_responses
+        self.compress_requests = compress_requests
+        self.retry_timeout = retry_timeout if retry_timeout is not None else DEFAULT_RETRY_TIMEOUT
+        # routingpy passes a sentinel object if the router wasn't given a timeout
+        self.timeout = timeout if isinstance(timeout, (int, float)) and timeout > 0 else None
+        self.http2 = http2
+        self.keep_alive = keep_alive
+        self.pipelining = pipelining
+        self.connections_per_host = max(1, int(connections_per_host))
+        # requests to the same provider share a pool, see get_executor()
+        self.pool_key = self.base_url
+        self._request_template = self._build_request_template()
 
-    def _request(self, url, get_params={}, post_params=None, dry_run=None):
-        authed_url = self._generate_auth_url(url, get_params)
-        url_object = QUrl(self.base_url + authed_url)
-
-        is_debug = ValhallaSettings().is_debug()
-
-        requests_method = self.nam.blockingGet
-        request = QNetworkRequest(url_object)
+    def _build_request_template(self) -> QNetworkRequest:
+        """
+        Returns the request with the headers & transport options which are the same for every
+        request to this provider, so they're only set once; copies of it are cheap.
+        """
+        request = QNetworkRequest()
         request.setHeader(
             QNetworkRequest.KnownHeaders.ContentTypeHeader,
             "application/json",
         )
         request.setRawHeader(b"X-Client-Id", b"valhalla-qgis-plugin")
+        if self.compress_responses:
+            # setting it ourselves disables Qt's transparent decoding, see get_response_body()
+            request.setRawHeader(b"Accept-Encoding", b"gzip, deflate")
+
+        # only over TLS, where the protocol is negotiated, Valhalla itself doesn't speak cleartext HTTP/2
+        request.setAttribute(QNetworkRequest.Attribute.Http2AllowedAttribute, self.http2)
+        request.setAttribute(QNetworkRequest.Attribute.HttpPipeliningAllowedAttribute, self.pipelining)
+        if not self.keep_alive:
+            request.setRawHeader(b"Connection", b"close")
+        if QHttp1Configuration is not None:
+            http1_config = QHttp1Configuration()
+            http1_config.setNumberOfConnectionsPerHost(self.connections_per_host)
+            request.setHttp1Configuration(http1_config)
+        if self.timeout:
+            request.setTransferTimeout(int(self.timeout * 1000))
+
+        return request
+
+    @property
+    def nam(self) -> QgsNetworkAccessManager:
+        """The network access manager of the calling thread, so requests can be issued from the pool."""
+        return QgsNetworkAccessManager.instance()
+
+    @property
+    def controller(self) -> RequestController:
+        """The provider's RequestController, shared by all its clients."""
+        return get_controller(self.base_url, self.max_concurrent_requests)
+
+    def submit(
+        self, fn: Callable, *args, callback: Optional[Callable[[Future], None]] = None, **kwargs
+    ) -> Future:
+        """
+        Schedules ``fn(*args, **kwargs)`` on this provider's request pool.
+
+        :param fn: the callable to execute, usually something ending up in :meth:`_request`
+        :param callback: optional callable which receives the finished future; note, it's
+            executed in the pool's thread, not the caller's
+        :returns: the future holding the return value of ``fn``
+        """
+        queued = time.monotonic()
+
+        def run():
+            with request_context(pool_wait=time.monotonic() - queued):
+                return fn(*args, **kwargs)
+
+        future = get_executor(self.pool_key, self.max_concurrent_requests).submit(run)
+        if callback:
+            future.add_done_callback(callback)
+
+        return future
+
+    def request_async(
+        self,
+        url,
+        get_params={},
+        post_params=None,
+        callback: Optional[Callable[[Future], None]] = None,
+    ) -> Future:
+        """Non-blocking version of :meth:`_request`, see :meth:`submit`."""
+        return self.submit(self._request, url, get_params, post_params, callback=callback)
+
+    def _get_cache(self) -> Optional[ResponseCache]:
+        """
+        Returns the response cache if caching is enabled for this provider and the cache was validated
+        against the provider's current graph, else None.
+        """
+        if not self.cache_responses:
+            return None
+
+        cache = get_response_cache()
+        if not cache.is_validated(self.base_url):
+            try:
+                status = get_status_response(self.base_url)
+            except exceptions.RouterError:
+                # can't tell whether the graph changed, so don't trust the cache
+                return None
+            cache.validate(self.base_url, status.get("tileset_last_modified"))
+
+        return cache
+
+    def _request(self, url, get_params={}, post_params=None, dry_run=None, raw=False):
+        """
+        Sends the request and returns the parsed response.
+
+        :param dry_run: if set, nothing is sent, instead a DryRunRequest is raised
+        :param raw: return the undecoded response body, e.g. to decode it incrementally
+        """
+        if dry_run:
+            raise DryRunRequest(url, get_params, post_params)
+
+        cache = self._get_cache()
+        cache_key = None
+        if cache:
+            cache_key = cache.make_key(
+                self.base_url, url, get_params, post_params, variant="raw" if raw else ""
+            )
+            if (cached := cache.get(cache_key)) is not None:
+                return cached
+
+        is_debug = get_settings_snapshot().debug
+
+        try:
+            result = self._request_with_retries(
+                url, get_params, post_params, is_debug, self._parse_raw if raw else self._parse
+            )
+        except exceptions.RouterApiError as e:
+            if not self.skip_api_error:
+                raise
+            elif is_debug:
+                qgis_log(
+                    "Router {} returned an API error with "
+                    "the following message:\n{}".format(self.__class__.__name__, e.message),
+                    Qgis.MessageLevel.Warning,
+                )
+            return
+
+        if cache_key:
+            cache.put(cache_key, self.base_url, result)
+
+        return result
+
+    def _request_with_retries(
+        self,
+        url,
+        get_params: dict,
+        post_params: Optional[dict],
+        is_debug: bool,
+        parse: Callable[[QgsNetworkReplyContent], Any],
+    ):
+        """
+        Sends the request through the provider's RequestController, which limits the requests in flight,
+        and retries it with a jittered, exponential backoff (or the server's Retry-After) on HTTP 429,
+        502 - 504 and timeouts, until ``retry_timeout`` would be exceeded.
+
+        :param parse: turns the response into the result, raising routingpy's exceptions on errors
+        """
+        controller = self.controller
+        deadline = time.monotonic() + self.retry_timeout
+        pool_wait = get_request_context("pool_wait", 0)
+        attempt = 0
+        while True:
+            wait_start = time.monotonic()
+            with controller.slot():
+                start = time.monotonic()
+                response, bytes_out = self._send(url, get_params, post_params)
+                latency = time.monotonic() - start
+
+            if is_debug:
+                qgis_log(
+                    f"URL: {response.request().url().url()}\nParameters:\n{json.dumps(post_params or {}, indent=2)}"
+                )
+
+            error = None
+            decode_start = time.monotonic()
+            try:
+                result = parse(response)
+            except (exceptions.RouterError, exceptions.Timeout) as e:
+                error = e
+            self._record_timing(
+                url,
+                response,
+                queue_wait=pool_wait + start - wait_start,
+                round_trip=latency,
+                decode=time.monotonic() - decode_start,
+                bytes_out=bytes_out,
+            )
+            pool_wait = 0
+
+            if error is None:
+                controller.on_success(latency, url)
+                return result
+            elif not is_retriable(error):
+                controller.on_success(latency, url)  # the server is fine, the request isn't
+                raise error
+
+            controller.on_failure()
+            retry_after = parse_retry_after(response.rawHeader(b"Retry-After").data().decode())
+            delay = controller.backoff(attempt, retry_after)
+            if time.monotonic() + delay > deadline:
+                raise error
+            if is_debug:
+                qgis_log(
+                    f"Retrying {url} in {delay:.1f} s after '{error}', "
+                    f"allowing {controller.limit} requests in flight",
+                    Qgis.MessageLevel.Warning,
+                )
+            time.sleep(delay)
+            attempt += 1
+
+    def _record_timing(self, url: str, response: QgsNetworkReplyContent, **metrics):
+        """Adds the timings of a request to the plugin's request statistics."""
+        get_request_stats().record(
+            self.base_url,
+            get_request_context("endpoint", url),
+            status=response.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute),
+            bytes_in=response.content().size(),
+            **metrics,
+        )
+
+    def _send(
+        self, url, get_params: dict, post_params: Optional[dict]
+    ) -> Tuple[QgsNetworkReplyContent, int]:
+        """Issues the blocking GET/POST request and returns the full response and the bytes sent."""
+        authed_url = self._generate_auth_url(url, get_params)
+        url_object = QUrl(self.base_url + authed_url)
+
+        nam = self.nam
+        requests_method = nam.blockingGet
+        request = QNetworkRequest(self._request_template)
+        request.setUrl(url_object)
 
         request_args = {"request": request}
+        body = b""
         if post_params:
-            requests_method = self.nam.blockingPost
-            body = QJsonDocument.fromJson(json.dumps(post_params).encode())
-            request_args.update({"data": body.toJson()})
-        response: QgsNetworkReplyContent = requests_method(**request_args)
+            requests_method = nam.blockingPost
+            body = dumps(post_params)
+            if self.compress_requests and len(body) >= COMPRESSION_THRESHOLD:
+                body = gzip.compress(body, compresslevel=COMPRESSION_LEVEL)
+                request.setRawHeader(b"Content-Encoding", b"gzip")
+            request_args.update({"data": body})
 
-        if is_debug:
-            qgis_log(f"URL: {url_object.url()}\nParameters:\n{json.dumps(post_params or {}, indent=2)}")
+        return requests_method(**request_args), len(body)
 
+    @staticmethod
+    def _parse(response: QgsNetworkReplyContent):
+        """Returns the raw bytes for GeoTIFF responses, else the JSON body."""
         if response.rawHeader(b"Content-Type").data().decode() == "image/tiff":
-            return bytes(response.content())
-        else:
-            try:
-                result = get_json_body(response)
-                return result
-            # TODO: handle retriable request similar to the default routingpy client
-            except exceptions.RouterApiError:
-                if not self.skip_api_error:
-                    raise
-                elif is_debug:
-                    qgis_log(
-                        "Router {} returned an API error with "
-                        "the following message:\n{}".format(self.__class__.__name__, response.content()),
-                        Qgis.MessageLevel.Warning,
-                    )
-                return
+            return get_response_body(response)
+
+        return get_json_body(response)
+
+    @staticmethod
+    def _parse_raw(response: QgsNetworkReplyContent) -> bytes:
+        """Returns the undecoded body of successful responses, errors are raised like for JSON bodies."""
+        if response.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute) != 200:
+            get_json_body(response)  # raises the appropriate exception
+
+        return get_response_body(response)
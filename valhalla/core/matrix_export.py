@@ -0,0 +1,140 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+
+from ..global_definitions import MatrixArrayFormat
+from .matrix_result import MatrixResult
+
+# the files of MatrixArrayFormat.NPY, each one memory-mappable with numpy.load(mmap_mode="r")
+NPY_FILES = {
+    "sources": "sources.npy",
+    "targets": "targets.npy",
+    "durations": "durations.npy",
+    "distances": "distances.npy",
+}
+PARQUET_FILE = "matrix.parquet"
+
+
+def _id_array(ids: Sequence) -> np.ndarray:
+    """Returns the IDs as an array which can be loaded without pickle, i.e. not of object dtype."""
+    ids = np.asarray(ids)
+    if ids.dtype == object:
+        ids = ids.astype(str)
+
+    return ids
+
+
+class MatrixArrayWriter(ABC):
+    def __init__(self, folder: Path, source_ids: Sequence, target_ids: Sequence):
+        """
+        Writes a matrix to files block row by block row, so it never needs to be in memory at once.
+        Durations & distances are stored as float32 with NaN for unreachable targets, which holds
+        seconds & meters exactly up to 16.7 million.
+
+        :param folder: the output folder, created if needed
+        :param source_ids: the sources' identifiers in the order of the matrix' rows
+        :param target_ids: the targets' identifiers in the order of the matrix' columns
+        """
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.source_ids = source_ids
+        self.target_ids = target_ids
+
+    @abstractmethod
+    def write_rows(self, rows: range, matrix: MatrixResult) -> None:
+        """Writes the matrix rows of the sources ``rows``, i.e. one complete block row."""
+
+    @abstractmethod
+    def close(self) -> List[Path]:
+        """Finishes the files and returns their paths."""
+
+
+class NpyMatrixWriter(MatrixArrayWriter):
+    """Writes the ID vectors & the (sources, targets) duration & distance arrays to .npy files."""
+
+    def __init__(self, folder: Path, source_ids: Sequence, target_ids: Sequence):
+        super(NpyMatrixWriter, self).__init__(folder, source_ids, target_ids)
+        self.paths = {name: self.folder.joinpath(file_name) for name, file_name in NPY_FILES.items()}
+        np.save(self.paths["sources"], _id_array(source_ids))
+        np.save(self.paths["targets"], _id_array(target_ids))
+
+        shape = (len(source_ids), len(target_ids))
+        self.durations = np.lib.format.open_memmap(
+            self.paths["durations"], mode="w+", dtype=np.float32, shape=shape
+        )
+        self.distances = np.lib.format.open_memmap(
+            self.paths["distances"], mode="w+", dtype=np.float32, shape=shape
+        )
+
+    def write_rows(self, rows: range, matrix: MatrixResult) -> None:
+        self.durations[rows.start : rows.stop] = matrix.durations
+        self.distances[rows.start : rows.stop] = matrix.distances
+
+    def close(self) -> List[Path]:
+        for array in (self.durations, self.distances):
+            array.flush()
+        # release the memory maps, else the files stay locked on Windows
+        self.durations = self.distances = None
+
+        return list(self.paths.values())
+
+
+class ParquetMatrixWriter(MatrixArrayWriter):
+    """Writes one row group per block row of (source, target, duration, distance) to a Parquet file."""
+
+    def __init__(self, folder: Path, source_ids: Sequence, target_ids: Sequence):
+        # optional dependency, only needed for this format
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        super(ParquetMatrixWriter, self).__init__(folder, source_ids, target_ids)
+        self.pa = pa
+        self.path = self.folder.joinpath(PARQUET_FILE)
+        self.source_array = pa.array(list(source_ids))
+        self.target_array = pa.array(list(target_ids))
+        self.schema = pa.schema(
+            [
+                ("source", self.source_array.type),
+                ("target", self.target_array.type),
+                ("duration", pa.float32()),
+                ("distance", pa.float32()),
+            ]
+        )
+        self.writer = pq.ParquetWriter(self.path, self.schema)
+
+    def write_rows(self, rows: range, matrix: MatrixResult) -> None:
+        pa = self.pa
+        targets = len(self.target_array)
+        source_indices = np.repeat(np.arange(rows.start, rows.stop), targets)
+        target_indices = np.tile(np.arange(targets), len(rows))
+        table = pa.Table.from_arrays(
+            [
+                self.source_array.take(pa.array(source_indices)),
+                self.target_array.take(pa.array(target_indices)),
+                # NaN becomes null
+                pa.array(matrix.durations.ravel().astype(np.float32), from_pandas=True),
+                pa.array(matrix.distances.ravel().astype(np.float32), from_pandas=True),
+            ],
+            schema=self.schema,
+        )
+        self.writer.write_table(table)
+
+    def close(self) -> List[Path]:
+        self.writer.close()
+
+        return [self.path]
+
+
+def get_matrix_writer(
+    array_format: MatrixArrayFormat, folder: Path, source_ids: Sequence, target_ids: Sequence
+) -> MatrixArrayWriter:
+    """
+    Returns the writer of the format.
+
+    :raises ImportError: if pyarrow isn't installed for MatrixArrayFormat.PARQUET
+    """
+    writer_class = NpyMatrixWriter if array_format == MatrixArrayFormat.NPY else ParquetMatrixWriter
+
+    return writer_class(folder, source_ids, target_ids)
@@ -0,0 +1,236 @@
+import math
+from typing import Any, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..utils import pbf_utils
+from ..utils.json_utils import iter_json_array
+
+
+class MatrixResult:
+    def __init__(self, durations: np.ndarray, distances: np.ndarray):
+        """
+        A time/distance matrix held in two columnar arrays instead of one object per cell, which keeps
+        big OD matrices cheap in memory and lets them be written out in bulk.
+
+        :param durations: seconds of shape (sources, targets), NaN if the target isn't reachable
+        :param distances: meters of the same shape, NaN if the target isn't reachable
+        """
+        if durations.shape != distances.shape:
+            raise ValueError(
+                f"Durations {durations.shape} and distances {distances.shape} differ in shape"
+            )
+        self.durations = durations
+        self.distances = distances
+
+    @property
+    def sources(self) -> int:
+        return self.durations.shape[0]
+
+    @property
+    def targets(self) -> int:
+        return self.durations.shape[1]
+
+    def __len__(self) -> int:
+        return self.durations.size
+
+    @classmethod
+    def empty(cls) -> "MatrixResult":
+        return cls(np.empty((0, 0)), np.empty((0, 0)))
+
+    @classmethod
+    def unreachable(cls, sources: int, targets: int) -> "MatrixResult":
+        """A matrix without any reachable target, e.g. for a block whose request failed."""
+        return cls(np.full((sources, targets), np.nan), np.full((sources, targets), np.nan))
+
+    @classmethod
+    def concatenate(cls, matrices: Sequence["MatrixResult"]) -> "MatrixResult":
+        """Joins matrices of the same sources side by side, e.g. the blocks of one block row."""
+        return cls(
+            np.hstack([m.durations for m in matrices]), np.hstack([m.distances for m in matrices])
+        )
+
+    def repeat(self, source_counts: Sequence[int], target_counts: Sequence[int]) -> "MatrixResult":
+        """
+        Repeats each source's row & each target's column as often as given, e.g. for locations
+        which were requested once for several features.
+        """
+        return MatrixResult(
+            np.repeat(np.repeat(self.durations, source_counts, axis=0), target_counts, axis=1),
+            np.repeat(np.repeat(self.distances, source_counts, axis=0), target_counts, axis=1),
+        )
+
+    @classmethod
+    def from_json(cls, raw: bytes) -> "MatrixResult":
+        """
+        Builds the matrix from a raw JSON response, decoding one row at a time.
+
+        :raises json.JSONDecodeError: if the response isn't valid JSON
+        """
+        if not raw:  # skipped API error
+            return cls.empty()
+
+        durations: List[List[Optional[float]]] = list()
+        distances: List[List[Optional[float]]] = list()
+        for row in iter_json_array(raw, "sources_to_targets"):
+            durations.append([cell["time"] for cell in row])
+            distances.append([cell["distance"] for cell in row])
+        if not durations:
+            return cls.empty()
+
+        # None turns into NaN; the distances come in kilometers
+        return cls(np.array(durations, dtype=float), np.trunc(np.array(distances, dtype=float) * 1000))
+
+    @classmethod
+    def from_pbf(cls, api) -> "MatrixResult":
+        """Builds the matrix from a decoded protobuf response, see utils.pbf_utils."""
+        if api is None or not len(api.matrix.times):
+            return cls.empty()
+
+        matrix = api.matrix
+        from_indices = np.array(matrix.from_indices, dtype=np.int64)
+        to_indices = np.array(matrix.to_indices, dtype=np.int64)
+        times = np.array(matrix.times, dtype=float)
+        meters = np.array(matrix.distances, dtype=float)
+        unreachable = times >= pbf_utils.MAX_COST
+        times[unreachable] = np.nan
+        meters[unreachable] = np.nan
+
+        shape = (from_indices.max() + 1, to_indices.max() + 1)
+        durations = np.full(shape, np.nan)
+        distances = np.full(shape, np.nan)
+        durations[from_indices, to_indices] = np.round(times)
+        distances[from_indices, to_indices] = meters
+
+        return cls(durations, distances)
+
+    def iter_rows(
+        self,
+        source_ids: Optional[Sequence] = None,
+        target_ids: Optional[Sequence] = None,
+        batch_size: int = 10000,
+    ) -> Iterator[List[tuple]]:
+        """
+        Yields lists of up to ``batch_size`` (source, target, duration, distance) tuples in row-major
+        order, with None for unreachable targets.
+
+        :param source_ids: the identifiers of the sources, their indices by default
+        :param target_ids: the identifiers of the targets, their indices by default
+        """
+        source_ids = range(self.sources) if source_ids is None else source_ids
+        target_ids = range(self.targets) if target_ids is None else target_ids
+        if len(source_ids) != self.sources or len(target_ids) != self.targets:
+            raise ValueError(
+                f"Expected {self.sources} source & {self.targets} target IDs, "
+                f"got {len(source_ids)} & {len(target_ids)}"
+            )
+
+        # one source row at a time, so only the current batch is converted to Python objects
+        batch: List[tuple] = list()
+        for source_idx, source_id in enumerate(source_ids):
+            durations = _to_list(self.durations[source_idx])
+            distances = _to_list(self.distances[source_idx])
+            for target_id, duration, distance in zip(target_ids, durations, distances):
+                batch.append((source_id, target_id, duration, distance))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = list()
+        if batch:
+            yield batch
+
+    def nearest_targets(
+        self, k: int = 0, max_cost: float = 0, by_distance: bool = False
+    ) -> List[List[int]]:
+        """
+        Returns the indices of each source's cheapest targets, cheapest first, without unreachable ones.
+
+        :param k: the maximum number of targets per source, 0 for no limit
+        :param max_cost: the maximum duration or distance, 0 for no limit
+        :param by_distance: whether the targets are ranked by distance instead of duration
+        """
+        if not self.targets:
+            return [list() for _ in range(self.sources)]
+
+        costs = np.nan_to_num(self.distances if by_distance else self.durations, nan=np.inf)
+        if max_cost:
+            costs[costs > max_cost] = np.inf
+        count = min(k, self.targets) if k else self.targets
+        if count < self.targets:
+            candidates = np.argpartition(costs, count - 1, axis=1)[:, :count]
+        else:
+            candidates = np.tile(np.arange(self.targets), (self.sources, 1))
+        order = np.take_along_axis(costs, candidates, axis=1).argsort(axis=1, kind="stable")
+        candidates = np.take_along_axis(candidates, order, axis=1)
+
+        return [
+            row[np.isfinite(source_costs[row])].tolist() for row, source_costs in zip(candidates, costs)
+        ]
+
+    def iter_wide_rows(self, source_ids: Optional[Sequence] = None) -> Iterator[Tuple[Any, list, list]]:
+        """
+        Yields (source, durations, distances) per source, the values in the order of the targets and
+        None for unreachable targets, see MatrixLayout.WIDE.
+
+        :param source_ids: the identifiers of the sources, their indices by default
+        """
+        source_ids = range(self.sources) if source_ids is None else source_ids
+        if len(source_ids) != self.sources:
+            raise ValueError(f"Expected {self.sources} source IDs, got {len(source_ids)}")
+
+        for source_idx, source_id in enumerate(source_ids):
+            yield source_id, _to_list(self.durations[source_idx]), _to_list(self.distances[source_idx])
+
+
+class MatrixBlock(NamedTuple):
+    """The sources & targets of one request of a tiled matrix, see plan_blocks()."""
+
+    sources: range
+    targets: range
+
+
+def plan_blocks(
+    sources: int, targets: int, max_pairs: int, block_sources: int = 0, block_targets: int = 0
+) -> List[MatrixBlock]:
+    """
+    Splits a sources x targets matrix into blocks of at most ``max_pairs`` cells, so that each
+    fits the server's matrix limits, i.e. Valhalla's ``service_limits.max_matrix_location_pairs``.
+    The blocks are as square as the matrix allows and ordered row by row.
+
+    :param max_pairs: the maximum number of cells per block
+    :param block_sources: the number of sources per block, derived from ``max_pairs`` if 0
+    :param block_targets: the number of targets per block, derived from ``max_pairs`` if 0
+    """
+    if not sources or not targets:
+        return list()
+    max_pairs = max(max_pairs, 1)
+
+    if not block_sources and not block_targets:
+        side = max(math.isqrt(max_pairs), 1)
+        if sources <= targets:
+            block_sources = min(sources, side)
+        else:
+            block_targets = min(targets, side)
+    if not block_sources:
+        block_sources = max(max_pairs // block_targets, 1)
+    if not block_targets:
+        block_targets = max(max_pairs // block_sources, 1)
+    block_sources, block_targets = min(block_sources, sources), min(block_targets, targets)
+
+    return [
+        MatrixBlock(
+            range(row, min(row + block_sources, sources)), range(col, min(col + block_targets, targets))
+        )
+        for row in range(0, sources, block_sources)
+        for col in range(0, targets, block_targets)
+    ]
+
+
+def _to_list(values: np.ndarray) -> list:
+    """Converts an array to a list of Python floats, with None for NaN."""
+    unreachable = np.isnan(values)
+    if not unreachable.any():
+        return values.tolist()
+    values = values.astype(object)
+    values[unreachable] = None
+
+    return values.tolist()
@@ -1,27 +1,102 @@
+import hashlib
 import json
-from typing import Iterator, List, Optional, Tuple, Union
+import math
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
+import numpy as np
 from qgis.core import (
+    Qgis,
     QgsFeature,
     QgsFields,
-    QgsGeometry,
-    QgsJsonUtils,
-    QgsLineString,
     QgsPoint,
-    QgsPolygon,
     QgsWkbTypes,
 )
 
 from .. import global_definitions as gd
-from ..global_definitions import DEFAULT_LAYER_FIELDS, FieldNames, RouterProfile
+from ..global_definitions import (
+    DEFAULT_LAYER_FIELDS,
+    FieldNames,
+    OptionsStorage,
+    ResponseFormat,
+    RouterProfile,
+)
 from ..third_party.routingpy.routingpy.direction import Direction
-from ..third_party.routingpy.routingpy.expansion import Expansions
+from ..third_party.routingpy.routingpy.exceptions import (
+    JSONParseError,
+    RouterApiError,
+    RouterServerError,
+)
 from ..third_party.routingpy.routingpy.isochrone import Isochrone, Isochrones
-from ..third_party.routingpy.routingpy.matrix import Matrix
 from ..third_party.routingpy.routingpy.optimized import OptimizedDirection
-from ..third_party.routingpy.routingpy.utils import decode_polyline6
+from ..utils import pbf_utils
+from ..utils.geom_utils import line_from_coords, line_zm_from_coords, polygon_from_rings
+from ..utils.json_utils import dumps, iter_json_array
+from ..utils.logger_utils import qgis_log
+from ..utils.misc_utils import chunked
+from ..utils.polyline_utils import decode_polyline_array, encode_polyline_array
+from ..utils.snap_utils import group_locations, snap_key
+from ..utils.trace_utils import (
+    TracePart,
+    cut_indices,
+    cut_part,
+    join_parts,
+    line_length,
+    split_trace,
+)
+from .http.request_coalescer import RequestCoalescer
+from .http.request_stats import get_request_stats, request_context
+from .http.response_cache import ResponseCache
+from .http.router_client import wait_for
+from .matrix_result import MatrixBlock, MatrixResult
 from .router_factory import RouterFactory
 
+# endpoints whose (potentially huge) responses are decoded item by item instead of all at once
+STREAMED_ENDPOINTS = (gd.RouterEndpoint.EXPANSION, gd.RouterEndpoint.MATRIX)
+# endpoints which can respond with protobuf, see ResponseFormat.PBF
+PBF_ENDPOINTS = (gd.RouterEndpoint.DIRECTIONS, gd.RouterEndpoint.MATRIX, gd.RouterEndpoint.ISOCHRONES)
+# hex digits of the options IDs, see OptionsStorage.OPTIONS_ID
+OPTIONS_ID_LENGTH = 12
+# the number of matrix features handed to a sink at once
+MATRIX_BATCH_SIZE = 10000
+# the number of features of a streamed response handed on at once, see get_results_many()
+STREAMED_BATCH_SIZE = 10000
+# Valhalla's default service_limits.trace, i.e. max_shape & max_distance in meters
+TRACE_MAX_POINTS = 16000
+TRACE_MAX_DISTANCE = 200000
+# trace points shared by consecutive windows of a long trace, see get_mapmatch_results()
+TRACE_OVERLAP = 50
+# called with a job's key and the error its request failed with, see ResultsFactory.iter_responses()
+ErrorCallback = Callable[[Any, Exception], None]
+# endpoints whose request bodies are too big to be serialized & hashed a second time for coalescing,
+# and which are rarely identical anyway
+UNCOALESCED_ENDPOINTS = (
+    gd.RouterEndpoint.MATRIX,
+    gd.RouterEndpoint.ELEVATION,
+    gd.RouterEndpoint.MAP_MATCH,
+)
+# Valhalla's default service_limits.locate.max_locations
+LOCATE_BATCH_SIZE = 200
+# Valhalla's default service_limits.skadi.max_shape
+HEIGHT_MAX_POINTS = 750000
+# the points per /height request, small enough for several requests to be in flight at once
+HEIGHT_BATCH_SIZE = 10000
+
 
 class ResultsFactory:
     def __init__(
@@ -31,6 +106,10 @@ class ResultsFactory:
         profile: gd.RouterProfile,
         url: Optional[str] = None,
         pkg_path: str = "",
+        coalesce: bool = True,
+        response_format: ResponseFormat = ResponseFormat.JSON,
+        options_storage: OptionsStorage = OptionsStorage.PER_FEATURE,
+        **client_kwargs,
     ) -> None:
         """
         The factory class that passes requests to the RouterFactory and processes the resulting outputs.
@@ -39,12 +118,31 @@ class ResultsFactory:
         :param method: One of RouterMethod
         :param profile: One of RouterProfile
         :param url:  If provided, takes precedence over the URL retrieved from the plugin settings.
+        :param coalesce: If True, identical requests which are in flight or recently completed share
+            one server call, e.g. for input layers with duplicate coordinates.
+        :param response_format: ResponseFormat.PBF requests protobuf for ``PBF_ENDPOINTS``, which is
+            a lot smaller & faster to decode than JSON; needs the protobuf package, else JSON is used
+        :param options_storage: OptionsStorage.OPTIONS_ID writes a short ID to the features' OPTIONS
+            field instead of the whole request options, the options are collected in ``run_options``
+        :param client_kwargs: passed on to the HTTP client, e.g. ``max_concurrent_requests``
         """
         self.provider = provider
         self.method = method
         self._profile = profile
         self.url = url
-        self.router = RouterFactory(provider, method, profile, url, pkg_path)
+        self.router = RouterFactory(provider, method, profile, url, pkg_path, **client_kwargs)
+        self.coalescer = RequestCoalescer() if coalesce else None
+
+        if response_format == ResponseFormat.PBF and not pbf_utils.PBF_AVAILABLE:
+            qgis_log(
+                "Install the protobuf package to use the pbf response format, falling back to JSON",
+                Qgis.MessageLevel.Warning,
+            )
+            response_format = ResponseFormat.JSON
+        self.response_format = response_format
+        self.options_storage = options_storage
+        # options ID: serialized options, see feature_options()
+        self.run_options: Dict[str, str] = dict()
 
     @property
     def profile(self) -> RouterProfile:
@@ -75,13 +173,22 @@ class ResultsFactory:
         elif endpoint == gd.RouterEndpoint.ELEVATION:
             return QgsWkbTypes.Type.PointZ
 
-    # flake8: noqa: C901
+    @staticmethod
+    def get_fields(endpoint: gd.RouterEndpoint) -> QgsFields:
+        """Returns the endpoint's default QgsFields."""
+        fields = QgsFields()
+        for field in DEFAULT_LAYER_FIELDS[endpoint]:
+            fields.append(field)
+
+        return fields
+
     def get_results(
         self,
         endpoint: gd.RouterEndpoint,
         locations: List[Tuple[float, float]],
         params: dict,
         fields: Optional[QgsFields] = None,
+        ordered: bool = True,
     ) -> Iterator[QgsFeature] | Iterator[bytes]:
         """
         The main method to retrieve routing results that returns a feature iterator.
@@ -90,155 +197,788 @@ class ResultsFactory:
         :profile: one of RouterProfile
         :locations: locations as iterable of lng/lat coordinate tuples
         :params: additional parameter dictionary
+        :ordered: for endpoints with one request per location (isochrones, expansion, raster), whether
+            the results are yielded in the order of ``locations`` or as soon as they're finished
+        """
+        if not fields:
+            fields = self.get_fields(endpoint)
+        options = self.feature_options(params)
+
+        if endpoint in (
+            gd.RouterEndpoint.ISOCHRONES,
+            gd.RouterEndpoint.EXPANSION,
+            gd.RouterEndpoint.RASTER,
+        ):
+            for _, result in self.iter_responses(endpoint, enumerate(locations), params, ordered):
+                yield from self._build_features(endpoint, result, params, fields, options)
+        else:
+            result = wait_for(self._submit(endpoint, locations, params))
+            yield from self._build_features(endpoint, result, params, fields, options)
+
+    def get_results_many(
+        self,
+        endpoint: gd.RouterEndpoint,
+        jobs: Iterable[Tuple[Any, Any]],
+        params: dict,
+        fields: Optional[QgsFields] = None,
+        ordered: bool = True,
+        on_error: Optional[ErrorCallback] = None,
+    ) -> Iterator[Tuple[Any, List[QgsFeature] | List[bytes]]]:
+        """
+        Issues one request per job concurrently on the provider's request pool and returns
+        an iterator of the jobs' keys and their result features. The features of
+        ``STREAMED_ENDPOINTS`` come in batches of STREAMED_BATCH_SIZE, several with the same key,
+        so a huge response is never held as features all at once.
+
+        :endpoint: one of RouterEndpoint
+        :jobs: iterable of (key, locations) tuples, where locations is what's requested in a single
+            request (e.g. one coordinate pair for isochrones) and key is handed back with the results
+        :params: additional parameter dictionary
+        :ordered: whether results are yielded in the order of ``jobs`` or as soon as they're finished
+        :on_error: see :meth:`iter_responses`
         """
         if not fields:
-            fields = QgsFields()
-            for field in DEFAULT_LAYER_FIELDS[endpoint]:
-                fields.append(field)
+            fields = self.get_fields(endpoint)
+        options = self.feature_options(params)
+
+        for key, result in self.iter_responses(endpoint, jobs, params, ordered, on_error):
+            features = self._build_features(endpoint, result, params, fields, options)
+            if endpoint not in STREAMED_ENDPOINTS:
+                yield key, list(features)
+                continue
+            batches = chunked(features, STREAMED_BATCH_SIZE)
+            yield key, next(batches, list())
+            for batch in batches:
+                yield key, batch
+
+    def iter_responses(
+        self,
+        endpoint: gd.RouterEndpoint,
+        jobs: Iterable[Tuple[Any, Any]],
+        params: dict,
+        ordered: bool = True,
+        on_error: Optional[ErrorCallback] = None,
+    ) -> Iterator[Tuple[Any, Any]]:
+        """
+        Requests all jobs concurrently and yields (key, parsed response) tuples. At most twice the
+        provider's maximum of concurrent requests are queued at any time, so that huge inputs don't
+        pile up in memory. Exceptions are raised when the corresponding response is yielded.
+        Jobs with identical requests share one response, unless the factory doesn't ``coalesce``.
+
+        :endpoint: one of RouterEndpoint
+        :jobs: iterable of (key, locations) tuples, or (key, locations, job params) tuples whose
+            job params update ``params`` for that request, e.g. the sources of a matrix block
+        :params: additional parameter dictionary
+        :ordered: whether responses are yielded in the order of ``jobs`` or in completion order
+        :on_error: if given, it's called with the key & the error of a job whose request failed with
+            an API or server error, which is skipped instead of raising
+        """
+        jobs = iter(jobs)
+        window = self.router.client.max_concurrent_requests * 2
+        pending: Deque[Tuple[Any, Future]] = deque()
+
+        def fill():
+            while len(pending) < window:
+                try:
+                    key, locations, *job_params = next(jobs)
+                except StopIteration:
+                    return
+                request_params = {**params, **job_params[0]} if job_params else params
+                pending.append((key, self._submit(endpoint, locations, request_params)))
+
+        try:
+            fill()
+            while pending:
+                if ordered:
+                    yield from self._finished(*pending.popleft(), on_error)
+                else:
+                    done: Set[Future] = wait([f for _, f in pending], return_when=FIRST_COMPLETED)[0]
+                    for key, future in [job for job in pending if job[1] in done]:
+                        pending.remove((key, future))
+                        yield from self._finished(key, future, on_error)
+                fill()
+        finally:
+            # the consumer stopped early or something failed: don't leave requests behind
+            for _, future in pending:
+                future.cancel()
+
+    @staticmethod
+    def _finished(key, future: Future, on_error: Optional[ErrorCallback]) -> Iterator[Tuple[Any, Any]]:
+        """Yields the job's (key, response), or nothing if it failed & ``on_error`` handled that."""
+        try:
+            result = wait_for(future)
+        except (RouterApiError, RouterServerError) as e:
+            if on_error is None:
+                raise
+            on_error(key, e)
+            return
+        yield key, result
+
+    @staticmethod
+    def serialize_options(params: dict) -> str:
+        """Returns the request options as JSON."""
+        return dumps(params).decode()
+
+    @staticmethod
+    def options_id(options: str) -> str:
+        """Returns a short, stable ID of the serialized options, so identical options share one."""
+        return hashlib.sha1(options.encode()).hexdigest()[:OPTIONS_ID_LENGTH]
+
+    def feature_options(self, params: dict) -> str:
+        """
+        Returns what's written to the features' OPTIONS field, done once per request batch: the
+        serialized options, or their ID for OptionsStorage.OPTIONS_ID, see ``run_options``.
+        """
+        options = self.serialize_options(params)
+        if self.options_storage == OptionsStorage.PER_FEATURE:
+            return options
+
+        options_id = self.options_id(options)
+        self.run_options[options_id] = options
+
+        return options_id
+
+    def _submit(self, endpoint: gd.RouterEndpoint, locations, params: dict) -> Future:
+        """
+        Schedules the request on the provider's request pool, unless an identical one, by its
+        canonical body, is in flight or recently completed, then that one's future is returned.
+        Raw & protobuf responses, which can be huge, are only shared while in flight.
+        """
+        if self.coalescer is None or endpoint in UNCOALESCED_ENDPOINTS:
+            return self.router.client.submit(self._request, endpoint, locations, params)
+
+        url, get_params, post_params = self.router.prepare(endpoint, locations, **params)
+        key = ResponseCache.make_key(
+            self.router.client.base_url,
+            url,
+            get_params,
+            post_params,
+            variant="pbf" if self._is_pbf(endpoint) else "raw" if self._is_raw(endpoint) else "",
+        )
+
+        return self.coalescer.submit(
+            key,
+            lambda: self.router.client.submit(self._request, endpoint, locations, params),
+            keep=not self._is_raw(endpoint),
+        )
+
+    def _is_pbf(self, endpoint: gd.RouterEndpoint) -> bool:
+        """Whether the endpoint's responses are requested as protobuf."""
+        return self.response_format == ResponseFormat.PBF and endpoint in PBF_ENDPOINTS
+
+    def _is_raw(self, endpoint: gd.RouterEndpoint) -> bool:
+        """Whether the endpoint's responses are decoded by this class instead of routingpy."""
+        return endpoint in STREAMED_ENDPOINTS or self._is_pbf(endpoint)
+
+    def _request(self, endpoint: gd.RouterEndpoint, locations, params: dict):
+        """
+        Requests the parsed response, or the raw body for endpoints in ``STREAMED_ENDPOINTS``
+        and for protobuf responses.
+        """
+        with request_context(endpoint=endpoint.lower()):
+            if self._is_raw(endpoint):
+                return self.router.request_raw(
+                    endpoint,
+                    locations,
+                    response_format=(
+                        ResponseFormat.PBF if self._is_pbf(endpoint) else ResponseFormat.JSON
+                    ),
+                    **params,
+                )
+
+            return self.router.request(endpoint, locations, **params)
+
+    @staticmethod
+    def _parse_pbf(raw: bytes):
+        """Decodes a protobuf response, None for skipped API errors."""
+        if not raw:
+            return None
+        try:
+            return pbf_utils.parse_api(raw)
+        except ValueError as e:
+            raise JSONParseError(str(e))
+
+    @staticmethod
+    def _iter_items(raw: bytes, key: str) -> Iterator[Any]:
+        """Decodes the top-level array ``key`` of a raw JSON response one item at a time."""
+        if not raw:  # skipped API error
+            return
+        try:
+            yield from iter_json_array(raw, key)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise JSONParseError(f"Can't decode JSON response: {e}")
+
+    def _build_features(
+        self, endpoint: gd.RouterEndpoint, result, params: dict, fields: QgsFields, options: str
+    ) -> Iterator[QgsFeature]:
+        """
+        Yields the features of :meth:`_process_result` and records the time spent building them,
+        which includes the JSON decoding for ``STREAMED_ENDPOINTS``.
+        """
+        features = self._process_result(endpoint, result, params, fields, options)
+        elapsed = 0.0
+        count = 0
+        try:
+            while True:
+                start = time.monotonic()
+                try:
+                    feature = next(features)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.monotonic() - start
+                count += 1
+                yield feature
+        finally:
+            get_request_stats().record(
+                self.router.client.base_url, endpoint.lower(), features=count, build=elapsed
+            )
+
+    def _process_result(
+        self, endpoint: gd.RouterEndpoint, result, params: dict, fields: QgsFields, options: str
+    ):
+        """Dispatches a parsed response to the endpoint's processing method."""
+        if self._is_pbf(endpoint):
+            result = self._pbf_to_result(endpoint, result)
 
-        if endpoint in (gd.RouterEndpoint.DIRECTIONS):
-            result = self.router.request(endpoint, locations, **params)
-            yield next(self._process_direction_result(result, params, fields))  # is always one feature
+        if endpoint in (gd.RouterEndpoint.DIRECTIONS, gd.RouterEndpoint.TSP):
+            # is always one feature
+            yield next(self._process_direction_result(result, params, fields, options))
 
-        elif endpoint in (gd.RouterEndpoint.MAP_MATCH):
-            result = self.router.request(endpoint, locations, **params)
-            for part in self._process_mapmatch_result(result, params, fields):
-                yield part
+        elif endpoint == gd.RouterEndpoint.MAP_MATCH:
+            yield from self._process_mapmatch_result(result, params, fields, options)
 
         elif endpoint == gd.RouterEndpoint.ISOCHRONES:
-            for loc in locations:
-                result = self.router.request(endpoint, loc, **params)
-                for feat in self._process_isochrone_result(result, params, fields):
-                    yield feat
+            yield from self._process_isochrone_result(result, params, fields, options)
 
         elif endpoint == gd.RouterEndpoint.RASTER:
-            for loc in locations:
-                yield self.router.request(endpoint, loc, **params).image
+            yield result.image
 
         elif endpoint == gd.RouterEndpoint.MATRIX:
-            result = self.router.request(endpoint, locations, **params)
-            for feat in self._process_matrix_result(result, params, fields):
-                yield feat
+            yield from self._process_matrix_result(result, params, fields, options)
 
         elif endpoint == gd.RouterEndpoint.EXPANSION:
-            for loc in locations:
-                result = self.router.request(endpoint, loc, **params)
-                for feat in self._process_expansion_result(result, params, fields):
-                    yield feat
-
-        elif endpoint == gd.RouterEndpoint.TSP:
-            result = self.router.request(endpoint, locations, **params)
-            yield next(self._process_direction_result(result, params, fields))
+            yield from self._process_expansion_result(result, params, fields, options)
 
         elif endpoint == gd.RouterEndpoint.ELEVATION:
-            result = self.router.request(endpoint, locations, **params)
-            for feat in self._process_height_result(result, params, fields):
-                yield feat
+            yield from self._process_height_result(result, params, fields, options)
+
+    def _pbf_to_result(self, endpoint: gd.RouterEndpoint, raw: bytes):
+        """
+        Decodes a protobuf response into what routingpy returns for JSON responses, so the processing
+        methods can treat both the same; matrices stay protobuf, see MatrixResult.from_pbf().
+        """
+        api = self._parse_pbf(raw)
+        if endpoint == gd.RouterEndpoint.MATRIX:
+            return api
+        elif endpoint == gd.RouterEndpoint.DIRECTIONS:
+            if api is None:
+                return Direction()
+            shapes, duration, distance = list(), 0, 0
+            for shape, length, seconds in pbf_utils.iter_route_legs(api):
+                shapes.append(decode_polyline_array(shape))
+                duration += int(seconds)
+                distance += int(length * 1000)
+            return Direction(np.concatenate(shapes) if shapes else list(), duration, distance)
+        elif endpoint == gd.RouterEndpoint.ISOCHRONES:
+            if api is None:
+                return Isochrones()
+            return Isochrones(
+                [
+                    Isochrone(rings, int(value) if value.is_integer() else value, interval_type=metric)
+                    for metric, value, rings in pbf_utils.iter_isochrone_rings(api)
+                ]
+            )
 
     def _process_direction_result(
-        self, direction: Union[Direction | OptimizedDirection], params: dict, fields: QgsFields
+        self,
+        direction: Union[Direction | OptimizedDirection],
+        params: dict,
+        fields: QgsFields,
+        options: str,
     ):
         feature = QgsFeature()
-        line = QgsLineString([QgsPoint(*coords) for coords in direction.geometry])
-        feature.setGeometry(QgsGeometry(line))
+        feature.setGeometry(line_from_coords(direction.geometry))
 
         feature.setFields(fields)
         feature[FieldNames.PROVIDER] = self.provider.lower()
         feature[FieldNames.PROFILE] = self.profile.lower()
         feature[FieldNames.DURATION] = direction.duration
         feature[FieldNames.DISTANCE] = direction.distance
-        feature[FieldNames.OPTIONS] = json.dumps(params)
+        feature[FieldNames.OPTIONS] = options
 
         yield feature
 
-    def _process_isochrone_result(self, isochrones: Isochrones, params: dict, fields: QgsFields):
+    def _process_isochrone_result(
+        self, isochrones: Isochrones, params: dict, fields: QgsFields, options: str
+    ):
         isochrone: Isochrone
         for isochrone in reversed(isochrones):
             if not len(isochrone.geometry):
                 continue
             feat = QgsFeature()
-            geom = QgsPolygon(QgsLineString([QgsPoint(*coords) for coords in isochrone.geometry[0]]))
-            feat.setGeometry(QgsGeometry(geom))
+            feat.setGeometry(polygon_from_rings(isochrone.geometry[:1]))
 
             feat.setFields(fields)
             feat[FieldNames.PROVIDER] = self.provider.lower()
             feat[FieldNames.PROFILE] = self.profile.lower()
             feat[FieldNames.METRIC] = isochrone.interval_type
             feat[FieldNames.CONTOUR] = isochrone.interval
-            feat[FieldNames.OPTIONS] = json.dumps(params)
+            feat[FieldNames.OPTIONS] = options
 
             yield feat
 
-    def _process_matrix_result(self, matrix: Matrix, params: dict, fields: QgsFields):
-        for origin_idx in range(len(matrix.durations)):
-            for dest_idx in range(len(matrix.durations[0])):
-                time = matrix.durations[origin_idx][dest_idx]
-                distance = matrix.distances[origin_idx][dest_idx]
-
-                feat = QgsFeature()
-                feat.setFields(fields)
-                feat[FieldNames.PROVIDER] = self.provider.lower()
-                feat[FieldNames.PROFILE] = self.profile.lower()
-                feat[FieldNames.SOURCE] = origin_idx
-                feat[FieldNames.TARGET] = dest_idx
-                feat[FieldNames.DISTANCE] = distance
-                feat[FieldNames.DURATION] = time
-                feat[FieldNames.OPTIONS] = json.dumps(params)
-
-                yield feat
-
-    def _process_expansion_result(self, expansion: Expansions, params: dict, fields: QgsFields):
-        for gj_feat in expansion.raw["features"]:
+    def _process_matrix_result(self, result, params: dict, fields: QgsFields, options: str):
+        """:param result: the raw JSON body or the decoded protobuf response"""
+        for batch in self.iter_matrix_batches(self._to_matrix(result), fields, options):
+            yield from batch
+
+    def _to_matrix(self, result) -> MatrixResult:
+        """Returns the MatrixResult of a raw JSON body or a decoded protobuf response."""
+        if result is None or isinstance(result, (bytes, bytearray)):
+            try:
+                return MatrixResult.from_json(result)
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise JSONParseError(f"Can't decode JSON response: {e}")
+
+        return MatrixResult.from_pbf(result)
+
+    def locate(
+        self, locations: Sequence[Tuple[float, float]], batch_size: int = LOCATE_BATCH_SIZE
+    ) -> List[Optional[dict]]:
+        """
+        Snaps the locations to the graph with /locate, ``batch_size`` locations per request, which are
+        requested concurrently.
+
+        :param locations: the lng/lat coordinates
+        :returns: the /locate result of each location, None where an API error was skipped
+        """
+        jobs = (
+            (start, locations[start : start + batch_size])
+            for start in range(0, len(locations), batch_size)
+        )
+        results: List[Optional[dict]] = list()
+        for start, result in self.iter_responses(gd.RouterEndpoint.LOCATE, jobs, dict()):
+            results.extend(result or [None] * len(locations[start : start + batch_size]))
+
+        return results
+
+    def get_snap_groups(
+        self, locations: Sequence[Tuple[float, float]], tolerance: float = 0
+    ) -> List[List[int]]:
+        """
+        Groups the locations' indices by where they snap to the graph, within ``tolerance`` meters, so
+        each group's results only need to be requested once, see snap_utils.snap_key().
+        """
+        return group_locations([snap_key(result, tolerance) for result in self.locate(locations)])
+
+    def get_matrix(self, locations: List[Tuple[float, float]], params: dict) -> MatrixResult:
+        """
+        Requests a matrix and returns it as columnar arrays instead of features, the cheapest way
+        to handle big OD matrices, see :meth:`iter_matrix_batches`.
+
+        :locations: locations as iterable of lng/lat coordinate tuples
+        :params: additional parameter dictionary, e.g. "sources" & "destinations" indices
+        """
+        result = wait_for(self._submit(gd.RouterEndpoint.MATRIX, locations, params))
+
+        return self._matrix_from_response(result)
+
+    def _matrix_from_response(self, result) -> MatrixResult:
+        """Returns the MatrixResult of a /sources_to_targets response, see :meth:`_request`."""
+        if self._is_pbf(gd.RouterEndpoint.MATRIX):
+            result = self._parse_pbf(result)
+
+        return self._to_matrix(result)
+
+    def iter_matrix_blocks(
+        self,
+        sources: Sequence[Tuple[float, float]],
+        targets: Sequence[Tuple[float, float]],
+        params: dict,
+        blocks: Iterable[MatrixBlock],
+    ) -> Iterator[Tuple[MatrixBlock, MatrixResult]]:
+        """
+        Requests a tiled matrix one request per block, concurrently, and yields the blocks with their
+        results in the order of ``blocks``, see matrix_result.plan_blocks(). Blocks whose API error
+        was skipped come back unreachable.
+
+        :param sources: the lng/lat coordinates of all sources
+        :param targets: the lng/lat coordinates of all targets
+        :param params: additional parameter dictionary, without "sources" & "destinations"
+        """
+
+        def jobs():
+            for block in blocks:
+                locations = [
+                    *sources[block.sources.start : block.sources.stop],
+                    *targets[block.targets.start : block.targets.stop],
+                ]
+                block_params = {
+                    "sources": list(range(len(block.sources))),
+                    "destinations": list(range(len(block.sources), len(locations))),
+                }
+                yield block, locations, block_params
+
+        for block, result in self.iter_responses(gd.RouterEndpoint.MATRIX, jobs(), params):
+            matrix = self._matrix_from_response(result)
+            if not len(matrix):
+                matrix = MatrixResult.unreachable(len(block.sources), len(block.targets))
+            yield block, matrix
+
+    def iter_matrix_batches(
+        self,
+        matrix: MatrixResult,
+        fields: QgsFields,
+        options: str,
+        source_ids: Optional[Sequence] = None,
+        target_ids: Optional[Sequence] = None,
+        batch_size: int = MATRIX_BATCH_SIZE,
+    ) -> Iterator[List[QgsFeature]]:
+        """
+        Yields the matrix' features in lists of up to ``batch_size``, e.g. for QgsFeatureSink.addFeatures().
+        The attributes are set all at once from a template, rather than field by field.
+
+        :param options: the features' options, see :meth:`feature_options`
+        :param source_ids: written to the SOURCE field instead of the sources' indices
+        :param target_ids: written to the TARGET field instead of the targets' indices
+        """
+        template = [None] * fields.count()
+        for name, value in (
+            (FieldNames.PROVIDER, self.provider.lower()),
+            (FieldNames.PROFILE, self.profile.lower()),
+            (FieldNames.OPTIONS, options),
+        ):
+            if (idx := fields.indexOf(name)) >= 0:
+                template[idx] = value
+        cell_indices = [
+            fields.indexOf(name)
+            for name in (FieldNames.SOURCE, FieldNames.TARGET, FieldNames.DURATION, FieldNames.DISTANCE)
+        ]
+
+        for rows in matrix.iter_rows(source_ids, target_ids, batch_size):
+            batch = list()
+            for row in rows:
+                attributes = list(template)
+                for idx, value in zip(cell_indices, row):
+                    if idx >= 0:
+                        attributes[idx] = value
+                feat = QgsFeature(fields)
+                feat.setAttributes(attributes)
+                batch.append(feat)
+
+            yield batch
+
+    def iter_matrix_wide_batches(
+        self,
+        matrix: MatrixResult,
+        fields: QgsFields,
+        options: str,
+        source_ids: Optional[Sequence] = None,
+        target_ids: Optional[Sequence] = None,
+        batch_size: int = MATRIX_BATCH_SIZE,
+    ) -> Iterator[List[QgsFeature]]:
+        """
+        Like :meth:`iter_matrix_batches` for MatrixLayout.WIDE, i.e. one feature per source with the
+        targets' IDs, durations & distances in list fields, see WIDE_MATRIX_FIELDS.
+        """
+        template = [None] * fields.count()
+        for name, value in (
+            (FieldNames.PROVIDER, self.provider.lower()),
+            (FieldNames.PROFILE, self.profile.lower()),
+            (FieldNames.TARGETS, list(range(matrix.targets) if target_ids is None else target_ids)),
+            (FieldNames.OPTIONS, options),
+        ):
+            if (idx := fields.indexOf(name)) >= 0:
+                template[idx] = value
+        row_indices = [
+            fields.indexOf(name)
+            for name in (FieldNames.SOURCE, FieldNames.DURATIONS, FieldNames.DISTANCES)
+        ]
+
+        batch = list()
+        for row in matrix.iter_wide_rows(source_ids):
+            attributes = list(template)
+            for idx, value in zip(row_indices, row):
+                if idx >= 0:
+                    attributes[idx] = value
+            feat = QgsFeature(fields)
+            feat.setAttributes(attributes)
+            batch.append(feat)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = list()
+        if batch:
+            yield batch
+
+    def _process_expansion_result(self, raw: bytes, params: dict, fields: QgsFields, options: str):
+        interval_type = params.get("interval_type", "time")
+        for gj_feat in self._iter_items(raw, "features"):
             feat = QgsFeature()
             feat.setFields(fields)
-            geom = QgsLineString([QgsPoint(*coords) for coords in gj_feat["geometry"]["coordinates"]])
-            feat.setGeometry(QgsGeometry(geom))
+            feat.setGeometry(line_from_coords(gj_feat["geometry"]["coordinates"]))
             feat[FieldNames.PROVIDER] = self.provider.lower()
             feat[FieldNames.PROFILE] = self.profile.lower()
-            feat[FieldNames.METRIC] = expansion.interval_type
+            feat[FieldNames.METRIC] = interval_type
             feat[FieldNames.DURATION] = gj_feat["properties"]["duration"]
             feat[FieldNames.DISTANCE] = gj_feat["properties"]["distance"]
-            feat[FieldNames.OPTIONS] = json.dumps(params)
+            feat[FieldNames.OPTIONS] = options
 
             yield feat
 
-    def _process_height_result(self, height: dict, params: dict, fields: QgsFields):
-        for idx, coords in enumerate(height["shape"]):
+    def _process_height_result(self, height: dict, params: dict, fields: QgsFields, options: str):
+        coords = [(c["lon"], c["lat"]) for c in height["shape"]]
+        yield from self._height_features(coords, height["height"], fields)
+
+    @staticmethod
+    def _height_features(
+        coords: Sequence[Tuple[float, float]], heights: Sequence[Optional[float]], fields: QgsFields
+    ) -> Iterator[QgsFeature]:
+        """
+        Yields the 3D points, with NaN as z where the elevation model has no data. The coordinates'
+        own z, e.g. of 3D layers, is replaced.
+        """
+        for (lon, lat, *_), height in zip(coords, heights):
             feat = QgsFeature()
             feat.setFields(fields)
-            feat.setGeometry(QgsPoint(coords["lon"], coords["lat"], height["height"][idx]))
+            feat.setGeometry(QgsPoint(lon, lat, math.nan if height is None else height))
 
             yield feat
 
-    def _process_mapmatch_result(self, result: dict, params: dict, fields: QgsFields):
-        coords = []
-        for leg in result["trip"]["legs"]:
-            coords.extend(decode_polyline6(leg["shape"]))
+    def get_height_results(
+        self,
+        batches: Iterable[Tuple[Any, Sequence[Tuple[float, float]]]],
+        fields: Optional[QgsFields] = None,
+        on_error: Optional[ErrorCallback] = None,
+    ) -> Iterator[Tuple[Any, List[QgsFeature]]]:
+        """
+        Requests the heights of batches of points concurrently, one /height request per batch with
+        its points as an encoded polyline6, which is about a tenth of the size of lon/lat objects.
+        The response doesn't repeat the shape, so the batch's own coordinates are used.
+
+        :param batches: iterable of (key, lon/lat coordinates) tuples, each at most the server's
+            'service_limits.skadi.max_shape', see HEIGHT_MAX_POINTS
+        :param on_error: see :meth:`iter_responses`
+        :returns: iterator of (key, 3D point features) in the order of ``batches``
+        """
+        if not fields:
+            fields = self.get_fields(gd.RouterEndpoint.ELEVATION)
+
+        for key, coords, result in self._iter_height_responses(batches, dict(), on_error):
+            yield key, list(self._height_features(coords, result.get("height") or list(), fields))
+
+    def get_height_line_results(
+        self,
+        lines: Iterable[Tuple[Any, Sequence[Tuple[float, float]]]],
+        resample_distance: float = 0,
+        fields: Optional[QgsFields] = None,
+        on_error: Optional[ErrorCallback] = None,
+    ) -> Iterator[Tuple[Any, List[QgsFeature]]]:
+        """
+        Requests the height profiles of lines concurrently, one /height request per line with its
+        vertices as an encoded polyline6 and ``range``, so the server returns the distance along
+        the line with each height.
+
+        :param lines: iterable of (key, lon/lat coordinates) tuples
+        :param resample_distance: the distance in meters between the profile's points, which
+            replace the line's vertices, 0 to keep the vertices
+        :param on_error: see :meth:`iter_responses`
+        :returns: iterator of (key, [line feature with z & m values]) in the order of ``lines``
+        """
+        if not fields:
+            fields = self.get_fields(gd.RouterEndpoint.ELEVATION)
+        params = {"range": True}
+        if resample_distance:
+            params["resample_distance"] = resample_distance
 
-        routes = [coords]
-        durations = [int(result["trip"]["summary"]["time"])]
-        distances = [int(result["trip"]["summary"]["length"] * 1000)]
+        for key, coords, result in self._iter_height_responses(lines, params, on_error):
+            yield key, [self._height_line_feature(coords, result, fields)]
 
+    def _iter_height_responses(
+        self,
+        shapes: Iterable[Tuple[Any, Sequence[Tuple[float, float]]]],
+        params: dict,
+        on_error: Optional[ErrorCallback],
+    ) -> Iterator[Tuple[Any, Sequence[Tuple[float, float]], dict]]:
+        """Requests the shapes as encoded polylines and yields (key, coordinates, response)."""
+
+        def jobs():
+            for key, coords in shapes:
+                yield (key, coords), None, {"encoded_polyline": encode_polyline_array(coords)}
+
+        for (key, coords), result in self.iter_responses(
+            gd.RouterEndpoint.ELEVATION,
+            jobs(),
+            params,
+            on_error=(lambda job_key, error: on_error(job_key[0], error)) if on_error else None,
+        ):
+            yield key, coords, result or dict()
+
+    @staticmethod
+    def _height_line_feature(coords: Sequence, result: dict, fields: QgsFields) -> QgsFeature:
+        """
+        Builds the line of a /height response requested with ``range``: z is the height, NaN where
+        the elevation model has no data, and m the distance in meters along the line. A resampled
+        line comes back as the response's encoded polyline. The vertices' own z, e.g. of 3D layers,
+        is replaced.
+        """
+        if result.get("encoded_polyline"):
+            coords = decode_polyline_array(result["encoded_polyline"])
+        coords = np.atleast_2d(np.asarray(coords, dtype=float))[:, :2].reshape(-1, 2)
+        # [[range, height], ...] with null heights, which become NaN
+        range_heights = np.array(result.get("range_height") or list(), dtype=float).reshape(-1, 2)
+        count = min(len(coords), len(range_heights))
+
+        feat = QgsFeature()
+        feat.setFields(fields)
+        feat.setGeometry(
+            line_zm_from_coords(
+                np.column_stack((coords[:count], range_heights[:count, 1], range_heights[:count, 0]))
+            )
+        )
+
+        return feat
+
+    def _process_mapmatch_result(self, result: dict, params: dict, fields: QgsFields, options: str):
+        for part in self._iter_trace_parts(result):
+            yield self._trace_feature(part, fields, options)
+
+    @staticmethod
+    def _iter_trace_parts(result: dict) -> Iterator[TracePart]:
+        """Yields the matched trip of a /trace_route response, followed by its alternates."""
         # if the trace needed to be broken there'll be more trips
-        if alts := result.get("alternates"):
-            for trip in alts:
-                coords.clear()
-                for leg in trip["trip"]["legs"]:
-                    coords.extend(decode_polyline6(leg["shape"]))
-                routes.append(coords)
-                durations.append(int(result["trip"]["summary"]["time"]))
-                distances.append(int(result["trip"]["summary"]["length"] * 1000))
-
-        for idx, route_coords in enumerate(routes):
-            feature = QgsFeature()
-            line = QgsLineString([QgsPoint(*coords) for coords in route_coords])
-            feature.setGeometry(QgsGeometry(line))
-
-            feature.setFields(fields)
-            feature[FieldNames.PROVIDER] = self.provider.lower()
-            feature[FieldNames.PROFILE] = self.profile.lower()
-            feature[FieldNames.DURATION] = durations[idx]
-            feature[FieldNames.DISTANCE] = distances[idx]
-            feature[FieldNames.OPTIONS] = json.dumps(params)
-
-            yield feature
+        trips = [result["trip"]] + [alt["trip"] for alt in result.get("alternates") or list()]
+
+        for trip in trips:
+            shapes = [decode_polyline_array(leg["shape"]) for leg in trip["legs"]]
+            yield TracePart(
+                np.concatenate(shapes) if shapes else np.empty((0, 2)),
+                trip["summary"]["time"],
+                trip["summary"]["length"] * 1000,
+            )
+
+    def _trace_feature(self, part: TracePart, fields: QgsFields, options: str) -> QgsFeature:
+        feature = QgsFeature()
+        feature.setGeometry(line_from_coords(part.coords))
+
+        feature.setFields(fields)
+        feature[FieldNames.PROVIDER] = self.provider.lower()
+        feature[FieldNames.PROFILE] = self.profile.lower()
+        feature[FieldNames.DURATION] = int(part.duration)
+        feature[FieldNames.DISTANCE] = int(part.distance)
+        feature[FieldNames.OPTIONS] = options
+
+        return feature
+
+    def get_mapmatch_results(
+        self,
+        traces: Iterable[Tuple[Any, Sequence[Tuple[float, float]]]],
+        params: dict,
+        fields: Optional[QgsFields] = None,
+        max_points: int = TRACE_MAX_POINTS,
+        overlap: int = TRACE_OVERLAP,
+        max_distance: float = TRACE_MAX_DISTANCE,
+        on_error: Optional[ErrorCallback] = None,
+    ) -> Iterator[Tuple[Any, List[QgsFeature]]]:
+        """
+        Map matches traces of any length: each trace is split into overlapping windows within the
+        server's trace limits, which are requested concurrently with all other windows. Consecutive
+        windows' matches are cut in the middle of their overlap and joined, duration & distance are
+        shared in proportion to the cut lines' lengths.
+
+        Yields (key, features) per window in the order of ``traces``, the features being the trace's
+        matched trip once its last window is stitched, so only the windows in flight & the trip
+        being stitched are held in memory. Only the trips are stitched, the alternates of a window
+        are yielded as they are with the window.
+
+        :param traces: iterable of (key, lon/lat coordinates) tuples
+        :param max_points: the maximum number of points per request, see trace_utils.split_trace()
+        :param overlap: the number of points consecutive windows share
+        :param max_distance: the maximum length of a window in meters, 0 for no limit
+        :param on_error: see :meth:`iter_responses`, called once per trace with the trace's key; the
+            trace's remaining windows are skipped, the lines completed by its previous windows have
+            been yielded already
+        """
+        if not fields:
+            fields = self.get_fields(gd.RouterEndpoint.MAP_MATCH)
+        options = self.feature_options(params)
+
+        # the key of the last trace with a failed window
+        failed: List[Any] = list()
+
+        def on_window_error(window_key: tuple, error: Exception):
+            if not failed or failed[0] != window_key[0]:
+                failed[:] = [window_key[0]]
+                on_error(window_key[0], error)
+
+        jobs = self._iter_trace_windows(traces, max_points, overlap, max_distance)
+        pending: Optional[TracePart] = None
+        pending_key = None
+        for (key, prev_cut, next_cut, is_last), result in self.iter_responses(
+            gd.RouterEndpoint.MAP_MATCH, jobs, params, on_error=on_window_error if on_error else None
+        ):
+            if failed and failed[0] == key:
+                continue
+            trip, *alternates = self._iter_trace_parts(result)
+            parts, pending = self._stitch_window(
+                trip,
+                prev_cut,
+                next_cut,
+                is_last,
+                # not the rest of a trace whose window failed
+                pending if pending_key == key else None,
+            )
+            pending_key = key
+
+            yield key, [self._trace_feature(part, fields, options) for part in (*parts, *alternates)]
+
+    @staticmethod
+    def _stitch_window(
+        trip: TracePart,
+        prev_cut: Optional[tuple],
+        next_cut: Optional[tuple],
+        is_last: bool,
+        pending: Optional[TracePart],
+    ) -> Tuple[List[TracePart], Optional[TracePart]]:
+        """
+        Cuts a window's matched trip where it overlaps with the neighbouring windows and joins it to
+        the previous windows' trip ``pending``.
+
+        :returns: the completed trip if it's the last window, else the trip continuing in the next
+        """
+        if prev_cut is not None:
+            trip = cut_part(trip, prev_cut[0], keep_head=False, within=prev_cut[1])
+        if pending is not None:
+            trip = join_parts(pending, trip)
+        if is_last:
+            return [trip], None
+
+        if next_cut is not None:
+            trip = cut_part(trip, next_cut[0], keep_head=True, within=next_cut[1])
+
+        return [], trip
+
+    @staticmethod
+    def _iter_trace_windows(
+        traces: Iterable[Tuple[Any, Sequence[Tuple[float, float]]]],
+        max_points: int,
+        overlap: int,
+        max_distance: float,
+    ) -> Iterator[Tuple[tuple, list]]:
+        """
+        Yields the jobs of :meth:`get_mapmatch_results`, keyed by the trace's key, the cuts towards
+        the previous & next window and whether it's the last window. A cut is the point the window's
+        match is cut at and its distance along the trace to the window's end which is cut off.
+        """
+        for key, coords in traces:
+            coords = np.asarray(coords, dtype=float)
+            windows = split_trace(coords, max_points, overlap, max_distance)
+            cuts = cut_indices(windows)
+            for idx, (start, stop) in enumerate(windows):
+                prev_cut = next_cut = None
+                if idx and cuts[idx - 1] is not None:
+                    cut = cuts[idx - 1]
+                    prev_cut = (tuple(coords[cut]), line_length(coords[start : cut + 1]))
+                if cuts[idx] is not None:
+                    next_cut = (tuple(coords[cuts[idx]]), line_length(coords[cuts[idx] : stop]))
+                yield (key, prev_cut, next_cut, idx == len(windows) - 1), coords[start:stop].tolist()
@@ -1,10 +1,18 @@
-from typing import List, Optional, Sequence, Tuple, Union
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence, Tuple, Union
 
 from ..exceptions import ValhallaError
-from ..global_definitions import RouterEndpoint, RouterMethod, RouterProfile, RouterType
+from ..global_definitions import (
+    ResponseFormat,
+    RouterEndpoint,
+    RouterMethod,
+    RouterProfile,
+    RouterType,
+)
 from ..third_party.routingpy.routingpy import get_router_by_name
 from ..third_party.routingpy.routingpy.routers.valhalla import Valhalla
-from .http.router_client import RouterClient
+from .http.provider_group import ProviderGroupClient
+from .http.router_client import DryRunRequest, RouterClient
 
 
 class RouterFactory:
@@ -15,6 +23,7 @@ class RouterFactory:
         profile: RouterProfile,  # we need the profile here already for getting the right OSRM url
         url: str = "",  # still, we want to be able to set the URL manually if desired
         pkg_path: str = "",
+        **client_kwargs,
     ):
         """
         The RouterFactory class handles requests to all routing providers.
@@ -25,16 +34,21 @@ class RouterFactory:
         :param url: if specified, takes precedence over the URLs specified in settings (used by processing algorithms
                     where the user can provide a custom url that differs from the settings).
         :param pkg_path: Path to the graph package for the bindings
+        :param client_kwargs: passed on to the RouterClient, e.g. ``max_concurrent_requests``; if
+            ``providers`` is given, the requests are balanced across them, see ProviderGroupClient
         """
         self.method = method
         self.provider = provider
         self._profile = profile
         self.url = url
+        self.client_kwargs = client_kwargs
+        self.client_class = ProviderGroupClient if client_kwargs.get("providers") else RouterClient
 
         if method == RouterMethod.REMOTE:
             self.router = get_router_by_name(provider.lower())(
                 url,
-                client=RouterClient,
+                client=self.client_class,
+                **client_kwargs,
             )
         # else:
         #     if provider == RouterType.VALHALLA:
@@ -53,9 +67,14 @@ class RouterFactory:
         if self.method == RouterMethod.REMOTE:
             self.router = get_router_by_name(self.provider.lower())(
                 self.url,
-                client=RouterClient,
+                client=self.client_class,
+                **self.client_kwargs,
             )
 
+    @property
+    def client(self) -> RouterClient:
+        return self.router.client
+
     def request(
         self,
         endpoint: RouterEndpoint,
@@ -85,6 +104,59 @@ class RouterFactory:
         else:
             raise RuntimeError(f"Can't find endpoint {endpoint.lower()}")
 
+    def request_async(
+        self,
+        endpoint: RouterEndpoint,
+        locations: Union[List[List[float]], List[Tuple[float, float]], Tuple[float, float]],
+        callback: Optional[Callable[[Future], None]] = None,
+        **kwargs,
+    ) -> Future:
+        """
+        Non-blocking version of :meth:`request`, executed on the provider's request pool.
+
+        :param callback: optional callable receiving the finished future, executed in the pool's thread
+        :returns: the future holding the parsed output of a routingpy request
+        """
+        return self.client.submit(self.request, endpoint, locations, callback=callback, **kwargs)
+
+    def prepare(
+        self,
+        endpoint: RouterEndpoint,
+        locations: Union[List[List[float]], List[Tuple[float, float]], Tuple[float, float]],
+        **kwargs,
+    ) -> Tuple[str, dict, Optional[dict]]:
+        """
+        Builds the request :meth:`request` would send, without sending it.
+
+        :returns: the URL path, the query and the body parameters
+        """
+        try:
+            self.request(endpoint, locations, dry_run=True, **kwargs)
+        except DryRunRequest as e:
+            return e.url, e.get_params, e.post_params
+
+        raise RuntimeError(f"Can't prepare a request for endpoint {endpoint.lower()}")
+
+    def request_raw(
+        self,
+        endpoint: RouterEndpoint,
+        locations: Union[List[List[float]], List[Tuple[float, float]], Tuple[float, float]],
+        response_format: ResponseFormat = ResponseFormat.JSON,
+        **kwargs,
+    ) -> bytes:
+        """
+        Like :meth:`request`, but returns the undecoded response body, so big responses
+        can be decoded incrementally instead of being parsed into one huge object.
+
+        :param response_format: the format Valhalla should respond with, see utils.pbf_utils for pbf
+        :returns: the raw (JSON or protobuf) response body
+        """
+        url, get_params, post_params = self.prepare(endpoint, locations, **kwargs)
+        if response_format == ResponseFormat.PBF:
+            post_params = {**post_params, "format": ResponseFormat.PBF.value}
+
+        return self.client._request(url, get_params, post_params, raw=True)
+
     def height(self, locations: Optional[Sequence[Tuple[float, float]]] = None, **kwargs):
         """Shim for missing /height endpoint in routingpy"""
         params = dict()
@@ -101,12 +173,16 @@ class RouterFactory:
             params["shape_format"] = "polyline6"
         else:
             raise RuntimeError('/height needs either "shape" or "encoded_polyline"')
+        for key in ("range", "resample_distance"):
+            if kwargs.get(key):
+                params[key] = kwargs[key]
 
-        return self.router.client._request("/height", post_params=params)
+        return self.router.client._request("/height", post_params=params, dry_run=kwargs.get("dry_run"))
 
     def trace_route(self, locations: Optional[Sequence[Tuple[float, float]]] = None, **kwargs):
         """Shim for missing /trace_route endpoint in routingpy"""
         params = kwargs
+        dry_run = params.pop("dry_run", None)
 
         params["costing"] = kwargs["profile"]
         params["shape"] = []
@@ -116,4 +192,14 @@ class RouterFactory:
             else:
                 params["shape"].append({"lon": e[0], "lat": e[1]})
 
-        return self.router.client._request("/trace_route", post_params=params)
+        return self.router.client._request("/trace_route", post_params=params, dry_run=dry_run)
+
+    def locate(self, locations: Sequence[Tuple[float, float]], **kwargs):
+        """Shim for missing /locate endpoint in routingpy"""
+        params = {
+            "locations": [{"lon": lon, "lat": lat} for lon, lat in locations],
+            "costing": kwargs["profile"],
+            "verbose": False,
+        }
+
+        return self.router.client._request("/locate", post_params=params, dry_run=kwargs.get("dry_run"))
@@ -1,8 +1,9 @@
 import json
+import threading
 from dataclasses import asdict, dataclass
 from enum import Enum
 from pathlib import Path
-from typing import Any, List, Optional, Union
+from typing import Any, List, Optional, Tuple, Union
 
 from qgis.core import QgsApplication, QgsSettings
 from qgis.PyQt.QtCore import QSettings
@@ -29,6 +30,12 @@ PROFILE_TO_OSRM_URL = {
 IGNORE_PYPI = "ignore_pypi"
 PLUGIN_VERSION = "plugin_version"
 
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+# Qt's default, per thread, since every thread has its own network access manager
+DEFAULT_CONNECTIONS_PER_HOST = 6
+# Valhalla's default service_limits.max_matrix_location_pairs
+DEFAULT_MAX_MATRIX_LOCATION_PAIRS = 2500
+
 
 @dataclass
 class ProviderSetting:
@@ -36,6 +43,32 @@ class ProviderSetting:
     url: str
     auth_key: str
     auth_param: str
+    max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS
+    cache_responses: bool = False
+    compress_responses: bool = False
+    compress_requests: bool = False  # gzip request bodies, which stock Valhalla can't decode
+    http2: bool = True
+    keep_alive: bool = True
+    pipelining: bool = False
+    connections_per_host: int = DEFAULT_CONNECTIONS_PER_HOST
+    timeout: int = 0  # seconds without any data transferred, 0 for QGIS' network timeout
+    max_matrix_location_pairs: int = (
+        DEFAULT_MAX_MATRIX_LOCATION_PAIRS  # matrix tiling, not for the client
+    )
+
+    def client_kwargs(self) -> dict:
+        """The provider's options for the HTTP client."""
+        return {
+            "max_concurrent_requests": self.max_concurrent_requests,
+            "cache_responses": self.cache_responses,
+            "compress_responses": self.compress_responses,
+            "compress_requests": self.compress_requests,
+            "http2": self.http2,
+            "keep_alive": self.keep_alive,
+            "pipelining": self.pipelining,
+            "connections_per_host": self.connections_per_host,
+            "timeout": self.timeout or None,
+        }
 
 
 def get_settings_dir() -> Path:
@@ -63,6 +96,49 @@ DEFAULT_PROVIDERS = [
 DEFAULT_GRAPH_DIR: Path = get_settings_dir().joinpath("graph_dir")
 
 
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """
+    Immutable copy of the settings which are read on hot paths, see get_settings_snapshot().
+    Don't modify the providers, they're shared.
+    """
+
+    debug: bool
+    providers: Tuple[ProviderSetting, ...]  # Valhalla providers
+    graph_dir: Optional[Path]
+    binary_dir: Optional[Path]
+
+
+_snapshot: Optional[SettingsSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_settings_snapshot() -> SettingsSnapshot:
+    """
+    Returns the current settings without touching settings.ini, which is only read again after
+    ValhallaSettings wrote to it. Use it wherever settings are read often, e.g. for every request.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            settings = ValhallaSettings()
+            _snapshot = SettingsSnapshot(
+                debug=settings.is_debug(),
+                providers=tuple(settings.get_providers(RouterType.VALHALLA)),
+                graph_dir=settings.get_graph_dir(),
+                binary_dir=settings.get_binary_dir(),
+            )
+
+        return _snapshot
+
+
+def invalidate_settings_snapshot():
+    """Makes the next get_settings_snapshot() read settings.ini again."""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
+
 class ValhallaSettings(QgsSettings):
     def __init__(self):
         super().__init__(
@@ -93,6 +169,7 @@ class ValhallaSettings(QgsSettings):
         self.setValue(key.value if isinstance(key, Enum) else key, value)
 
         self.endGroup()
+        invalidate_settings_snapshot()
 
     # don't override super().remove()
     def remove_(self, group: Dialogs, key: Any):
@@ -101,6 +178,7 @@ class ValhallaSettings(QgsSettings):
         self.remove(key)
 
         self.endGroup()
+        invalidate_settings_snapshot()
 
     def is_debug(self) -> bool:
         """Lets us know if we're in debug mode"""
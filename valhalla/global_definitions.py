@@ -58,6 +58,7 @@ class RouterEndpoint(IndexableStrEnum):  # TODO: look for case where this can re
     TSP = "optimized_directions"
     ELEVATION = "height"
     MAP_MATCH = "trace_route"
+    LOCATE = "locate"
 
 
 class RouterProfile(str, Enum):
@@ -74,6 +75,31 @@ class RoutingMetric(IndexableStrEnum):
     SHORTEST = "shortest"
 
 
+class LoadBalancing(IndexableStrEnum):
+    ROUND_ROBIN = "round-robin"
+    LEAST_LATENCY = "least latency"
+
+
+class ResponseFormat(IndexableStrEnum):
+    JSON = "json"
+    PBF = "pbf"
+
+
+class OptionsStorage(IndexableStrEnum):
+    PER_FEATURE = "per feature"
+    OPTIONS_ID = "options ID"
+
+
+class MatrixLayout(IndexableStrEnum):
+    LONG = "one row per source & target"
+    WIDE = "one row per source"
+
+
+class MatrixArrayFormat(IndexableStrEnum):
+    NPY = "npy"
+    PARQUET = "parquet"
+
+
 class FieldNames(str, Enum):
     ID = "id"
     LOCATION_ID = "location_id"  # expansion endpoint
@@ -87,9 +113,15 @@ class FieldNames(str, Enum):
     DISTANCE = "distance"
     CONTOUR = "contour"
     OPTIONS = "options"
+    OPTIONS_ID = "options_id"  # options table
+    TARGETS = "targets"  # wide matrix
+    DURATIONS = "durations"  # wide matrix
+    DISTANCES = "distances"  # wide matrix
     WEIGHT = "weight"
     PREDEFINED = "predefined"
     HEIGHT = "height"  # /height endpoint
+    KEY = "key"  # failures table
+    ERROR = "error"  # failures table
 
 
 DEFAULT_LAYER_FIELDS: Dict[RouterEndpoint, Tuple[QgsField, ...]] = {
@@ -143,6 +175,29 @@ DEFAULT_LAYER_FIELDS: Dict[RouterEndpoint, Tuple[QgsField, ...]] = {
     RouterEndpoint.ELEVATION: tuple(),
 }
 
+# MatrixLayout.WIDE: the targets' IDs & the values per target in list fields
+WIDE_MATRIX_FIELDS: Tuple[QgsField, ...] = (
+    QgsField(FieldNames.PROVIDER, QVariant.String),
+    QgsField(FieldNames.PROFILE, QVariant.String),
+    QgsField(FieldNames.SOURCE, QVariant.Int),
+    QgsField(FieldNames.TARGETS, QVariant.List, subType=QVariant.Int),
+    QgsField(FieldNames.DURATIONS, QVariant.List, subType=QVariant.Double),
+    QgsField(FieldNames.DISTANCES, QVariant.List, subType=QVariant.Double),
+    QgsField(FieldNames.OPTIONS, QVariant.String),
+)
+
+# the table holding the request options once per run, see OptionsStorage.OPTIONS_ID
+OPTIONS_TABLE_FIELDS: Tuple[QgsField, ...] = (
+    QgsField(FieldNames.OPTIONS_ID, QVariant.String),
+    QgsField(FieldNames.OPTIONS, QVariant.String),
+)
+
+# the table holding the failed requests of a run with skipped failures
+FAILURES_TABLE_FIELDS: Tuple[QgsField, ...] = (
+    QgsField(FieldNames.KEY, QVariant.String),
+    QgsField(FieldNames.ERROR, QVariant.String),
+)
+
 
 SETTINGS_WIDGETS_MAP = {
     RouterProfile.PED: {
@@ -0,0 +1,67 @@
+# Form implementation generated from reading ui file 'valhalla/resources/ui/dlg_request_stats.ui'
+#
+# Created by: PyQt6 UI code generator 6.11.0
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic6 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+
+class Ui_RequestStats(object):
+    def setupUi(self, RequestStats):
+        RequestStats.setObjectName("RequestStats")
+        RequestStats.resize(900, 600)
+        self.verticalLayout = QtWidgets.QVBoxLayout(RequestStats)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.ui_summary_table = QtWidgets.QTableWidget(parent=RequestStats)
+        self.ui_summary_table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.ui_summary_table.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.SingleSelection)
+        self.ui_summary_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        self.ui_summary_table.setObjectName("ui_summary_table")
+        self.ui_summary_table.setColumnCount(0)
+        self.ui_summary_table.setRowCount(0)
+        self.verticalLayout.addWidget(self.ui_summary_table)
+        self.ui_histogram = QtWidgets.QTextBrowser(parent=RequestStats)
+        self.ui_histogram.setMaximumSize(QtCore.QSize(16777215, 220))
+        self.ui_histogram.setObjectName("ui_histogram")
+        self.verticalLayout.addWidget(self.ui_histogram)
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.ui_refresh_btn = QtWidgets.QPushButton(parent=RequestStats)
+        self.ui_refresh_btn.setObjectName("ui_refresh_btn")
+        self.horizontalLayout.addWidget(self.ui_refresh_btn)
+        self.ui_clear_btn = QtWidgets.QPushButton(parent=RequestStats)
+        self.ui_clear_btn.setObjectName("ui_clear_btn")
+        self.horizontalLayout.addWidget(self.ui_clear_btn)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
+        self.horizontalLayout.addItem(spacerItem)
+        self.ui_export_csv_btn = QtWidgets.QPushButton(parent=RequestStats)
+        self.ui_export_csv_btn.setObjectName("ui_export_csv_btn")
+        self.horizontalLayout.addWidget(self.ui_export_csv_btn)
+        self.ui_export_json_btn = QtWidgets.QPushButton(parent=RequestStats)
+        self.ui_export_json_btn.setObjectName("ui_export_json_btn")
+        self.horizontalLayout.addWidget(self.ui_export_json_btn)
+        self.verticalLayout.addLayout(self.horizontalLayout)
+        self.buttonBox = QtWidgets.QDialogButtonBox(parent=RequestStats)
+        self.buttonBox.setOrientation(QtCore.Qt.Orientation.Horizontal)
+        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.StandardButton.Close)
+        self.buttonBox.setObjectName("buttonBox")
+        self.verticalLayout.addWidget(self.buttonBox)
+
+        self.retranslateUi(RequestStats)
+        self.buttonBox.rejected.connect(RequestStats.reject) # type: ignore
+        QtCore.QMetaObject.connectSlotsByName(RequestStats)
+
+    def retranslateUi(self, RequestStats):
+        _translate = QtCore.QCoreApplication.translate
+        RequestStats.setWindowTitle(_translate("RequestStats", "Request Statistics"))
+        self.ui_summary_table.setToolTip(_translate("RequestStats", "Timings in milliseconds, sizes in kilobytes. Select a timing row to show its histogram."))
+        self.ui_summary_table.setSortingEnabled(True)
+        self.ui_refresh_btn.setText(_translate("RequestStats", "Refresh"))
+        self.ui_clear_btn.setText(_translate("RequestStats", "Clear"))
+        self.ui_export_csv_btn.setToolTip(_translate("RequestStats", "Exports every single request record"))
+        self.ui_export_csv_btn.setText(_translate("RequestStats", "Export CSV"))
+        self.ui_export_json_btn.setToolTip(_translate("RequestStats", "Exports the summary and every single request record"))
+        self.ui_export_json_btn.setText(_translate("RequestStats", "Export JSON"))
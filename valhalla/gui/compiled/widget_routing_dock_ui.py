@@ -284,6 +284,13 @@ class Ui_routing_widget(object):
         self.ui_debug_btn.setCheckable(True)
         self.ui_debug_btn.setObjectName("ui_debug_btn")
         self.horizontalLayout_8.addWidget(self.ui_debug_btn)
+        self.ui_stats_btn = QtWidgets.QToolButton(parent=routing_widget)
+        self.ui_stats_btn.setText("")
+        icon = QtGui.QIcon.fromTheme(":images/themes/default/mActionStatisticalSummary.svg")
+        self.ui_stats_btn.setIcon(icon)
+        self.ui_stats_btn.setIconSize(QtCore.QSize(32, 32))
+        self.ui_stats_btn.setObjectName("ui_stats_btn")
+        self.horizontalLayout_8.addWidget(self.ui_stats_btn)
         spacerItem3 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
         self.horizontalLayout_8.addItem(spacerItem3)
         self.ui_about_btn = QtWidgets.QToolButton(parent=routing_widget)
@@ -376,4 +383,5 @@ class Ui_routing_widget(object):
         self.options_box.setTitle(_translate("routing_widget", "Options"))
         self.execute_btn.setText(_translate("routing_widget", "Execute"))
         self.ui_graph_btn.setToolTip(_translate("routing_widget", "Loads the current graph extent as polygon layer and checks for things like admins & tz dbs"))
+        self.ui_stats_btn.setToolTip(_translate("routing_widget", "Shows timing statistics of the requests to the routing providers"))
 from qgis import gui
@@ -0,0 +1,98 @@
+from pathlib import Path
+
+from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtWidgets import QDialog, QFileDialog, QTableWidgetItem
+
+from ..core.http.request_stats import PERCENTILES, SIZE_METRICS, TIME_METRICS, get_request_stats
+from .compiled.dlg_request_stats_ui import Ui_RequestStats
+
+COLUMNS = (
+    ("provider", "endpoint", "metric", "count", "mean") + tuple(f"p{q}" for q in PERCENTILES) + ("max",)
+)
+HISTOGRAM_WIDTH = 50  # characters of the longest bar
+
+
+class RequestStatsDialog(QDialog, Ui_RequestStats):
+    def __init__(self, parent=None):
+        """Shows the aggregated request timings of all providers & endpoints, see RequestStats."""
+        super(RequestStatsDialog, self).__init__(parent)
+        self.setupUi(self)
+
+        self.ui_summary_table.setColumnCount(len(COLUMNS))
+        self.ui_summary_table.setHorizontalHeaderLabels(COLUMNS)
+
+        self.ui_refresh_btn.clicked.connect(self.refresh)
+        self.ui_clear_btn.clicked.connect(self._on_clear)
+        self.ui_export_csv_btn.clicked.connect(lambda: self._on_export("csv"))
+        self.ui_export_json_btn.clicked.connect(lambda: self._on_export("json"))
+        self.ui_summary_table.itemSelectionChanged.connect(self._on_selection_changed)
+
+        self.refresh()
+
+    def refresh(self):
+        """Reloads the summary table from the current request statistics."""
+        table = self.ui_summary_table
+        table.setSortingEnabled(False)
+        table.clearContents()
+
+        summary = get_request_stats().summary()
+        table.setRowCount(len(summary))
+        for row_idx, row in enumerate(summary):
+            # show timings in ms and sizes in kB
+            factor = 1000 if row["metric"] in TIME_METRICS else 1 / 1024
+            for col_idx, column in enumerate(COLUMNS):
+                value = row[column]
+                item = QTableWidgetItem()
+                if isinstance(value, str):
+                    item.setText(value)
+                elif column == "count":
+                    item.setData(Qt.ItemDataRole.DisplayRole, value)
+                else:
+                    item.setData(Qt.ItemDataRole.DisplayRole, round(value * factor, 1))
+                table.setItem(row_idx, col_idx, item)
+
+        table.setSortingEnabled(True)
+        table.resizeColumnsToContents()
+        self.ui_histogram.clear()
+
+    def _on_selection_changed(self):
+        """Shows the histogram of the selected timing row."""
+        self.ui_histogram.clear()
+        rows = self.ui_summary_table.selectionModel().selectedRows()
+        if not rows:
+            return
+
+        provider, endpoint, metric = (
+            self.ui_summary_table.item(rows[0].row(), col).text() for col in range(3)
+        )
+        if metric in SIZE_METRICS:
+            return
+
+        histogram = get_request_stats().histogram(provider, endpoint, metric)
+        max_count = max(count for _, count in histogram) or 1
+        lines = [f"{metric} of {endpoint} at {provider}:"]
+        lower = 0.0
+        for upper, count in histogram:
+            label = f"{lower * 1000:g} - {upper * 1000:g} ms"
+            lines.append(f"{label:>20} | {'#' * round(count / max_count * HISTOGRAM_WIDTH)} {count}")
+            lower = upper
+
+        self.ui_histogram.setPlainText("\n".join(lines))
+
+    def _on_clear(self):
+        get_request_stats().clear()
+        self.refresh()
+
+    def _on_export(self, file_format: str):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export request statistics", "", f"{file_format.upper()} (*.{file_format})"
+        )
+        if not path:
+            return
+
+        path = Path(path).with_suffix(f".{file_format}")
+        stats = get_request_stats()
+        if file_format == "csv":
+            stats.to_csv(path)
+        else:
+            stats.to_json(path)
@@ -4,11 +4,13 @@ from dataclasses import dataclass
 
 from qgis.gui import QgsCollapsibleGroupBox
 from qgis.PyQt.QtWidgets import (
+    QCheckBox,
     QDialog,
     QGridLayout,
     QInputDialog,
     QLabel,
     QLineEdit,
+    QSpinBox,
     QVBoxLayout,
 )
 
@@ -22,11 +24,31 @@ class ProvUiProps:
     URL_TEXT: str
     KEY_TEXT: str
     PARAM_TEXT: str
+    CONCURRENCY_SPIN: str
+    CACHE_CHECK: str
+    COMPRESS_RESPONSES_CHECK: str
+    COMPRESS_REQUESTS_CHECK: str
+    HTTP2_CHECK: str
+    KEEP_ALIVE_CHECK: str
+    PIPELINING_CHECK: str
+    CONNECTIONS_SPIN: str
+    TIMEOUT_SPIN: str
+    MATRIX_PAIRS_SPIN: str
 
     def __init__(self, provider: ProviderSetting):
         self.URL_TEXT = f"{provider.name}_{provider.url}"
         self.KEY_TEXT = f"{provider.name}_{provider.auth_key}"
         self.PARAM_TEXT = f"{provider.name}_{provider.auth_param}"
+        self.CONCURRENCY_SPIN = f"{provider.name}_max_concurrent_requests"
+        self.CACHE_CHECK = f"{provider.name}_cache_responses"
+        self.COMPRESS_RESPONSES_CHECK = f"{provider.name}_compress_responses"
+        self.COMPRESS_REQUESTS_CHECK = f"{provider.name}_compress_requests"
+        self.HTTP2_CHECK = f"{provider.name}_http2"
+        self.KEEP_ALIVE_CHECK = f"{provider.name}_keep_alive"
+        self.PIPELINING_CHECK = f"{provider.name}_pipelining"
+        self.CONNECTIONS_SPIN = f"{provider.name}_connections_per_host"
+        self.TIMEOUT_SPIN = f"{provider.name}_timeout"
+        self.MATRIX_PAIRS_SPIN = f"{provider.name}_max_matrix_location_pairs"
 
 
 class ProviderDialog(QDialog, Ui_RoutingProviders):
@@ -61,6 +83,26 @@ class ProviderDialog(QDialog, Ui_RoutingProviders):
             current_provider.auth_key = box.findChild(QLineEdit, ui_props.KEY_TEXT).text()
             current_provider.url = box.findChild(QLineEdit, ui_props.URL_TEXT).text()
             current_provider.auth_param = box.findChild(QLineEdit, ui_props.PARAM_TEXT).text()
+            current_provider.max_concurrent_requests = box.findChild(
+                QSpinBox, ui_props.CONCURRENCY_SPIN
+            ).value()
+            current_provider.cache_responses = box.findChild(QCheckBox, ui_props.CACHE_CHECK).isChecked()
+            current_provider.compress_responses = box.findChild(
+                QCheckBox, ui_props.COMPRESS_RESPONSES_CHECK
+            ).isChecked()
+            current_provider.compress_requests = box.findChild(
+                QCheckBox, ui_props.COMPRESS_REQUESTS_CHECK
+            ).isChecked()
+            current_provider.http2 = box.findChild(QCheckBox, ui_props.HTTP2_CHECK).isChecked()
+            current_provider.keep_alive = box.findChild(QCheckBox, ui_props.KEEP_ALIVE_CHECK).isChecked()
+            current_provider.pipelining = box.findChild(QCheckBox, ui_props.PIPELINING_CHECK).isChecked()
+            current_provider.connections_per_host = box.findChild(
+                QSpinBox, ui_props.CONNECTIONS_SPIN
+            ).value()
+            current_provider.timeout = box.findChild(QSpinBox, ui_props.TIMEOUT_SPIN).value()
+            current_provider.max_matrix_location_pairs = box.findChild(
+                QSpinBox, ui_props.MATRIX_PAIRS_SPIN
+            ).value()
             ValhallaSettings().set_provider(RouterType.VALHALLA, current_provider)
 
         return super().accept()
@@ -149,5 +191,115 @@ class ProviderDialog(QDialog, Ui_RoutingProviders):
         param_text.setText(provider.auth_param)
         grid_layout.addWidget(param_text, 3, 4, 1, 1)
 
+        concurrency_label = QLabel(box)
+        concurrency_label.setText("Max. parallel requests")
+        concurrency_label.setToolTip("The number of requests in flight to this provider at any time")
+        grid_layout.addWidget(concurrency_label, 4, 0, 1, 3)
+
+        concurrency_spin = QSpinBox(box)
+        concurrency_spin.setObjectName(ui_props.CONCURRENCY_SPIN)
+        concurrency_spin.setRange(1, 64)
+        concurrency_spin.setValue(provider.max_concurrent_requests)
+        grid_layout.addWidget(concurrency_spin, 4, 3, 1, 2)
+
+        cache_check = QCheckBox(box)
+        cache_check.setObjectName(ui_props.CACHE_CHECK)
+        cache_check.setText("Cache responses")
+        cache_check.setToolTip(
+            "Stores responses on disk and answers repeated identical requests from there "
+            "until the provider's graph changes"
+        )
+        cache_check.setChecked(provider.cache_responses)
+        grid_layout.addWidget(cache_check, 5, 0, 1, 5)
+
+        compress_responses_check = QCheckBox(box)
+        compress_responses_check.setObjectName(ui_props.COMPRESS_RESPONSES_CHECK)
+        compress_responses_check.setText("Compressed responses")
+        compress_responses_check.setToolTip(
+            "Asks for gzip-compressed responses, which servers ignore if they don't support it"
+        )
+        compress_responses_check.setChecked(provider.compress_responses)
+        grid_layout.addWidget(compress_responses_check, 6, 0, 1, 3)
+
+        compress_requests_check = QCheckBox(box)
+        compress_requests_check.setObjectName(ui_props.COMPRESS_REQUESTS_CHECK)
+        compress_requests_check.setText("Compress large requests")
+        compress_requests_check.setToolTip(
+            "Sends large request bodies gzip-compressed; stock Valhalla can't decode them, only "
+            "enable it if a proxy in front of the server does"
+        )
+        compress_requests_check.setChecked(provider.compress_requests)
+        grid_layout.addWidget(compress_requests_check, 6, 3, 1, 2)
+
+        http2_check = QCheckBox(box)
+        http2_check.setObjectName(ui_props.HTTP2_CHECK)
+        http2_check.setText("Use HTTP/2")
+        http2_check.setToolTip(
+            "Multiplexes all requests over a single HTTPS connection if the server supports it, "
+            "which saves connection setup & TLS handshakes"
+        )
+        http2_check.setChecked(provider.http2)
+        grid_layout.addWidget(http2_check, 7, 0, 1, 5)
+
+        keep_alive_check = QCheckBox(box)
+        keep_alive_check.setObjectName(ui_props.KEEP_ALIVE_CHECK)
+        keep_alive_check.setText("Keep connections alive")
+        keep_alive_check.setToolTip("Reuses HTTP/1.1 connections for subsequent requests")
+        keep_alive_check.setChecked(provider.keep_alive)
+        grid_layout.addWidget(keep_alive_check, 8, 0, 1, 3)
+
+        pipelining_check = QCheckBox(box)
+        pipelining_check.setObjectName(ui_props.PIPELINING_CHECK)
+        pipelining_check.setText("Pipelining")
+        pipelining_check.setToolTip(
+            "Sends HTTP/1.1 requests without waiting for the previous response; "
+            "the server and any proxy in front of it need to support it"
+        )
+        pipelining_check.setChecked(provider.pipelining)
+        grid_layout.addWidget(pipelining_check, 8, 3, 1, 2)
+
+        connections_label = QLabel(box)
+        connections_label.setText("Connections per host")
+        connections_label.setToolTip(
+            "The maximum number of parallel HTTP/1.1 connections of each request thread (Qt >= 6.5)"
+        )
+        grid_layout.addWidget(connections_label, 9, 0, 1, 3)
+
+        connections_spin = QSpinBox(box)
+        connections_spin.setObjectName(ui_props.CONNECTIONS_SPIN)
+        connections_spin.setRange(1, 64)
+        connections_spin.setValue(provider.connections_per_host)
+        grid_layout.addWidget(connections_spin, 9, 3, 1, 2)
+
+        timeout_label = QLabel(box)
+        timeout_label.setText("Timeout")
+        timeout_label.setToolTip(
+            "Aborts requests which didn't transfer any data for this long; "
+            "0 uses the QGIS network timeout"
+        )
+        grid_layout.addWidget(timeout_label, 10, 0, 1, 3)
+
+        timeout_spin = QSpinBox(box)
+        timeout_spin.setObjectName(ui_props.TIMEOUT_SPIN)
+        timeout_spin.setRange(0, 3600)
+        timeout_spin.setSuffix(" s")
+        timeout_spin.setSpecialValueText("QGIS default")
+        timeout_spin.setValue(provider.timeout)
+        grid_layout.addWidget(timeout_spin, 10, 3, 1, 2)
+
+        matrix_pairs_label = QLabel(box)
+        matrix_pairs_label.setText("Matrix location pairs per request")
+        matrix_pairs_label.setToolTip(
+            "Bigger matrices are split into blocks of at most this many source/target pairs; "
+            "should not exceed the server's 'service_limits.max_matrix_location_pairs'"
+        )
+        grid_layout.addWidget(matrix_pairs_label, 11, 0, 1, 3)
+
+        matrix_pairs_spin = QSpinBox(box)
+        matrix_pairs_spin.setObjectName(ui_props.MATRIX_PAIRS_SPIN)
+        matrix_pairs_spin.setRange(1, 100000000)
+        matrix_pairs_spin.setValue(provider.max_matrix_location_pairs)
+        grid_layout.addWidget(matrix_pairs_spin, 11, 3, 1, 2)
+
         box.setSaveCollapsedState(False)
         self.provider_layout.addWidget(box)
@@ -1,5 +1,6 @@
 import json
 import webbrowser
+from concurrent.futures import CancelledError
 from copy import deepcopy
 from typing import List, Optional, Tuple
 
@@ -49,6 +50,7 @@ from ..utils.resource_utils import (
 )
 from .compiled.widget_routing_dock_ui import Ui_routing_widget
 from .dlg_about import AboutDialog
+from .dlg_request_stats import RequestStatsDialog
 from .gui_utils import add_msg_bar
 from .widgets.widget_router import PROFILE_TO_UI, RouterWidget
 from .widgets.widget_routing_params import RoutingParamsWidget
@@ -117,6 +119,7 @@ class RoutingDockWidget(QgsDockWidget, Ui_routing_widget):
             self.router_widget.method,
             self.router_widget.profile,
             self.router_widget.provider.url,
+            **self.router_widget.provider.client_kwargs(),
         )
 
         self._on_profile_change()
@@ -128,6 +131,7 @@ class RoutingDockWidget(QgsDockWidget, Ui_routing_widget):
         self.execute_btn.clicked.connect(self._on_execute)
         self.ui_about_btn.clicked.connect(self._on_about_click)
         self.ui_log_btn.clicked.connect(self._on_log_click)
+        self.ui_stats_btn.clicked.connect(self._on_stats_click)
         self.router_widget.mode_btns.buttonToggled.connect(self._on_profile_change)
         self.ui_graph_btn.clicked.connect(self._on_graph_click)
         self.ui_help_btn.clicked.connect(lambda: webbrowser.open(HELP_URL))
@@ -272,8 +276,14 @@ class RoutingDockWidget(QgsDockWidget, Ui_routing_widget):
             out_lyr.dataProvider().addAttributes(layer_fields)
             out_lyr.updateFields()
 
-            for feat in self.factory.get_results(endpoint, locations, params):
-                out_lyr.dataProvider().addFeature(feat)
+            if endpoint == RouterEndpoint.MATRIX:
+                matrix = self.factory.get_matrix(locations, params)
+                options = self.factory.feature_options(params)
+                for batch in self.factory.iter_matrix_batches(matrix, layer_fields, options):
+                    out_lyr.dataProvider().addFeatures(batch)
+            else:
+                for feat in self.factory.get_results(endpoint, locations, params):
+                    out_lyr.dataProvider().addFeature(feat)
 
             out_lyr.updateExtents()
 
@@ -315,6 +325,8 @@ class RoutingDockWidget(QgsDockWidget, Ui_routing_widget):
             {"lon": wp._position[0], "lat": wp._position[1], **wp._kwargs} for wp in locations
         ]
 
+        # the GUI's events are processed while waiting for the response, see wait_for()
+        self.execute_btn.setEnabled(False)
         try:
             lyr = self._get_output_layer(self.endpoint, locations, params)
         except routingpy.exceptions.RouterError as e:  # HTTP error
@@ -332,6 +344,11 @@ class RoutingDockWidget(QgsDockWidget, Ui_routing_widget):
         except (RuntimeError, ValhallaError) as e:  # Bindings & factory error
             self.status_bar.pushMessage("Error", str(e), Qgis.MessageLevel.Critical, 8)
             return
+        except CancelledError:
+            # the plugin was unloaded while waiting, which cancels the requests
+            return
+        finally:
+            self.execute_btn.setEnabled(True)
 
         QgsProject.instance().addMapLayer(lyr)
 
@@ -387,6 +404,10 @@ class RoutingDockWidget(QgsDockWidget, Ui_routing_widget):
 
         msg_box.exec()
 
+    def _on_stats_click(self):
+        stats = RequestStatsDialog(self)
+        stats.exec()
+
     def _on_provider_changed(self, row_id: int):
         """
         Enables/disables certain UI elements depending on the provider.
@@ -401,7 +422,14 @@ class RoutingDockWidget(QgsDockWidget, Ui_routing_widget):
         provider: ProviderSetting = self.router_widget.provider
 
         # reset the factory
-        self.factory = ResultsFactory(router_type, method, profile, pkg_path=pkg_path, url=provider.url)
+        self.factory = ResultsFactory(
+            router_type,
+            method,
+            profile,
+            pkg_path=pkg_path,
+            url=provider.url,
+            **provider.client_kwargs(),
+        )
 
     def _on_graph_click(self):
         curr_prov: ProviderSetting = self.router_widget.ui_cmb_prov.currentData()[-1]
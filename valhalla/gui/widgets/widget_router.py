@@ -14,7 +14,7 @@ from qgis.PyQt.QtWidgets import (
     QWidget,
 )
 
-from ...core.settings import ProviderSetting, ValhallaSettings
+from ...core.settings import ProviderSetting, get_settings_snapshot
 from ...global_definitions import RouterMethod, RouterProfile, RouterType
 from ...gui.dlg_plugin_settings import PluginSettingsDialog
 from ...gui.dlg_routing_providers import ProviderDialog
@@ -47,7 +47,7 @@ class RouterWidget(QWidget):
         self.setupUi()
 
         self.settings_dlg = PluginSettingsDialog(self)
-        graph_dir = ValhallaSettings().get_graph_dir()
+        graph_dir = get_settings_snapshot().graph_dir
 
         self._populate_providers()
         self._on_graph_changed(self.ui_cmb_graphs.currentText())
@@ -93,7 +93,7 @@ class RouterWidget(QWidget):
         self.valhalla_service.stateChanged.connect(self._on_server_state_changed)
 
     def _refresh_graph_combo(self, _path: str = ""):
-        graph_dir = ValhallaSettings().get_graph_dir()
+        graph_dir = get_settings_snapshot().graph_dir
         current = self.ui_cmb_graphs.currentText()
         items = sorted(
             (p.name for p in graph_dir.iterdir() if p.is_dir() and (p / ID_JSON).exists()),
@@ -135,7 +135,7 @@ class RouterWidget(QWidget):
             return
 
         # load the current graph settings (tile_dir etc)
-        graph_dir = ValhallaSettings().get_graph_dir()
+        graph_dir = get_settings_snapshot().graph_dir
         id_json = graph_dir.joinpath(new_name, ID_JSON).resolve()
         with id_json.open("r") as f:
             graph_settings = json.load(f)
@@ -169,7 +169,7 @@ class RouterWidget(QWidget):
         self.dlg_server_log.text_log.append(log)
 
     def _on_server_start(self):
-        binary_dir = ValhallaSettings().get_binary_dir()
+        binary_dir = get_settings_snapshot().binary_dir
         no_binary_dir = False
         msg = ""
         if not check_valhalla_installation():
@@ -234,7 +234,7 @@ class RouterWidget(QWidget):
         self.ui_cmb_prov.clear()
 
         # first add the remote options
-        for provider in ValhallaSettings().get_providers(RouterType.VALHALLA):
+        for provider in get_settings_snapshot().providers:
             self.ui_cmb_prov.addItem(
                 provider.name, (RouterType.VALHALLA, RouterMethod.REMOTE, "", provider)
             )
@@ -7,6 +7,7 @@ from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QMenu, QToolBar
 
 from . import PLUGIN_NAME, __version__
+from .core.http.router_client import shutdown_executors
 from .gui.dock_routing import RoutingDockWidget
 from .processing.provider import ValhallaProvider
 from .utils.resource_utils import get_icon
@@ -80,6 +81,8 @@ class ValhallaPlugin:
         self.iface.removeDockWidget(self.routing_dock)
         self.routing_dock.unload()
 
+        shutdown_executors()
+
     def open_routing_dlg(self):
         """Create and open the version dialog."""
         self.routing_dock.setVisible(not self.routing_dock.isVisible())
@@ -7,6 +7,7 @@ from .. import BASE_DIR
 class MergeStrategy(str, Enum):
     ROW_BY_ROW = "row by row"
     ALL_BY_ALL = "all by all"
+    NEAREST = "k nearest"
 
 
 HELP_DIR = BASE_DIR.joinpath(Path("help"))
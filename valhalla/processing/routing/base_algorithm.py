@@ -1,12 +1,29 @@
+import heapq
+import time
+from dataclasses import replace
 from pathlib import Path
-from typing import List, Optional, Tuple, Type
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
 
 from qgis.core import (
+    QgsFeature,
     QgsFeatureSink,
     QgsFeatureSource,
     QgsFields,
     QgsProcessing,
     QgsProcessingAlgorithm,
+    QgsProcessingException,
     QgsProcessingParameterBoolean,
     QgsProcessingParameterDefinition,
     QgsProcessingParameterEnum,
@@ -15,14 +32,29 @@ from qgis.core import (
     QgsProcessingParameterField,
     QgsProcessingParameterNumber,
     QgsProcessingParameterString,
+    QgsWkbTypes,
 )
 from qgis.PyQt.QtCore import QCoreApplication
 from qgis.PyQt.QtGui import QIcon
 
-from ...core.results_factory import ResultsFactory
-from ...core.settings import DEFAULT_PROVIDERS, ProviderSetting, ValhallaSettings
+from ...core.checkpoint_store import CheckpointStore, get_checkpoint_store
+from ...core.matrix_result import MatrixBlock, MatrixResult
+from ...core.results_factory import PBF_ENDPOINTS, ErrorCallback, ResultsFactory
+from ...core.settings import (
+    DEFAULT_PROVIDERS,
+    ProviderSetting,
+    ValhallaSettings,
+    get_settings_snapshot,
+)
 from ...global_definitions import (
+    DEFAULT_LAYER_FIELDS,
+    FAILURES_TABLE_FIELDS,
+    OPTIONS_TABLE_FIELDS,
     SETTINGS_WIDGETS_MAP,
+    FieldNames,
+    LoadBalancing,
+    OptionsStorage,
+    ResponseFormat,
     RouterEndpoint,
     RouterMethod,
     RouterProfile,
@@ -32,16 +64,42 @@ from ...global_definitions import (
 from ...gui.widgets.costing_settings.widget_settings_valhalla_base import (
     ValhallaSettingsBase,
 )
+from ...third_party.routingpy import routingpy
 from ...utils.geom_utils import WGS84
-from ...utils.layer_utils import get_wgs_coords_from_layer
-from ...utils.misc_utils import wrap_in_html_tag
+from ...utils.layer_utils import (
+    get_wgs_coords_from_feature,
+    get_wgs_coords_from_layer,
+    read_wgs_features,
+)
+from ...utils.misc_utils import format_duration, wrap_in_html_tag
+from ...utils.pbf_utils import PBF_AVAILABLE
 from ...utils.resource_utils import get_icon
 from ..processing_definitions import HELP_DIR
 
+# the endpoints whose locations can share a request if they snap to the same place
+SNAP_ENDPOINTS = (RouterEndpoint.ISOCHRONES, RouterEndpoint.EXPANSION, RouterEndpoint.MATRIX)
+# the endpoints requested per feature, whose runs can be resumed, see iter_job_results()
+CHECKPOINT_ENDPOINTS = (
+    RouterEndpoint.DIRECTIONS,
+    RouterEndpoint.TSP,
+    RouterEndpoint.ISOCHRONES,
+    RouterEndpoint.EXPANSION,
+    RouterEndpoint.MAP_MATCH,
+)
+
 
 class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
 
     IN_PROVIDER = "INPUT_PROVIDER"
+    IN_PROVIDER_GROUP = "INPUT_PROVIDER_GROUP"
+    IN_BALANCING = "INPUT_BALANCING"
+    IN_RESPONSE_FORMAT = "INPUT_RESPONSE_FORMAT"
+    IN_OPTIONS_STORAGE = "INPUT_OPTIONS_STORAGE"
+    IN_MAX_PARALLEL = "INPUT_MAX_PARALLEL"
+    IN_SNAP_DEDUPE = "INPUT_SNAP_DEDUPE"
+    IN_SNAP_TOLERANCE = "INPUT_SNAP_TOLERANCE"
+    IN_CHECKPOINTS = "INPUT_CHECKPOINTS"
+    IN_SKIP_FAILURES = "INPUT_SKIP_FAILURES"
     # IN_URL = "INPUT_URL"
     IN_PKG = "INPUT_PACKAGE"
     IN_MODE = "INPUT_MODE"
@@ -51,8 +109,12 @@ class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
     IN_FIELD_1 = "INPUT_FIELD_1"
 
     OUT = "OUTPUT"
+    OUT_OPTIONS = "OUTPUT_OPTIONS"
+    OUT_FAILURES = "OUTPUT_FAILURES"
     WITH_COSTING_OPTIONS = True
     IN_1_TYPES = [QgsProcessing.SourceType.TypeVectorPoint]
+    # the minimum seconds between two progress texts with the ETA, see iter_with_progress()
+    PROGRESS_TEXT_INTERVAL = 1
 
     def __init__(
         self,
@@ -66,6 +128,8 @@ class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
         self.providers: List[ProviderSetting] = list()  # will be set in init_base_params
         self.endpoint = endpoint
         self.profile = profile
+        # (job key, error) of the requests skipped with IN_SKIP_FAILURES, see iter_job_results()
+        self.failures: List[Tuple[Any, str]] = list()
         if provider == RouterType.VALHALLA and endpoint != RouterEndpoint.ELEVATION:
             costing_widget: Type[ValhallaSettingsBase] = SETTINGS_WIDGETS_MAP[self.profile]["widget"]
 
@@ -87,12 +151,12 @@ class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
         """
 
         # make sure we have at least one remote HTTP API URL
-        settings = ValhallaSettings()
-        if not settings.get_providers(RouterType.VALHALLA):
+        if not get_settings_snapshot().providers:
+            settings = ValhallaSettings()
             for prov in DEFAULT_PROVIDERS:
                 settings.set_provider(RouterType.VALHALLA.lower(), prov)
 
-        self.providers = settings.get_providers(RouterType.VALHALLA)
+        self.providers = list(get_settings_snapshot().providers)
         servers = [prov.name for prov in self.providers]
 
         url_param = QgsProcessingParameterEnum(
@@ -103,6 +167,72 @@ class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
         )
         self.addParameter(url_param)
 
+        group_param = QgsProcessingParameterEnum(
+            self.IN_PROVIDER_GROUP,
+            "Additional providers to spread the requests across",
+            servers,
+            allowMultiple=True,
+            optional=True,
+        )
+        group_param.setHelp(
+            "Only for identical Valhalla instances, i.e. with the same graph! The requests are balanced "
+            "across the 'Provider' and these ones. If one of them fails or times out, the request is "
+            "sent to the next one and the failed one is paused until its /status responds again."
+        )
+        group_param.setFlags(group_param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced)
+        self.addParameter(group_param)
+
+        balancing_param = QgsProcessingParameterEnum(
+            self.IN_BALANCING,
+            "Load balancing across providers",
+            options=list(LoadBalancing),
+            defaultValue=0,
+        )
+        balancing_param.setHelp(
+            "'round-robin' takes turns, 'least latency' prefers the provider with the lowest expected "
+            "response time given its recent latency and current load."
+        )
+        balancing_param.setFlags(
+            balancing_param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+        )
+        self.addParameter(balancing_param)
+
+        self.init_batch_params()
+
+        if self.router == RouterType.VALHALLA and self.endpoint in PBF_ENDPOINTS:
+            format_param = QgsProcessingParameterEnum(
+                self.IN_RESPONSE_FORMAT,
+                "Response format",
+                options=list(ResponseFormat),
+                defaultValue=0,
+            )
+            format_param.setHelp(
+                "'pbf' makes Valhalla respond with protobuf, which is a lot smaller and faster to decode "
+                "for large routes & matrices. Needs the 'protobuf' Python package"
+                f"{'' if PBF_AVAILABLE else ', which is not installed, so JSON is used'}."
+            )
+            format_param.setFlags(
+                format_param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+            )
+            self.addParameter(format_param)
+
+        if self.has_options_field:
+            storage_param = QgsProcessingParameterEnum(
+                self.IN_OPTIONS_STORAGE,
+                "Request options storage",
+                options=list(OptionsStorage),
+                defaultValue=0,
+            )
+            storage_param.setHelp(
+                "'per feature' writes the full request options to each feature's 'options' field. "
+                "'options ID' writes a short ID instead and the options once per run to the "
+                "'Request options' table, which keeps large outputs a lot smaller; join on 'options_id'."
+            )
+            storage_param.setFlags(
+                storage_param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+            )
+            self.addParameter(storage_param)
+
         # pkg_param = QgsProcessingParameterEnum(
         #     self.IN_PKG,
         #     "Package path (used if method is Bindings)",
@@ -180,10 +310,105 @@ class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
         )
         self.addParameter(output_param)
 
+        if self.has_options_field:
+            options_param = QgsProcessingParameterFeatureSink(
+                name=self.OUT_OPTIONS,
+                description="Request options",
+                type=QgsProcessing.SourceType.TypeVector,
+                createByDefault=False,
+                optional=True,
+            )
+            self.addParameter(options_param)
+
+        if self.endpoint in CHECKPOINT_ENDPOINTS:
+            self.addParameter(
+                QgsProcessingParameterFeatureSink(
+                    name=self.OUT_FAILURES,
+                    description="Failed requests",
+                    type=QgsProcessing.SourceType.TypeVector,
+                    createByDefault=False,
+                    optional=True,
+                )
+            )
+
+    def init_batch_params(self) -> None:
+        """Adds the advanced parameters of how the requests of a run are made."""
+        parallel_param = QgsProcessingParameterNumber(
+            self.IN_MAX_PARALLEL,
+            "Maximum parallel requests, 0 for the provider's setting",
+            minValue=0,
+            defaultValue=0,
+        )
+        parallel_param.setHelp(
+            "The number of requests which are in flight at once. They're sent from a pool of worker "
+            "threads, the results are still written in the order of the input features."
+        )
+        parallel_param.setFlags(
+            parallel_param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+        )
+        self.addParameter(parallel_param)
+
+        if self.router == RouterType.VALHALLA and self.endpoint in SNAP_ENDPOINTS:
+            dedupe_param = QgsProcessingParameterBoolean(
+                self.IN_SNAP_DEDUPE,
+                "Request locations which snap to the same place only once",
+                defaultValue=False,
+            )
+            dedupe_param.setHelp(
+                "Snaps all locations with /locate first. Locations on the same edge & side of the "
+                "street, within the tolerance, share one request whose result is written for each "
+                "of them, e.g. for dense address points."
+            )
+            tolerance_param = QgsProcessingParameterNumber(
+                self.IN_SNAP_TOLERANCE,
+                "Snapped locations tolerance (m)",
+                type=QgsProcessingParameterNumber.Type.Double,
+                minValue=0,
+                defaultValue=1,
+            )
+            for param in (dedupe_param, tolerance_param):
+                param.setFlags(param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced)
+                self.addParameter(param)
+
+        if self.endpoint in CHECKPOINT_ENDPOINTS:
+            checkpoints_param = QgsProcessingParameterBoolean(
+                self.IN_CHECKPOINTS,
+                "Save the progress and resume unfinished runs",
+                defaultValue=False,
+            )
+            checkpoints_param.setHelp(
+                "Stores each completed request's results. If a run with the same inputs & parameters "
+                "was canceled or failed before, only the remaining requests are made and its results "
+                "are written in between, in the order of the input. The stored results are removed "
+                "once a run completed."
+            )
+            skip_param = QgsProcessingParameterBoolean(
+                self.IN_SKIP_FAILURES,
+                "Skip failed requests instead of stopping",
+                defaultValue=False,
+            )
+            skip_param.setHelp(
+                "Logs failed requests and writes them to the 'Failed requests' output. With saved "
+                "progress, the next run only retries the failed ones."
+            )
+            for param in (checkpoints_param, skip_param):
+                param.setFlags(param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced)
+                self.addParameter(param)
+
+    @property
+    def has_options_field(self) -> bool:
+        """Whether the endpoint's features have an OPTIONS field, see OptionsStorage."""
+        return any(f.name() == FieldNames.OPTIONS for f in DEFAULT_LAYER_FIELDS[self.endpoint])
+
+    def get_provider_setting(self, parameters, context) -> ProviderSetting:
+        """Returns the selected provider's settings."""
+        return self.providers[self.parameterAsEnum(parameters, self.IN_PROVIDER, context)]
+
     def get_base_params(self, parameters, context):
-        provider: ProviderSetting = self.providers[
-            self.parameterAsEnum(parameters, self.IN_PROVIDER, context)
-        ]
+        provider = self.get_provider_setting(parameters, context)
+        max_parallel = self.parameterAsInt(parameters, self.IN_MAX_PARALLEL, context)
+        if max_parallel:
+            provider = replace(provider, max_concurrent_requests=max_parallel)
         mode = RoutingMetric[self.parameterAsEnum(parameters, self.IN_MODE, context)]
         # url = self.parameterAsString(parameters, self.IN_URL, context)
         # pkg = (
@@ -213,7 +438,17 @@ class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
             "url": provider.url,
             "profile": self.profile,
             "method": RouterMethod.REMOTE,
+            **provider.client_kwargs(),
+            **self.get_provider_group(parameters, context, provider),
         }
+        if self.router == RouterType.VALHALLA and self.endpoint in PBF_ENDPOINTS:
+            factory_args["response_format"] = ResponseFormat[
+                self.parameterAsEnum(parameters, self.IN_RESPONSE_FORMAT, context)
+            ]
+        if self.has_options_field:
+            factory_args["options_storage"] = OptionsStorage[
+                self.parameterAsEnum(parameters, self.IN_OPTIONS_STORAGE, context)
+            ]
 
         # if method == RouterMethod.LOCAL:
         #     if not pkg:
@@ -231,6 +466,315 @@ class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
 
         return layer_1, layer_field_name_1, params, results_factory
 
+    @staticmethod
+    def iter_matrix_block_rows(
+        results_factory: ResultsFactory,
+        sources: list,
+        targets: list,
+        params: dict,
+        blocks: List[MatrixBlock],
+        feedback,
+    ) -> Iterator[Tuple[range, MatrixResult]]:
+        """
+        Requests the matrix blocks and yields the sources and the matrix of each block row once all
+        its blocks are done, so the matrix is written in row-major order. Progress & cancellation are
+        handled per block.
+        """
+        block_row: List[MatrixResult] = list()
+        for count, (block, matrix) in enumerate(
+            results_factory.iter_matrix_blocks(sources, targets, params, blocks)
+        ):
+            if feedback.isCanceled():
+                return
+            block_row.append(matrix)
+            if block.targets.stop == len(targets):
+                yield block.sources, MatrixResult.concatenate(block_row)
+                block_row = list()
+            feedback.setProgress(100 * (count + 1) / len(blocks))
+
+    def iter_with_progress(
+        self,
+        results: Generator[Tuple[Any, Any], None, None],
+        total_count: int,
+        feedback,
+        done: int = 0,
+    ) -> Iterator[Tuple[Any, Any]]:
+        """
+        Passes on the (key, result) tuples of one of the ResultsFactory's concurrent request
+        iterators, e.g. get_results_many(), which come in the order of the jobs, so they can be
+        written to the sink as they arrive. Reports the progress with an ETA and stops as soon as the
+        run is canceled, which cancels the requests which haven't started yet. Consecutive results
+        of the same key, e.g. the windows of a long trace, count as one job.
+
+        :param total_count: the number of jobs
+        :param done: the number of jobs which were done before, e.g. by an earlier run
+        :raises QgsProcessingException: if a request failed
+        """
+        start = last_report = time.monotonic()
+        done_before = done
+        previous_key = None
+        try:
+            for count, (key, result) in enumerate(results):
+                if feedback.isCanceled():
+                    break
+                if not count or key != previous_key:
+                    done += 1
+                    previous_key = key
+                yield key, result
+
+                feedback.setProgress(done / total_count * 100)
+                now = time.monotonic()
+                if now - last_report >= self.PROGRESS_TEXT_INTERVAL or done == total_count:
+                    last_report = now
+                    remaining = (now - start) / (done - done_before) * (total_count - done)
+                    feedback.setProgressText(
+                        f"{done}/{total_count} done, about {format_duration(remaining)} left"
+                    )
+        except (
+            routingpy.exceptions.RouterApiError,
+            routingpy.exceptions.RouterServerError,
+        ) as e:
+            raise QgsProcessingException(f"HTTP {e.status}: {e.message}")
+        finally:
+            results.close()
+
+    def get_checkpoint_store(self, parameters, context) -> Optional[CheckpointStore]:
+        """
+        Returns the checkpoints of this run, keyed by the algorithm, its input layers' sources and
+        its other parameters, None if the progress isn't saved.
+        """
+        if self.endpoint not in CHECKPOINT_ENDPOINTS:
+            return None
+        if not self.parameterAsBool(parameters, self.IN_CHECKPOINTS, context):
+            return None
+
+        values = dict()
+        for definition in self.parameterDefinitions():
+            name = definition.name()
+            if definition.isDestination() or name in (
+                self.IN_CHECKPOINTS,
+                self.IN_SKIP_FAILURES,
+                self.IN_MAX_PARALLEL,
+            ):
+                continue
+            layer = (
+                self.parameterAsVectorLayer(parameters, name, context)
+                if definition.type() == QgsProcessingParameterFeatureSource.typeName()
+                else None
+            )
+            values[name] = layer.source() if layer else self.parameterAsString(parameters, name, context)
+
+        return get_checkpoint_store(CheckpointStore.make_run_key(self.id(), values))
+
+    def iter_job_results(
+        self,
+        parameters,
+        context,
+        feedback,
+        request: Callable[[Iterable[Tuple[Any, Any]], Optional[ErrorCallback]], Generator],
+        jobs: Iterable[Tuple[Any, Any]],
+        total_count: int,
+        fields: QgsFields,
+    ) -> Iterator[Tuple[Any, List[QgsFeature]]]:
+        """
+        Requests the jobs and yields their (key, result features), see iter_with_progress().
+
+        The jobs are told apart by their position in ``jobs``, not by their keys, which may repeat,
+        e.g. for duplicate IDs. If the progress is saved, only the jobs an unfinished earlier run
+        with the same inputs & parameters didn't complete are requested, its results are merged in
+        at their positions, see get_checkpoint_store(). A job's results are stored once the next
+        job's arrive, i.e. once they're complete, and removed when the run succeeded. With
+        IN_SKIP_FAILURES, failed jobs are logged and collected for write_failures_table() instead of
+        stopping the run.
+
+        :param request: returns the results of the jobs it's called with, skipping the failed ones if
+            it's called with an error callback, e.g. ResultsFactory.get_results_many()
+        :param jobs: the (key, locations) tuples
+        :param fields: the fields of the result features
+        """
+        self.failures = list()
+        failed_positions: Set[int] = set()
+
+        def skip_failure(job_key: Tuple[int, Any], error: Exception):
+            position, key = job_key
+            message = f"HTTP {error.status}: {error.message}"
+            failed_positions.add(position)
+            self.failures.append((key, message))
+            feedback.reportError(f"Skipped the failed request of {key!r}: {message}")
+
+        on_error = (
+            skip_failure if self.parameterAsBool(parameters, self.IN_SKIP_FAILURES, context) else None
+        )
+        # the jobs keyed by (position, key)
+        positioned = (((position, key), *rest) for position, (key, *rest) in enumerate(jobs))
+
+        store = self.get_checkpoint_store(parameters, context)
+        if store is None:
+            for (_, key), result_feats in self.iter_with_progress(
+                request(positioned, on_error), total_count, feedback
+            ):
+                yield key, result_feats
+            return
+
+        try:
+            completed = store.completed()
+            if completed:
+                feedback.pushInfo(f"Resuming: {len(completed)}/{total_count} were done before")
+
+            remaining = (job for job in positioned if store.make_job_key(job[0]) not in completed)
+            results = self._checkpointed(
+                store,
+                self.iter_with_progress(
+                    request(remaining, on_error), total_count, feedback, done=len(completed)
+                ),
+                failed_positions,
+                feedback,
+            )
+            # both come in the order of the jobs' positions
+            for (_, key), result_feats in heapq.merge(
+                store.iter_results(fields), results, key=lambda result: result[0][0]
+            ):
+                yield key, result_feats
+
+            if not feedback.isCanceled() and not self.failures:
+                store.clear()
+        finally:
+            store.close()
+
+    @staticmethod
+    def _checkpointed(
+        store: CheckpointStore,
+        results: Iterator[Tuple[Tuple[int, Any], List[QgsFeature]]],
+        failed_positions: Set[int],
+        feedback,
+    ) -> Iterator[Tuple[Tuple[int, Any], List[QgsFeature]]]:
+        """
+        Passes on the results and stores each job's features once they're complete, unless one of
+        its requests failed or the run was canceled while it came in.
+        """
+        # the results of the current job, which may come in parts
+        current: List[Tuple[Tuple[int, Any], List[QgsFeature]]] = list()
+
+        def store_current():
+            job_key = current[0][0]
+            position = job_key[0]
+            if position not in failed_positions:
+                store.add(
+                    job_key, position, [feat for _, result_feats in current for feat in result_feats]
+                )
+
+        for job_key, result_feats in results:
+            if current and current[0][0] != job_key:
+                store_current()
+                current = list()
+            current.append((job_key, result_feats))
+            yield job_key, result_feats
+
+        if current and not feedback.isCanceled():
+            store_current()
+
+    def get_snap_tolerance(self, parameters, context) -> Optional[float]:
+        """Returns the tolerance in meters of grouping snapped locations, None if they aren't grouped."""
+        if self.router != RouterType.VALHALLA or self.endpoint not in SNAP_ENDPOINTS:
+            return None
+        if not self.parameterAsBool(parameters, self.IN_SNAP_DEDUPE, context):
+            return None
+
+        return self.parameterAsDouble(parameters, self.IN_SNAP_TOLERANCE, context)
+
+    @staticmethod
+    def get_snap_groups(
+        results_factory: ResultsFactory, locations: list, tolerance: float, feedback
+    ) -> List[List[int]]:
+        """
+        Returns the indices of the locations grouped by where they snap to, see
+        ResultsFactory.get_snap_groups().
+
+        :raises QgsProcessingException: if a /locate request failed
+        """
+        try:
+            groups = results_factory.get_snap_groups(locations, tolerance)
+        except (
+            routingpy.exceptions.RouterApiError,
+            routingpy.exceptions.RouterServerError,
+        ) as e:
+            raise QgsProcessingException(f"HTTP {e.status}: {e.message}")
+        feedback.pushInfo(f"{len(locations)} locations snap to {len(groups)} distinct places")
+
+        return groups
+
+    def iter_location_results(
+        self,
+        parameters,
+        context,
+        feedback,
+        results_factory: ResultsFactory,
+        layer: QgsFeatureSource,
+        id_field: str,
+        params: dict,
+        fields: QgsFields,
+    ) -> Iterator[Tuple[Any, List[QgsFeature]]]:
+        """
+        Requests the results of each point feature, e.g. its isochrones, and yields them with the
+        feature's ID in the order of the features, see iter_with_progress(). Features which snap to
+        the same place share one request if requested, see get_snap_tolerance(); then they're
+        yielded together, in the order of each group's first feature.
+        """
+
+        def request(jobs, on_error):
+            return results_factory.get_results_many(
+                self.endpoint, jobs, params, fields, on_error=on_error
+            )
+
+        tolerance = self.get_snap_tolerance(parameters, context)
+        if tolerance is None:
+            # read lazily, so only the features of the requests in flight are held in memory
+            jobs = (
+                (
+                    feature[id_field] if id_field else feature.id(),
+                    [get_wgs_coords_from_feature(feature, layer.sourceCrs())],
+                )
+                for feature in layer.getFeatures()
+            )
+            yield from self.iter_job_results(
+                parameters, context, feedback, request, jobs, layer.featureCount(), fields
+            )
+            return
+
+        features = read_wgs_features(layer, id_field)
+        groups = self.get_snap_groups(
+            results_factory, [coords for _, coords in features], tolerance, feedback
+        )
+        jobs = ((group, [features[group[0]][1]]) for group in groups)
+        for group, result_feats in self.iter_job_results(
+            parameters, context, feedback, request, jobs, len(groups), fields
+        ):
+            for idx in group:
+                yield features[idx][0], [QgsFeature(f) for f in result_feats]
+
+    def get_provider_group(self, parameters, context, provider: ProviderSetting) -> dict:
+        """
+        Returns the client arguments to balance the requests across the selected providers,
+        or nothing if no additional provider was selected.
+        """
+        members = [provider]
+        for idx in self.parameterAsEnums(parameters, self.IN_PROVIDER_GROUP, context):
+            if self.providers[idx].url not in (m.url for m in members):
+                members.append(self.providers[idx])
+        if len(members) < 2:
+            return dict()
+        max_parallel = self.parameterAsInt(parameters, self.IN_MAX_PARALLEL, context)
+        if max_parallel:
+            # the group's request pool is the sum of its members' ones
+            members = [
+                replace(m, max_concurrent_requests=max(1, max_parallel // len(members))) for m in members
+            ]
+
+        return {
+            "providers": members,
+            "balancing": LoadBalancing[self.parameterAsEnum(parameters, self.IN_BALANCING, context)],
+        }
+
     def setup_costing_options(self):
         """Takes the costing defaults retrieved from the settings widget and creates processing parameters from them."""
         for param_name, param_dict in self.costing_defaults:
@@ -299,7 +843,9 @@ class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
 
         return costing_params
 
-    def get_feature_sink(self, parameters, context, fields: QgsFields) -> Tuple[QgsFeatureSink, str]:
+    def get_feature_sink(
+        self, parameters, context, fields: QgsFields, geom_type: Optional[QgsWkbTypes.Type] = None
+    ) -> Tuple[QgsFeatureSink, str]:
         """
         Convenience method to get the algorithm's feature sink with the corresponding endpoint's QgsFields
         and optionally additional fields (e.g. an ID field).
@@ -307,6 +853,7 @@ class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
         :param parameters: passed from processAlgorithm()
         :param context: passed from processAlgorithm()
         :param fields: QgsFields that will be appended after the endpoint fields or overwrite the default if specified twice.
+        :param geom_type: the sink's geometry type, if not the endpoint's default
         """
 
         return self.parameterAsSink(
@@ -314,10 +861,73 @@ class ValhallaBaseAlgorithm(QgsProcessingAlgorithm):
             self.OUT,
             context,
             fields,
-            ResultsFactory.geom_type(self.endpoint),
+            geom_type or ResultsFactory.geom_type(self.endpoint),
             WGS84,
         )
 
+    def write_options_table(
+        self, parameters, context, feedback, results_factory: ResultsFactory
+    ) -> Dict[str, str]:
+        """
+        Writes the options collected by the results factory with OptionsStorage.OPTIONS_ID to the
+        OUT_OPTIONS table, one row per distinct options.
+
+        :returns: the table's output, to be merged with processAlgorithm()'s results
+        """
+        if not results_factory.run_options:
+            return dict()
+
+        fields = QgsFields()
+        for field in OPTIONS_TABLE_FIELDS:
+            fields.append(field)
+        (sink, dest_id) = self.parameterAsSink(
+            parameters, self.OUT_OPTIONS, context, fields, QgsWkbTypes.Type.NoGeometry
+        )
+        if sink is None:
+            feedback.pushWarning(
+                "The features only hold the ID of their request options, "
+                "but the 'Request options' output wasn't set"
+            )
+            return dict()
+
+        features = list()
+        for options_id, options in results_factory.run_options.items():
+            feat = QgsFeature(fields)
+            feat.setAttributes([options_id, options])
+            features.append(feat)
+        sink.addFeatures(features, QgsFeatureSink.Flag.FastInsert)
+
+        return {self.OUT_OPTIONS: dest_id}
+
+    def write_failures_table(self, parameters, context, feedback) -> Dict[str, str]:
+        """
+        Writes the requests skipped with IN_SKIP_FAILURES to the OUT_FAILURES table, one row per
+        failed job with its key, e.g. the feature's ID, and the error.
+
+        :returns: the table's output, to be merged with processAlgorithm()'s results
+        """
+        if not self.failures:
+            return dict()
+
+        feedback.pushWarning(f"{len(self.failures)} request(s) failed and were skipped")
+        fields = QgsFields()
+        for field in FAILURES_TABLE_FIELDS:
+            fields.append(field)
+        (sink, dest_id) = self.parameterAsSink(
+            parameters, self.OUT_FAILURES, context, fields, QgsWkbTypes.Type.NoGeometry
+        )
+        if sink is None:
+            return dict()
+
+        features = list()
+        for key, error in self.failures:
+            feat = QgsFeature(fields)
+            feat.setAttributes([CheckpointStore.make_job_key(key), error])
+            features.append(feat)
+        sink.addFeatures(features, QgsFeatureSink.Flag.FastInsert)
+
+        return {self.OUT_FAILURES: dest_id}
+
     def createInstance(self):
         return type(self)()
 
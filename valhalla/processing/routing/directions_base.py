@@ -1,30 +1,36 @@
-from typing import Callable, Optional, Union
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from qgis.core import (
-    QgsFeature,
     QgsFeatureRequest,
     QgsField,
     QgsFields,
     QgsProcessing,
     QgsProcessingException,
+    QgsProcessingMultiStepFeedback,
+    QgsProcessingParameterDefinition,
     QgsProcessingParameterEnum,
     QgsProcessingParameterFeatureSource,
     QgsProcessingParameterField,
+    QgsProcessingParameterNumber,
     QgsWkbTypes,
 )
 from qgis.PyQt.QtCore import QVariant
 
-from ...core.results_factory import DEFAULT_LAYER_FIELDS
+from ...core.matrix_result import plan_blocks
+from ...core.results_factory import DEFAULT_LAYER_FIELDS, ResultsFactory
 from ...global_definitions import (
     FieldNames,
     RouterEndpoint,
     RouterProfile,
     RouterType,
+    RoutingMetric,
 )
 from ...third_party.routingpy import routingpy
 from ...utils.layer_utils import (
     get_wgs_coords_from_feature,
     get_wgs_coords_from_layer,
+    read_wgs_features,
 )
 from ...utils.logger_utils import qgis_log
 from ...utils.misc_utils import wrap_in_html_tag
@@ -40,6 +46,12 @@ class DirectionsBase(ValhallaBaseAlgorithm):
     IN_2 = "INPUT_LAYER_2"
     IN_FIELD_2 = "INPUT_FIELD_2"
     IN_MERGE_STRATEGY = "INPUT_MERGE_STRATEGY"
+    IN_K = "INPUT_K"
+    IN_MAX_COST = "INPUT_MAX_COST"
+    IN_NEAREST_METRIC = "INPUT_NEAREST_METRIC"
+
+    # the request parameters the matrix of MergeStrategy.NEAREST doesn't take
+    DIRECTIONS_ONLY_PARAMS = ("instructions",)
 
     def __init__(
         self,
@@ -101,6 +113,32 @@ class DirectionsBase(ValhallaBaseAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.IN_K,
+                description=f"Number of nearest destinations per origin (merge strategy '{MergeStrategy.NEAREST}')",
+                minValue=0,
+                defaultValue=3,
+            )
+        )
+
+        max_cost = QgsProcessingParameterNumber(
+            name=self.IN_MAX_COST,
+            description="Maximum duration (s) or distance (km) to a nearest destination, 0 for no limit",
+            type=QgsProcessingParameterNumber.Type.Double,
+            minValue=0,
+            defaultValue=0,
+        )
+        nearest_metric = QgsProcessingParameterEnum(
+            name=self.IN_NEAREST_METRIC,
+            description="Rank the nearest destinations by duration ('fastest') or distance ('shortest')",
+            options=list(RoutingMetric),
+            defaultValue=0,
+        )
+        for param in (max_cost, nearest_metric):
+            param.setFlags(param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced)
+            self.addParameter(param)
+
     def processAlgorithm(self, parameters, context, feedback):  # noqa: C901
         (
             layer_1,
@@ -140,32 +178,35 @@ class DirectionsBase(ValhallaBaseAlgorithm):
         for field in (f for f in (*field_list, *DEFAULT_LAYER_FIELDS[self.endpoint])):
             return_fields.append(field)
 
+        def request(jobs, on_error):
+            return results_factory.get_results_many(
+                self.endpoint, jobs, params, return_fields, on_error=on_error
+            )
+
         if not layer_2:
             # for MultiPoint layers, we want one route for each MultiPoint
             if QgsWkbTypes.isMultiType(layer_1.wkbType()):
                 sink, dest_id = self.get_feature_sink(parameters, context, return_fields)
 
-                total_count = layer_1.featureCount()
-
-                for count, feature in enumerate(layer_1.getFeatures()):
-                    if feedback.isCanceled():
-                        break
-
-                    coords = get_wgs_coords_from_feature(feature, layer_1.sourceCrs())
-                    try:
-                        for result_feat in results_factory.get_results(
-                            self.endpoint, coords, params, return_fields
-                        ):
-                            result_feat[FieldNames.ID] = (
-                                feature[layer_field_name_1] if layer_field_name_1 else feature.id()
-                            )
-                            sink.addFeature(result_feat)
-                            feedback.setProgress(int((count + 1) / total_count * 100))
-                    except (
-                        routingpy.exceptions.RouterApiError,
-                        routingpy.exceptions.RouterServerError,
-                    ) as e:
-                        raise QgsProcessingException(f"HTTP {e.status}: {e.message}")
+                jobs = (
+                    (
+                        feature[layer_field_name_1] if layer_field_name_1 else feature.id(),
+                        get_wgs_coords_from_feature(feature, layer_1.sourceCrs()),
+                    )
+                    for feature in layer_1.getFeatures()
+                )
+                for feature_id, result_feats in self.iter_job_results(
+                    parameters,
+                    context,
+                    feedback,
+                    request,
+                    jobs,
+                    layer_1.featureCount(),
+                    return_fields,
+                ):
+                    for result_feat in result_feats:
+                        result_feat[FieldNames.ID] = feature_id
+                        sink.addFeature(result_feat)
             else:
                 # For a SinglePoint layer, we want one route that passes through all features
                 sink, dest_id = self.get_feature_sink(parameters, context, return_fields)
@@ -186,82 +227,132 @@ class DirectionsBase(ValhallaBaseAlgorithm):
                 ) as e:
                     raise QgsProcessingException(f"HTTP {e.status}: {e.message}")
         else:  # if a second layer is provided
+            # if only one layer field name has been provided, throw error
+            if strategy == MergeStrategy.ROW_BY_ROW and bool(layer_field_name_1) != bool(
+                layer_field_name_2
+            ):
+                msg = f"If the merge strategy is {strategy}, provide either both layer's field names or none at all."
+                qgis_log(msg)
+                raise QgsProcessingException(msg)
             sink, dest_id = self.get_feature_sink(parameters, context, return_fields)
 
-            join_condition = self.get_join_condition(strategy, layer_field_name_1, layer_field_name_2)
-
-            total_count = sum(
-                [join_condition(x, y) for x in layer_1.getFeatures() for y in layer_2.getFeatures()]
-            )
-            count = 0
-
-            for idx_1, feature_1 in enumerate(layer_1.getFeatures()):
-                for idx_2, feature_2 in enumerate(layer_2.getFeatures()):
-                    if feedback.isCanceled():
-                        break
-
-                    if join_condition(feature_1, feature_2):
-                        coords = [
-                            get_wgs_coords_from_feature(feature, layer_1.sourceCrs())
-                            for feature in (feature_1, feature_2)
-                        ]
-                        try:
-                            for result_feat in results_factory.get_results(
-                                self.endpoint, coords, params, return_fields
-                            ):
-                                result_feat[FieldNames.SOURCE] = (
-                                    feature_1[layer_field_name_1]
-                                    if layer_field_name_1
-                                    else feature_1.id()
-                                )
-                                result_feat[FieldNames.TARGET] = (
-                                    feature_2[layer_field_name_2]
-                                    if layer_field_name_2
-                                    else feature_2.id()
-                                )
-                                sink.addFeature(result_feat)
-                                count += 1
-                                feedback.setProgress(int(count / total_count * 100))
-                        except (
-                            routingpy.exceptions.RouterApiError,
-                            routingpy.exceptions.RouterServerError,
-                        ) as e:
-                            raise QgsProcessingException(f"HTTP {e.status}: {e.message}")
-        return {self.OUT: dest_id}
+            # read each layer once, then join them in memory
+            features_1 = read_wgs_features(layer_1, layer_field_name_1)
+            features_2 = read_wgs_features(layer_2, layer_field_name_2)
+            if strategy == MergeStrategy.NEAREST:
+                # first the matrix, then the routes
+                feedback = QgsProcessingMultiStepFeedback(2, feedback)
+                total_count, pairs = self.get_nearest_pairs(
+                    parameters, context, feedback, results_factory, params, features_1, features_2
+                )
+                feedback.setCurrentStep(1)
+            else:
+                total_count, pairs = self.get_join_pairs(strategy, features_1, features_2)
+            for (source_id, target_id), result_feats in self.iter_job_results(
+                parameters, context, feedback, request, pairs, total_count, return_fields
+            ):
+                for result_feat in result_feats:
+                    result_feat[FieldNames.SOURCE] = source_id
+                    result_feat[FieldNames.TARGET] = target_id
+                    sink.addFeature(result_feat)
+        return {
+            self.OUT: dest_id,
+            **self.write_options_table(parameters, context, feedback, results_factory),
+            **self.write_failures_table(parameters, context, feedback),
+        }
 
     @staticmethod
-    def get_join_condition(
+    def get_join_pairs(
         merge_strategy: MergeStrategy,
-        layer_field_1: Optional[str],
-        layer_field_2: Optional[str],
-    ) -> Callable[[QgsFeature, QgsFeature], bool]:
+        features_1: List[Tuple[Any, list]],
+        features_2: List[Tuple[Any, list]],
+    ) -> Tuple[int, Iterator[Tuple[Tuple[Any, Any], list]]]:
         """
-        Determines how two layers should be joined and returns a function that can be called with one feature from
-        each layer. This prevents having to check the merge strategy and existence of field names for
-        each combination of features.
+        Joins the (ID, coordinates) of two layers, see read_wgs_features(): all by all, or row by row
+        on equal IDs, i.e. the layers' ID fields or else their feature IDs. The row by row join hashes
+        the second layer's IDs, so it's linear instead of comparing all combinations.
+
+        :returns: the number of pairs and an iterator of ((ID 1, ID 2), [coordinates 1, coordinates 2])
+            in the order of the first, then the second layer
         """
-        # if merge strategy is all by all, we want to route between all features
         if merge_strategy == MergeStrategy.ALL_BY_ALL:
+            pairs = (
+                ((id_1, id_2), [coords_1, coords_2])
+                for id_1, coords_1 in features_1
+                for id_2, coords_2 in features_2
+            )
+            return len(features_1) * len(features_2), pairs
 
-            def join_func(a, b):
-                return True
-
-        # if layer field names are provided for both layers, use these names as the join condition
-        elif merge_strategy == MergeStrategy.ROW_BY_ROW and all((layer_field_1, layer_field_2)):
-
-            def join_func(a, b):
-                return a[layer_field_1] == b[layer_field_2]
-
-        # if no layer field names are provided, just join them by their default order
-        elif merge_strategy == MergeStrategy.ROW_BY_ROW and not any((layer_field_1, layer_field_2)):
+        features_2_by_id: Dict[Any, List[list]] = defaultdict(list)
+        for id_2, coords_2 in features_2:
+            features_2_by_id[id_2].append(coords_2)
+        pairs = [
+            ((id_1, id_1), [coords_1, coords_2])
+            for id_1, coords_1 in features_1
+            for coords_2 in features_2_by_id.get(id_1, ())
+        ]
 
-            def join_func(a, b):
-                return a.id() == b.id()
+        return len(pairs), iter(pairs)
 
-        # if only one layer field name has been provided, throw error
-        elif merge_strategy == MergeStrategy.ROW_BY_ROW and any((layer_field_1, layer_field_2)):
-            msg = f"If the merge strategy is {merge_strategy}, provide either both layer's field names or none at all."
-            qgis_log(msg)
-            raise QgsProcessingException(msg)
+    def get_nearest_pairs(
+        self,
+        parameters,
+        context,
+        feedback,
+        results_factory: ResultsFactory,
+        params: dict,
+        features_1: List[Tuple[Any, list]],
+        features_2: List[Tuple[Any, list]],
+    ) -> Tuple[int, Iterator[Tuple[Tuple[Any, Any], list]]]:
+        """
+        Requests the matrix between the layers' (ID, coordinates), see read_wgs_features(), and
+        pairs each feature of the first layer with its k cheapest features of the second layer
+        within the maximum cost, so only those routes are requested instead of all by all.
 
-        return join_func
+        :returns: the number of pairs and an iterator of ((ID 1, ID 2), [coordinates 1, coordinates 2])
+            in the order of the first layer, then the cost
+        """
+        k = self.parameterAsInt(parameters, self.IN_K, context)
+        max_cost = self.parameterAsDouble(parameters, self.IN_MAX_COST, context)
+        by_distance = (
+            RoutingMetric[self.parameterAsEnum(parameters, self.IN_NEAREST_METRIC, context)]
+            == RoutingMetric.SHORTEST
+        )
+        if by_distance:
+            # the matrix' distances are in meters
+            max_cost *= 1000
+
+        sources = [coords for _, coords in features_1]
+        targets = [coords for _, coords in features_2]
+        blocks = plan_blocks(
+            len(sources),
+            len(targets),
+            self.get_provider_setting(parameters, context).max_matrix_location_pairs,
+        )
+        feedback.pushInfo(
+            f"Requesting the {len(sources)}x{len(targets)} matrix in {len(blocks)} block(s) "
+            f"to find the nearest destinations"
+        )
+        matrix_params = {
+            key: value for key, value in params.items() if key not in self.DIRECTIONS_ONLY_PARAMS
+        }
+
+        pairs = list()
+        try:
+            for rows, matrix in self.iter_matrix_block_rows(
+                results_factory, sources, targets, matrix_params, blocks, feedback
+            ):
+                for (id_1, coords_1), nearest in zip(
+                    features_1[rows.start : rows.stop],
+                    matrix.nearest_targets(k, max_cost, by_distance),
+                ):
+                    pairs.extend(
+                        ((id_1, features_2[idx][0]), [coords_1, features_2[idx][1]]) for idx in nearest
+                    )
+        except (
+            routingpy.exceptions.RouterApiError,
+            routingpy.exceptions.RouterServerError,
+        ) as e:
+            raise QgsProcessingException(f"HTTP {e.status}: {e.message}")
+
+        return len(pairs), iter(pairs)
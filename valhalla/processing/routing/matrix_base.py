@@ -1,16 +1,31 @@
-from typing import Optional, Union
+from pathlib import Path
+from typing import Optional, Tuple, Union
 
+import numpy as np
 from qgis.core import (
+    QgsFeatureSink,
+    QgsField,
     QgsFields,
     QgsProcessing,
     QgsProcessingException,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterEnum,
     QgsProcessingParameterFeatureSource,
     QgsProcessingParameterField,
+    QgsProcessingParameterFolderDestination,
+    QgsProcessingParameterNumber,
 )
+from qgis.PyQt.QtCore import QVariant
 
+from ...core.matrix_export import MatrixArrayWriter, get_matrix_writer
+from ...core.matrix_result import plan_blocks
+from ...core.results_factory import ResultsFactory
 from ...global_definitions import (
     DEFAULT_LAYER_FIELDS,
+    WIDE_MATRIX_FIELDS,
     FieldNames,
+    MatrixArrayFormat,
+    MatrixLayout,
     RouterEndpoint,
     RouterProfile,
     RouterType,
@@ -26,6 +41,11 @@ from ..routing.base_algorithm import (
 class MatrixBase(ValhallaBaseAlgorithm):
     IN_2 = "INPUT_LAYER_2"
     IN_FIELD_2 = "INPUT_FIELD_2"
+    IN_BLOCK_SOURCES = "INPUT_BLOCK_SOURCES"
+    IN_BLOCK_TARGETS = "INPUT_BLOCK_TARGETS"
+    IN_LAYOUT = "INPUT_LAYOUT"
+    IN_ARRAY_FORMAT = "INPUT_ARRAY_FORMAT"
+    OUT_ARRAYS = "OUTPUT_ARRAYS"
 
     def __init__(
         self,
@@ -64,6 +84,65 @@ class MatrixBase(ValhallaBaseAlgorithm):
             )
         )
 
+        for name, description in (
+            (self.IN_BLOCK_SOURCES, "Sources per request"),
+            (self.IN_BLOCK_TARGETS, "Targets per request"),
+        ):
+            block_param = QgsProcessingParameterNumber(
+                name,
+                description,
+                type=QgsProcessingParameterNumber.Type.Integer,
+                minValue=0,
+                defaultValue=0,
+            )
+            block_param.setHelp(
+                "Bigger matrices are split into blocks which are requested concurrently. If 0, the "
+                "block size is derived from the provider's 'Matrix location pairs per request'."
+            )
+            block_param.setFlags(
+                block_param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+            )
+            self.addParameter(block_param)
+
+        layout_param = QgsProcessingParameterEnum(
+            self.IN_LAYOUT,
+            "Output layout",
+            options=list(MatrixLayout),
+            defaultValue=0,
+        )
+        layout_param.setHelp(
+            "'one row per source' writes the targets' IDs, durations and distances as list fields, "
+            "which is a lot smaller than one row per source and target for big matrices."
+        )
+        layout_param.setFlags(layout_param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced)
+        self.addParameter(layout_param)
+
+        array_format_param = QgsProcessingParameterEnum(
+            self.IN_ARRAY_FORMAT,
+            "Matrix arrays format",
+            options=list(MatrixArrayFormat),
+            defaultValue=0,
+        )
+        array_format_param.setHelp(
+            "'npy' writes sources.npy, targets.npy, durations.npy and distances.npy, the latter as "
+            "(sources, targets) arrays which numpy.load(mmap_mode='r') maps without reading them. "
+            "'parquet' writes matrix.parquet with source, target, duration and distance columns and "
+            "needs the 'pyarrow' Python package."
+        )
+        array_format_param.setFlags(
+            array_format_param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+        )
+        self.addParameter(array_format_param)
+
+        self.addParameter(
+            QgsProcessingParameterFolderDestination(
+                self.OUT_ARRAYS,
+                "Matrix arrays",
+                optional=True,
+                createByDefault=False,
+            )
+        )
+
     def processAlgorithm(self, parameters, context, feedback):
         (
             layer_1,
@@ -73,59 +152,149 @@ class MatrixBase(ValhallaBaseAlgorithm):
         ) = self.get_base_params(parameters, context)
         layer_2 = self.parameterAsSource(parameters, self.IN_2, context)
         layer_field_name_2 = self.parameterAsString(parameters, self.IN_FIELD_2, context)
+        layout = MatrixLayout[self.parameterAsEnum(parameters, self.IN_LAYOUT, context)]
 
-        field_list = DEFAULT_LAYER_FIELDS[self.endpoint]
-        if layer_field_name_1:
-            layer_1_id_type = layer_1.fields().field(layer_field_name_1).type()
-            field_list[2].setType(layer_1_id_type)
-
-        if layer_field_name_2:
-            layer_2_id_type = layer_2.fields().field(layer_field_name_2).type()
-            field_list[3].setType(layer_2_id_type)
-
-        return_fields = QgsFields()
-
-        for f in field_list:
-            return_fields.append(f)
-
+        return_fields = self.get_matrix_fields(
+            layout,
+            layer_1.fields().field(layer_field_name_1).type() if layer_field_name_1 else None,
+            layer_2.fields().field(layer_field_name_2).type() if layer_field_name_2 else None,
+        )
         sink, dest_id = self.get_feature_sink(parameters, context, return_fields)
-        from_coords = get_wgs_coords_from_layer(layer_1)
-        from_indices = len(from_coords)
+        sources = get_wgs_coords_from_layer(layer_1)
+        targets = get_wgs_coords_from_layer(layer_2)
 
-        to_coords = get_wgs_coords_from_layer(layer_2)
-        to_indices = from_indices + len(to_coords)
+        # the layers' IDs in the order of their coordinates
+        source_ids = [
+            f[layer_field_name_1] if layer_field_name_1 else int(f.id()) for f in layer_1.getFeatures()
+        ]
+        target_ids = [
+            f[layer_field_name_2] if layer_field_name_2 else int(f.id()) for f in layer_2.getFeatures()
+        ]
 
-        coords = from_coords + to_coords
+        # locations which snap to the same place are requested once, their rows & columns repeated
+        source_counts = target_counts = None
+        tolerance = self.get_snap_tolerance(parameters, context)
+        if tolerance is not None:
+            sources, source_ids, source_counts = self.get_distinct_locations(
+                results_factory, sources, source_ids, tolerance, feedback
+            )
+            targets, target_ids, target_counts = self.get_distinct_locations(
+                results_factory, targets, target_ids, tolerance, feedback
+            )
+            source_offsets = np.concatenate(([0], np.cumsum(source_counts)))
 
-        params["sources"] = list(range(from_indices))
-        params["destinations"] = list(range(from_indices, to_indices))
+        provider = self.get_provider_setting(parameters, context)
+        blocks = plan_blocks(
+            len(sources),
+            len(targets),
+            provider.max_matrix_location_pairs,
+            self.parameterAsInt(parameters, self.IN_BLOCK_SOURCES, context),
+            self.parameterAsInt(parameters, self.IN_BLOCK_TARGETS, context),
+        )
+        feedback.pushInfo(
+            f"Requesting the {len(sources)}x{len(targets)} matrix in {len(blocks)} block(s)"
+        )
+
+        arrays_folder = self.parameterAsString(parameters, self.OUT_ARRAYS, context)
+        array_writer = (
+            self.get_array_writer(parameters, context, arrays_folder, source_ids, target_ids)
+            if arrays_folder
+            else None
+        )
 
+        iter_batches = (
+            results_factory.iter_matrix_wide_batches
+            if layout == MatrixLayout.WIDE
+            else results_factory.iter_matrix_batches
+        )
+        options = results_factory.feature_options(params)
         try:
-            feature_iter = results_factory.get_results(self.endpoint, coords, params, return_fields)
+            for rows, matrix in self.iter_matrix_block_rows(
+                results_factory, sources, targets, params, blocks, feedback
+            ):
+                if source_counts is not None:
+                    matrix = matrix.repeat(source_counts[rows.start : rows.stop], target_counts)
+                    rows = range(source_offsets[rows.start], source_offsets[rows.stop])
+                for batch in iter_batches(
+                    matrix, return_fields, options, source_ids[rows.start : rows.stop], target_ids
+                ):
+                    sink.addFeatures(batch, QgsFeatureSink.Flag.FastInsert)
+                if array_writer:
+                    array_writer.write_rows(rows, matrix)
         except (
             routingpy.exceptions.RouterApiError,
             routingpy.exceptions.RouterServerError,
         ) as e:
             raise QgsProcessingException(f"HTTP {e.status}: {e.message}")
+        finally:
+            if array_writer:
+                array_writer.close()
 
-        for feature_1 in layer_1.getFeatures():
-            for feature_2 in layer_2.getFeatures():
-                result_feat = next(feature_iter)
+        return {
+            self.OUT: dest_id,
+            **({self.OUT_ARRAYS: arrays_folder} if arrays_folder else dict()),
+            **self.write_options_table(parameters, context, feedback, results_factory),
+        }
 
-                if layer_field_name_1:
-                    result_feat[FieldNames.SOURCE] = feature_1[layer_field_name_1]
-                else:
-                    i = int(feature_1.id())
-                    result_feat.setAttribute(
-                        2, i
-                    )  # for some reason the dict-like attr setting does not work here
+    def get_array_writer(
+        self, parameters, context, folder: str, source_ids: list, target_ids: list
+    ) -> MatrixArrayWriter:
+        """
+        Returns the writer of the selected array format.
 
-                if layer_field_name_2:
-                    result_feat[FieldNames.TARGET] = feature_2[layer_field_name_2]
-                else:
-                    i = int(feature_2.id())
-                    result_feat.setAttribute(3, i)
+        :raises QgsProcessingException: if the format's library isn't installed
+        """
+        array_format = MatrixArrayFormat[self.parameterAsEnum(parameters, self.IN_ARRAY_FORMAT, context)]
+        try:
+            return get_matrix_writer(array_format, Path(folder), source_ids, target_ids)
+        except ImportError as e:
+            raise QgsProcessingException(
+                f"Failed to import library {e.name}, which is needed for the {array_format} "
+                f"export. Please install it, e.g. with 'pip install {e.name}'."
+            )
+
+    def get_distinct_locations(
+        self,
+        results_factory: ResultsFactory,
+        locations: list,
+        ids: list,
+        tolerance: float,
+        feedback,
+    ) -> Tuple[list, list, np.ndarray]:
+        """
+        Groups the locations by where they snap to, see get_snap_groups().
 
-                sink.addFeature(result_feat)
+        :returns: the first location of each group, the IDs of all locations ordered by group, which
+            is the order of the matrix' rows or columns once repeated, and the size of each group
+        """
+        groups = self.get_snap_groups(results_factory, locations, tolerance, feedback)
+
+        return (
+            [locations[group[0]] for group in groups],
+            [ids[idx] for group in groups for idx in group],
+            np.array([len(group) for group in groups], dtype=int),
+        )
+
+    def get_matrix_fields(
+        self,
+        layout: MatrixLayout,
+        source_id_type: Optional[QVariant],
+        target_id_type: Optional[QVariant],
+    ) -> QgsFields:
+        """
+        Returns the output fields of the layout, with the types of the layers' ID fields if given.
+        """
+        fields = QgsFields()
+        for field in (
+            WIDE_MATRIX_FIELDS if layout == MatrixLayout.WIDE else DEFAULT_LAYER_FIELDS[self.endpoint]
+        ):
+            field = QgsField(field)
+            if field.name() == FieldNames.SOURCE and source_id_type is not None:
+                field.setType(source_id_type)
+            elif field.name() == FieldNames.TARGET and target_id_type is not None:
+                field.setType(target_id_type)
+            elif field.name() == FieldNames.TARGETS and target_id_type is not None:
+                field.setSubType(target_id_type)
+            fields.append(field)
 
-        return {self.OUT: dest_id}
+        return fields
@@ -1,10 +1,19 @@
+import math
+from typing import Iterator, List
+
 from qgis.core import (
+    QgsFeature,
+    QgsFeatureSink,
     QgsField,
     QgsFields,
-    QgsProcessingException,
+    QgsProcessing,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterNumber,
+    QgsWkbTypes,
 )
 from qgis.PyQt.QtCore import QVariant
 
+from ....core.results_factory import HEIGHT_BATCH_SIZE, HEIGHT_MAX_POINTS
 from ....global_definitions import (
     DEFAULT_LAYER_FIELDS,
     FieldNames,
@@ -12,8 +21,8 @@ from ....global_definitions import (
     RouterProfile,
     RouterType,
 )
-from ....third_party.routingpy import routingpy
-from ....utils.layer_utils import get_wgs_coords_from_feature
+from ....utils.layer_utils import iter_wgs_features
+from ....utils.misc_utils import chunked
 from ...routing.base_algorithm import (
     ValhallaBaseAlgorithm,
 )
@@ -21,6 +30,10 @@ from ...routing.base_algorithm import (
 
 class ValhallaElevation(ValhallaBaseAlgorithm):
     WITH_COSTING_OPTIONS = False
+    IN_1_TYPES = [QgsProcessing.SourceType.TypeVectorPoint, QgsProcessing.SourceType.TypeVectorLine]
+
+    IN_BATCH_SIZE = "INPUT_BATCH_SIZE"
+    IN_RESAMPLE_DISTANCE = "INPUT_RESAMPLE_DISTANCE"
 
     def __init__(self):
         super(ValhallaElevation, self).__init__(
@@ -30,6 +43,35 @@ class ValhallaElevation(ValhallaBaseAlgorithm):
     def initAlgorithm(self, configuration, p_str=None, Any=None, *args, **kwargs):
         self.init_base_params()
 
+        batch_param = QgsProcessingParameterNumber(
+            self.IN_BATCH_SIZE,
+            "Points per request",
+            type=QgsProcessingParameterNumber.Type.Integer,
+            minValue=1,
+            maxValue=HEIGHT_MAX_POINTS,
+            defaultValue=HEIGHT_BATCH_SIZE,
+        )
+        batch_param.setHelp(
+            "The points are requested in batches of this size, several at once. Should not exceed the "
+            "server's 'service_limits.skadi.max_shape'."
+        )
+
+        resample_param = QgsProcessingParameterNumber(
+            self.IN_RESAMPLE_DISTANCE,
+            "Distance between a line's profile points (m)",
+            type=QgsProcessingParameterNumber.Type.Double,
+            minValue=0,
+            defaultValue=0,
+        )
+        resample_param.setHelp(
+            "Only for line layers: each line is resampled at this distance by the server, 0 keeps the "
+            "line's own vertices. Should not be below the server's 'service_limits.skadi.min_resample'."
+        )
+
+        for param in (batch_param, resample_param):
+            param.setFlags(param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced)
+            self.addParameter(param)
+
     def processAlgorithm(self, parameters, context, feedback):
         (
             layer_1,
@@ -52,23 +94,68 @@ class ValhallaElevation(ValhallaBaseAlgorithm):
         ):
             return_fields.append(field)
 
-        sink, dest_id = self.get_feature_sink(parameters, context, return_fields)
-
-        locations = []
-        for feature in layer_1.getFeatures():
-            coords = get_wgs_coords_from_feature(feature, layer_1.sourceCrs())
-            locations.append(coords)
-
-        try:
-            for idx, result_feat in enumerate(
-                results_factory.get_results(self.endpoint, locations, params, return_fields)
-            ):
-                result_feat[FieldNames.ID] = idx
-                sink.addFeature(result_feat)
-        except (
-            routingpy.exceptions.RouterApiError,
-            routingpy.exceptions.RouterServerError,
-        ) as e:
-            raise QgsProcessingException(f"HTTP {e.status}: {e.message}")
+        is_line = QgsWkbTypes.geometryType(layer_1.wkbType()) == QgsWkbTypes.GeometryType.LineGeometry
+        sink, dest_id = self.get_feature_sink(
+            parameters,
+            context,
+            return_fields,
+            QgsWkbTypes.Type.LineStringZM if is_line else None,
+        )
+
+        if is_line:
+            resample_distance = self.parameterAsDouble(parameters, self.IN_RESAMPLE_DISTANCE, context)
+            results = self.get_line_results(
+                layer_1, layer_field_name_1, results_factory, resample_distance, return_fields, feedback
+            )
+        else:
+            batch_size = self.parameterAsInt(parameters, self.IN_BATCH_SIZE, context)
+            results = self.get_point_results(
+                layer_1, layer_field_name_1, results_factory, batch_size, return_fields, feedback
+            )
+        for result_feats in results:
+            sink.addFeatures(result_feats, QgsFeatureSink.Flag.FastInsert)
 
         return {self.OUT: dest_id}
+
+    def get_point_results(
+        self, layer, id_field, results_factory, batch_size: int, fields: QgsFields, feedback
+    ) -> Iterator[List[QgsFeature]]:
+        """Requests the points' heights in batches and yields the 3D points batch by batch."""
+        # read lazily, so only the batches of the requests in flight are held in memory
+        batches = (
+            (tuple(feature_id for feature_id, _ in batch), [coords for _, coords in batch])
+            for batch in chunked(iter_wgs_features(layer, id_field), batch_size)
+        )
+
+        for feature_ids, result_feats in self.iter_with_progress(
+            results_factory.get_height_results(batches, fields),
+            math.ceil(layer.featureCount() / batch_size),
+            feedback,
+        ):
+            for feature_id, result_feat in zip(feature_ids, result_feats):
+                result_feat[FieldNames.ID] = feature_id
+            yield result_feats
+
+    def get_line_results(
+        self, layer, id_field, results_factory, resample_distance: float, fields: QgsFields, feedback
+    ) -> Iterator[List[QgsFeature]]:
+        """
+        Requests one height profile per line and yields the lines with z & m values, one per part
+        of multi-part lines.
+        """
+        # multi-part lines' parts are requested separately with the same key, the features' position
+        # tells features with the same ID apart
+        lines = (
+            ((position, feature_id), part)
+            for position, (feature_id, coords) in enumerate(iter_wgs_features(layer, id_field))
+            for part in (coords if coords and isinstance(coords[0][0], list) else [coords])
+        )
+
+        for (_, feature_id), result_feats in self.iter_with_progress(
+            results_factory.get_height_line_results(lines, resample_distance, fields),
+            layer.featureCount(),
+            feedback,
+        ):
+            for result_feat in result_feats:
+                result_feat[FieldNames.ID] = feature_id
+            yield result_feats
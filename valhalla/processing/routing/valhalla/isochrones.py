@@ -17,8 +17,6 @@ from ....global_definitions import (
     RouterProfile,
     RouterType,
 )
-from ....third_party.routingpy import routingpy
-from ....utils.layer_utils import get_wgs_coords_from_feature
 from ....utils.logger_utils import qgis_log
 from ..base_algorithm import (
     ValhallaBaseAlgorithm,
@@ -133,29 +131,26 @@ class ValhallaIsochronesBase(ValhallaBaseAlgorithm):
             return_fields.append(field)
 
         sink, dest_id = self.get_feature_sink(parameters, context, return_fields)
-        total_count = layer_1.featureCount()
-
-        for count, feature in enumerate(layer_1.getFeatures()):
-            if feedback.isCanceled():
-                break
-
-            coords = get_wgs_coords_from_feature(feature, layer_1.sourceCrs())
-            try:
-                for result_feat in results_factory.get_results(
-                    self.endpoint, [coords], params, return_fields
-                ):
-                    result_feat[FieldNames.ID] = (
-                        feature[layer_field_name_1] if layer_field_name_1 else feature.id()
-                    )
-                    sink.addFeature(result_feat)
-                    feedback.setProgress(int((count + 1) / total_count * 100))
-            except (
-                routingpy.exceptions.RouterApiError,
-                routingpy.exceptions.RouterServerError,
-            ) as e:
-                raise QgsProcessingException(f"HTTP {e.status}: {e.message}")
-
-        return {self.OUT: dest_id}
+
+        for feature_id, result_feats in self.iter_location_results(
+            parameters,
+            context,
+            feedback,
+            results_factory,
+            layer_1,
+            layer_field_name_1,
+            params,
+            return_fields,
+        ):
+            for result_feat in result_feats:
+                result_feat[FieldNames.ID] = feature_id
+                sink.addFeature(result_feat)
+
+        return {
+            self.OUT: dest_id,
+            **self.write_options_table(parameters, context, feedback, results_factory),
+            **self.write_failures_table(parameters, context, feedback),
+        }
 
 
 class ValhallaIsochroneCar(ValhallaIsochronesBase):
@@ -4,22 +4,24 @@ from qgis.core import (
     QgsField,
     QgsFields,
     QgsProcessing,
-    QgsProcessingException,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterNumber,
 )
 from qgis.PyQt.QtCore import QVariant
 
-from ....core.results_factory import DEFAULT_LAYER_FIELDS
+from ....core.results_factory import (
+    DEFAULT_LAYER_FIELDS,
+    TRACE_MAX_DISTANCE,
+    TRACE_MAX_POINTS,
+    TRACE_OVERLAP,
+)
 from ....global_definitions import (
     FieldNames,
     RouterEndpoint,
     RouterProfile,
     RouterType,
 )
-from ....third_party.routingpy import routingpy
-from ....utils.layer_utils import (
-    get_wgs_coords_from_feature,
-    get_wgs_coords_from_layer,
-)
+from ....utils.layer_utils import get_wgs_coords_from_feature
 from ...routing.base_algorithm import (
     ValhallaBaseAlgorithm,
 )
@@ -28,6 +30,10 @@ from ...routing.base_algorithm import (
 class MapMatchBase(ValhallaBaseAlgorithm):
     IN_1_TYPES = [QgsProcessing.SourceType.TypeVectorLine]
 
+    IN_MAX_POINTS = "INPUT_MAX_POINTS"
+    IN_MAX_DISTANCE = "INPUT_MAX_DISTANCE"
+    IN_OVERLAP = "INPUT_OVERLAP"
+
     def __init__(
         self,
         profile: Optional[Union[RouterProfile, str]] = None,
@@ -47,6 +53,46 @@ class MapMatchBase(ValhallaBaseAlgorithm):
     def initAlgorithm(self, configuration, p_str=None, Any=None, *args, **kwargs):
         self.init_base_params()
 
+        max_points_param = QgsProcessingParameterNumber(
+            self.IN_MAX_POINTS,
+            "Maximum trace points per request",
+            type=QgsProcessingParameterNumber.Type.Integer,
+            minValue=2,
+            defaultValue=TRACE_MAX_POINTS,
+        )
+        max_points_param.setHelp(
+            "Longer traces are split into overlapping windows, which are matched concurrently and "
+            "stitched back together. Should not exceed the server's 'service_limits.trace.max_shape'."
+        )
+
+        max_distance_param = QgsProcessingParameterNumber(
+            self.IN_MAX_DISTANCE,
+            "Maximum trace length per request (km)",
+            type=QgsProcessingParameterNumber.Type.Double,
+            minValue=0,
+            defaultValue=TRACE_MAX_DISTANCE / 1000,
+        )
+        max_distance_param.setHelp(
+            "Longer traces are split like above, 0 for no limit. Should not exceed the server's "
+            "'service_limits.trace.max_distance'."
+        )
+
+        overlap_param = QgsProcessingParameterNumber(
+            self.IN_OVERLAP,
+            "Overlapping trace points of consecutive requests",
+            type=QgsProcessingParameterNumber.Type.Integer,
+            minValue=0,
+            defaultValue=TRACE_OVERLAP,
+        )
+        overlap_param.setHelp(
+            "The matches of consecutive windows are cut in the middle of their overlap and joined, so "
+            "the overlap should cover enough points for both matches to agree on the road there."
+        )
+
+        for param in (max_points_param, max_distance_param, overlap_param):
+            param.setFlags(param.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced)
+            self.addParameter(param)
+
     def processAlgorithm(self, parameters, context, feedback):  # noqa: C901
         (
             layer_1,
@@ -72,28 +118,35 @@ class MapMatchBase(ValhallaBaseAlgorithm):
 
         # For a LineString layer, we want one match per feature layer
         sink, dest_id = self.get_feature_sink(parameters, context, return_fields)
-        coords = get_wgs_coords_from_layer(layer_1)
-
-        for count, feature in enumerate(layer_1.getFeatures()):
-            coords = get_wgs_coords_from_feature(feature, layer_1.sourceCrs())
-
-            if feedback.isCanceled():
-                break
-            try:
-                for result_feat in results_factory.get_results(
-                    self.endpoint, coords, params, return_fields
-                ):
-                    result_feat[FieldNames.ID] = (
-                        feature[layer_field_name_1] if layer_field_name_1 else feature.id()
-                    )
-                    sink.addFeature(result_feat)
-                    feedback.setProgress(int((count + 1) / total_count * 100))
-            except (
-                routingpy.exceptions.RouterApiError,
-                routingpy.exceptions.RouterServerError,
-            ) as e:
-                raise QgsProcessingException(f"HTTP {e.status}: {e.message}")
-        return {self.OUT: dest_id}
+
+        # read lazily, so only the traces of the requests in flight are held in memory
+        traces = (
+            (
+                (count, feature[layer_field_name_1] if layer_field_name_1 else feature.id()),
+                get_wgs_coords_from_feature(feature, layer_1.sourceCrs()),
+            )
+            for count, feature in enumerate(layer_1.getFeatures())
+        )
+        max_points = self.parameterAsInt(parameters, self.IN_MAX_POINTS, context)
+        overlap = self.parameterAsInt(parameters, self.IN_OVERLAP, context)
+        max_distance = self.parameterAsDouble(parameters, self.IN_MAX_DISTANCE, context) * 1000
+
+        def request(jobs, on_error):
+            return results_factory.get_mapmatch_results(
+                jobs, params, return_fields, max_points, overlap, max_distance, on_error=on_error
+            )
+
+        for (_, feature_id), result_feats in self.iter_job_results(
+            parameters, context, feedback, request, traces, total_count, return_fields
+        ):
+            for result_feat in result_feats:
+                result_feat[FieldNames.ID] = feature_id
+                sink.addFeature(result_feat)
+        return {
+            self.OUT: dest_id,
+            **self.write_options_table(parameters, context, feedback, results_factory),
+            **self.write_failures_table(parameters, context, feedback),
+        }
 
 
 class ValhallaMapMatchCar(MapMatchBase):
@@ -36,6 +36,8 @@ class SPOPTBaseAlgorithm(QgsProcessingAlgorithm):
     """The base class for the spatial optimization problems implemented in Pysal's Spopt package."""
 
     METRICS = (FieldNames.DURATION, FieldNames.DISTANCE)
+    # the metrics' list fields of MatrixLayout.WIDE
+    WIDE_METRICS = {FieldNames.DURATION: FieldNames.DURATIONS, FieldNames.DISTANCE: FieldNames.DISTANCES}
 
     IN_MATRIX_SOURCE = "INPUT_MATRIX_LAYER"
     IN_FAC_SOURCE = "INPUT_FAC_LAYER"
@@ -303,11 +305,14 @@ class SPOPTBaseAlgorithm(QgsProcessingAlgorithm):
             dem_source.sourceCrs() if dem_source and dem_id_field else WGS84,
         )
 
-        spopt_in_matrix = []
-
-        # get the unique sorted source and target ids from the matrix
-        unique_source_ids = sorted(od_matrix.uniqueValues(od_matrix.fields().indexOf(FieldNames.SOURCE)))
-        unique_target_ids = sorted(od_matrix.uniqueValues(od_matrix.fields().indexOf(FieldNames.TARGET)))
+        if od_matrix.fields().indexOf(self.WIDE_METRICS[metric]) >= 0:
+            spopt_in_matrix, unique_source_ids, unique_target_ids = self.get_wide_cost_matrix(
+                od_matrix, self.WIDE_METRICS[metric]
+            )
+        else:
+            spopt_in_matrix, unique_source_ids, unique_target_ids = self.get_cost_matrix(
+                od_matrix, metric, dem_id_type
+            )
 
         if n_fac:
             if len(unique_target_ids) < n_fac:
@@ -315,22 +320,6 @@ class SPOPTBaseAlgorithm(QgsProcessingAlgorithm):
                     f"Cannot site {n_fac} facilities, since there are only {len(unique_target_ids)} available."
                 )
 
-        # we build the input matrix for the SPOPT classes' from_cost_matrix methods
-        for target_id in unique_target_ids:
-            # for each target (demand point), we add an empty array to our matrix and populate it with
-            # the metric [duration/distance] to each source (facility)
-            spopt_in_matrix.append([])
-            exp = QgsExpression(
-                self.get_expression_template(dem_id_type).format(
-                    field=FieldNames.TARGET, value=target_id
-                )
-            )
-            req = QgsFeatureRequest(exp)
-            req.addOrderBy(FieldNames.SOURCE, ascending=True)
-            for fac_feat in od_matrix.getFeatures(req):
-                spopt_in_matrix[-1].append(fac_feat[metric])
-        spopt_in_matrix = np.array(spopt_in_matrix)
-
         predefined_arr = []
         if self.problem_type in (SpOptTypes.LSCP, SpOptTypes.MCLP):
             if fac_predefined_field:
@@ -446,6 +435,56 @@ class SPOPTBaseAlgorithm(QgsProcessingAlgorithm):
 
         return {self.OUT_FAC: fac_dest_id, self.OUT_DEM: dem_dest_id}
 
+    def get_cost_matrix(self, od_matrix: QgsProcessingFeatureSource, metric: str, dem_id_type):
+        """
+        Returns the (targets, sources) cost matrix of a matrix layer with one row per source & target,
+        and the sorted source & target IDs.
+        """
+        import numpy as np
+
+        # get the unique sorted source and target ids from the matrix
+        unique_source_ids = sorted(od_matrix.uniqueValues(od_matrix.fields().indexOf(FieldNames.SOURCE)))
+        unique_target_ids = sorted(od_matrix.uniqueValues(od_matrix.fields().indexOf(FieldNames.TARGET)))
+
+        spopt_in_matrix = []
+        # we build the input matrix for the SPOPT classes' from_cost_matrix methods
+        for target_id in unique_target_ids:
+            # for each target (demand point), we add an empty array to our matrix and populate it with
+            # the metric [duration/distance] to each source (facility)
+            spopt_in_matrix.append([])
+            exp = QgsExpression(
+                self.get_expression_template(dem_id_type).format(
+                    field=FieldNames.TARGET, value=target_id
+                )
+            )
+            req = QgsFeatureRequest(exp)
+            req.addOrderBy(FieldNames.SOURCE, ascending=True)
+            for fac_feat in od_matrix.getFeatures(req):
+                spopt_in_matrix[-1].append(fac_feat[metric])
+
+        return np.array(spopt_in_matrix), unique_source_ids, unique_target_ids
+
+    @staticmethod
+    def get_wide_cost_matrix(od_matrix: QgsProcessingFeatureSource, wide_metric: str):
+        """
+        Like get_cost_matrix() for a matrix layer with one row per source, i.e. MatrixLayout.WIDE,
+        which is read in one pass instead of one query per target.
+        """
+        import numpy as np
+
+        rows = dict()
+        target_ids = list()
+        for feat in od_matrix.getFeatures():
+            target_ids = feat[FieldNames.TARGETS]
+            rows[feat[FieldNames.SOURCE]] = feat[wide_metric]
+        unique_source_ids = sorted(rows)
+        target_order = sorted(range(len(target_ids)), key=lambda idx: target_ids[idx])
+
+        # None (unreachable) becomes NaN
+        costs = np.array([rows[source_id] for source_id in unique_source_ids], dtype=float)
+
+        return costs[:, target_order].T, unique_source_ids, [target_ids[idx] for idx in target_order]
+
     @classmethod
     def get_expression_template(cls, value_type: QVariant.Type):
         """Gets a string for a QgsExpression that either checks value equality quoted or unquoted, depending on the given value type."""
@@ -1,13 +1,15 @@
-from typing import List
+from typing import List, Sequence
 
 from qgis.core import (
     QgsCoordinateReferenceSystem,
     QgsCoordinateTransform,
+    QgsGeometry,
     QgsPointXY,
     QgsProject,
 )
 
 from ..third_party.routingpy.routingpy.utils import decode_polyline5
+from .polyline_utils import linestring_wkb, linestring_zm_wkb, polygon_wkb
 
 WGS84 = QgsCoordinateReferenceSystem.fromEpsgId(4326)
 
@@ -34,3 +36,27 @@ def point_to_wgs84(
 def decode_polyline(encoded: str) -> List[QgsPointXY]:
     # TODO: change the order to lnglat: the uploader used the wrong order when encoding
     return [QgsPointXY(x, y) for x, y in decode_polyline5(encoded, order="latlng")]
+
+
+def line_from_coords(coords: Sequence) -> QgsGeometry:
+    """Builds a line geometry from lon/lat coordinates via WKB, without a QgsPoint per vertex."""
+    geom = QgsGeometry()
+    geom.fromWkb(linestring_wkb(coords))
+
+    return geom
+
+
+def line_zm_from_coords(coords: Sequence) -> QgsGeometry:
+    """Builds a line geometry with z & m values from (lon, lat, z, m) coordinates via WKB."""
+    geom = QgsGeometry()
+    geom.fromWkb(linestring_zm_wkb(coords))
+
+    return geom
+
+
+def polygon_from_rings(rings: Sequence[Sequence]) -> QgsGeometry:
+    """Builds a polygon geometry from lon/lat rings, the first one being the exterior ring."""
+    geom = QgsGeometry()
+    geom.fromWkb(polygon_wkb(rings))
+
+    return geom
@@ -1,9 +1,8 @@
-import json
-
 from qgis.core import QgsNetworkAccessManager
-from qgis.PyQt.QtCore import QJsonDocument, QUrl
+from qgis.PyQt.QtCore import QUrl
 from qgis.PyQt.QtNetwork import QNetworkRequest
 
+from ..utils.json_utils import dumps
 from ..utils.resource_utils import get_json_body
 
 
@@ -27,7 +26,6 @@ def get_status_response(base_url: str, verbose: bool = False) -> dict:
     req_args = {"request": req}
     if verbose:
         req_method = nam.blockingPost
-        body = QJsonDocument.fromJson(json.dumps({"verbose": True}).encode())
-        req_args.update({"data": body.toJson()})
+        req_args.update({"data": dumps({"verbose": True})})
 
     return get_json_body(req_method(**req_args))
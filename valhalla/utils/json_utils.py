@@ -0,0 +1,205 @@
+import codecs
+import json
+import re
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+# the available JSON codecs as name: (dumps, loads), all produce the same compact UTF-8 output
+BACKENDS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[Union[bytes, str]], Any]]] = {
+    "json": (_json_dumps, json.loads)
+}
+
+try:
+    import ujson
+
+    def _ujson_dumps(obj: Any) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode()
+
+    BACKENDS["ujson"] = (_ujson_dumps, ujson.loads)
+except ImportError:
+    pass
+
+try:
+    import orjson
+
+    def _orjson_dumps(obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # e.g. non-string keys or integers beyond 64 bit
+            return _json_dumps(obj)
+
+    BACKENDS["orjson"] = (_orjson_dumps, orjson.loads)
+except ImportError:
+    pass
+
+# the fastest one we have
+JSON_BACKEND = next(name for name in ("orjson", "ujson", "json") if name in BACKENDS)
+_dumps, _loads = BACKENDS[JSON_BACKEND]
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialises ``obj`` to compact, UTF-8 encoded JSON with the fastest available backend."""
+    return _dumps(obj)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Deserialises a JSON document with the fastest available backend.
+
+    :raises ValueError: if ``data`` isn't valid JSON
+    """
+    return _loads(data)
+
+
+# the bytes of a document decoded at once by iter_json_array()
+JSON_CHUNK_SIZE = 1 << 20
+# the characters which can follow a complete number
+_NUMBER_END = frozenset(",]} \t\n\r")
+
+
+class _JsonWindow:
+    def __init__(self, doc: Union[bytes, str], chunk_size: int):
+        """
+        The not yet consumed text of a JSON document, which is decoded from UTF-8 chunk by chunk,
+        so a huge response is never held as a whole str next to its bytes.
+        """
+        if isinstance(doc, str):
+            self._chunks: Iterator[str] = iter(())
+            self.text = doc
+        else:
+            self._chunks = self._decode(memoryview(doc), chunk_size)
+            self.text = ""
+        self.idx = 0
+
+    @staticmethod
+    def _decode(view: memoryview, chunk_size: int) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for start in range(0, len(view), chunk_size):
+            # a character split between chunks is held back by the decoder
+            yield decoder.decode(view[start : start + chunk_size], final=start + chunk_size >= len(view))
+
+    def more(self) -> bool:
+        """
+        Drops the consumed text and appends at least as much as is left, so a value spanning many
+        chunks isn't decoded over and over. Returns False at the end of the document.
+        """
+        rest = self.text[self.idx :]
+        chunks = [rest]
+        added = 0
+        for chunk in self._chunks:
+            chunks.append(chunk)
+            added += len(chunk)
+            if added >= len(rest):
+                break
+        if not added:
+            return False
+        self.text = "".join(chunks)
+        self.idx = 0
+
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character, an empty string at the end."""
+        while True:
+            self.idx = _WHITESPACE.match(self.text, self.idx).end()
+            if self.idx < len(self.text) or not self.more():
+                return self.text[self.idx : self.idx + 1]
+
+    def expect(self, char: str):
+        """Consumes ``char``."""
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.text, self.idx)
+        self.idx += 1
+
+    def delimiter(self, close: str):
+        """Consumes the delimiter after an element, ``close`` is left for the caller."""
+        char = self.peek()
+        if char == ",":
+            self.idx += 1
+        elif char != close:
+            raise json.JSONDecodeError("Expecting ',' delimiter", self.text, self.idx)
+
+    def value(self) -> Any:
+        """Decodes the next value, with as many chunks as it needs."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.idx)
+            except json.JSONDecodeError:
+                if not self.more():
+                    raise
+                continue
+            # a number at the end of the text might go on in the next chunk
+            complete = end < len(self.text) and (
+                not isinstance(value, (int, float)) or self.text[end] in _NUMBER_END
+            )
+            if complete or not self.more():
+                self.idx = end
+                return value
+
+    def items(self) -> Iterator[Any]:
+        """Decodes the items of the array whose "[" was consumed, up to & including its "]"."""
+        while True:
+            # fast path: the item & its delimiter are in the text
+            text = self.text
+            try:
+                item, end = _decoder.raw_decode(text, _WHITESPACE.match(text, self.idx).end())
+                idx = _WHITESPACE.match(text, end).end()
+                char = text[idx]
+            except (json.JSONDecodeError, IndexError):
+                char = None
+            if char == ",":
+                self.idx = idx + 1
+                yield item
+                continue
+            elif char == "]":
+                self.idx = idx + 1
+                yield item
+                return
+
+            if self.peek() == "]":
+                self.idx += 1
+                return
+            yield self.value()
+            self.delimiter("]")
+
+
+def iter_json_array(
+    doc: Union[bytes, str], key: str, members: Optional[dict] = None, chunk_size: int = JSON_CHUNK_SIZE
+) -> Iterator[Any]:
+    """
+    Incrementally decodes the array ``key`` of the top-level JSON object ``doc``, so only
+    one array item at a time is turned into Python objects, instead of the whole document.
+    UTF-8 bytes are decoded ``chunk_size`` bytes at a time, never as a whole.
+
+    :param doc: the JSON document, its top level has to be an object
+    :param key: the name of the top-level member holding the array
+    :param members: if given, is filled with all other top-level members; note, the ones after
+        the array are only available once the iterator is exhausted. If ``key`` isn't an array,
+        it ends up in here as well.
+    :raises json.JSONDecodeError: if the document isn't valid JSON
+    :raises UnicodeDecodeError: if the bytes aren't valid UTF-8
+    """
+    window = _JsonWindow(doc, chunk_size)
+    window.expect("{")
+    while window.peek() != "}":
+        name = window.value()
+        window.expect(":")
+
+        if name == key and window.peek() == "[":
+            window.idx += 1
+            yield from window.items()
+        else:
+            value = window.value()
+            if members is not None:
+                members[name] = value
+
+        window.delimiter("}")
@@ -1,5 +1,5 @@
 import json
-from typing import Dict, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from qgis.core import (
     Qgis,
@@ -70,6 +70,45 @@ def get_wgs_coords_from_feature(feature: QgsFeature, crs: QgsCoordinateReference
     return json_feature["geometry"]["coordinates"]
 
 
+def read_wgs_features(
+    source: Union[QgsVectorLayer, QgsProcessingFeatureSource], id_field: Optional[str] = None
+) -> List[Tuple[Any, list]]:
+    """
+    Reads the ID & WGS84 coordinates of all features in one pass, see iter_wgs_features().
+
+    :returns: list of (ID, coordinates) like get_wgs_coords_from_feature()
+    """
+    return list(iter_wgs_features(source, id_field))
+
+
+def iter_wgs_features(
+    source: Union[QgsVectorLayer, QgsProcessingFeatureSource], id_field: Optional[str] = None
+) -> Iterator[Tuple[Any, list]]:
+    """
+    Lazily reads the ID & WGS84 coordinates of the features, only fetching the ID field and the
+    geometry from the provider.
+
+    :param source: a QgsVectorLayer or QgsProcessingFeatureSource
+    :param id_field: the field holding the IDs, the feature IDs are used if not given
+    :returns: iterator of (ID, coordinates) like get_wgs_coords_from_feature()
+    """
+    request = QgsFeatureRequest()
+    if id_field:
+        request.setSubsetOfAttributes([id_field], source.fields())
+    else:
+        request.setNoAttributes()
+
+    exporter = QgsJsonExporter()
+    exporter.setSourceCrs(source.sourceCrs())  # needed for automatic conversion to WGS84
+    exporter.setIncludeAttributes(False)
+
+    for feature in source.getFeatures(request):
+        yield (
+            feature[id_field] if id_field else feature.id(),
+            json.loads(exporter.exportFeature(feature))["geometry"]["coordinates"],
+        )
+
+
 def get_wgs_coords_from_layer(
     layer: Union[QgsVectorLayer, QgsProcessingFeatureSource],
     order_by: Optional[str] = None,
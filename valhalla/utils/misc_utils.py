@@ -1,6 +1,8 @@
 from enum import Enum, EnumMeta
 from itertools import islice
-from typing import Union
+from typing import Iterable, Iterator, List, TypeVar, Union
+
+T = TypeVar("T")
 
 
 def deep_merge(d1: dict, d2: dict) -> dict:
@@ -22,6 +24,34 @@ def deep_merge(d1: dict, d2: dict) -> dict:
     return result
 
 
+def format_duration(seconds: float) -> str:
+    """
+    Formats a number of seconds for humans, e.g. "1h 05m", "4m 12s" or "9s".
+    """
+    seconds = max(0, round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+
+    return f"{seconds}s"
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Yields consecutive lists of ``size`` items, the last one possibly shorter, without reading
+    more of ``items`` than the current chunk.
+    """
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
 def str_to_bool(s: Union[str, int]) -> bool:
     """
     Converts a string or integer into a boolean.
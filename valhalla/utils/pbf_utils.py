@@ -0,0 +1,132 @@
+from typing import Iterator, List, Optional, Tuple
+
+# Valhalla's protobuf API, see https://github.com/valhalla/valhalla/tree/master/proto. Only the
+# messages & fields the plugin reads are declared, the decoder skips all other fields.
+# message name: [(field name, field number, type, repeated, message type)]
+_SCHEMA = {
+    "Api": [
+        ("directions", 3, "message", False, "Directions"),
+        ("matrix", 5, "message", False, "Matrix"),
+        ("isochrone", 6, "message", False, "Isochrone"),
+    ],
+    "Directions": [("routes", 1, "message", True, "DirectionsRoute")],
+    "DirectionsRoute": [("legs", 1, "message", True, "DirectionsLeg")],
+    "DirectionsLeg": [
+        ("summary", 5, "message", False, "DirectionsLegSummary"),
+        ("shape", 7, "string", False, None),  # polyline6
+    ],
+    "DirectionsLegSummary": [
+        ("length", 1, "float", False, None),  # in the request's units
+        ("time", 2, "double", False, None),  # seconds
+    ],
+    "Matrix": [
+        ("distances", 2, "uint32", True, None),  # meters
+        ("times", 3, "float", True, None),  # seconds
+        ("from_indices", 4, "uint32", True, None),
+        ("to_indices", 5, "uint32", True, None),
+    ],
+    "Isochrone": [("intervals", 1, "message", True, "IsochroneInterval")],
+    "IsochroneInterval": [
+        ("metric", 1, "int32", False, None),  # enum, see ISOCHRONE_METRICS
+        ("metric_value", 2, "float", False, None),
+        ("contours", 3, "message", True, "IsochroneContour"),
+    ],
+    "IsochroneContour": [("geometries", 1, "message", True, "IsochroneGeometry")],
+    "IsochroneGeometry": [("coords", 1, "sint32", True, None)],  # lon, lat, lon, ... as 1e-6 degrees
+}
+
+ISOCHRONE_METRICS = ("time", "distance")
+COORDINATE_PRECISION = 1e6
+# Valhalla's kMaxCost, marks unreachable matrix cells
+MAX_COST = 99999999.9999
+
+try:
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+    from google.protobuf.message import DecodeError
+
+    def _build_api_class():
+        """Builds the message class of the declared Valhalla Api subset, no generated code needed."""
+        field_types = descriptor_pb2.FieldDescriptorProto
+        file_proto = descriptor_pb2.FileDescriptorProto(
+            name="valhalla_qgis_api.proto", package="valhalla_qgis", syntax="proto3"
+        )
+        for message_name, fields in _SCHEMA.items():
+            message_proto = file_proto.message_type.add(name=message_name)
+            for field_name, number, field_type, repeated, message_type in fields:
+                field_proto = message_proto.field.add(
+                    name=field_name,
+                    number=number,
+                    type=getattr(field_types, f"TYPE_{field_type.upper()}"),
+                    label=field_types.LABEL_REPEATED if repeated else field_types.LABEL_OPTIONAL,
+                )
+                if message_type:
+                    field_proto.type_name = f".valhalla_qgis.{message_type}"
+
+        pool = descriptor_pool.DescriptorPool()
+        pool.AddSerializedFile(file_proto.SerializeToString())
+        descriptor = pool.FindMessageTypeByName("valhalla_qgis.Api")
+        try:
+            return message_factory.GetMessageClass(descriptor)
+        except AttributeError:
+            # protobuf < 4.21
+            return message_factory.MessageFactory(pool).GetPrototype(descriptor)
+
+    _Api = _build_api_class()
+except ImportError:
+    _Api = None
+    DecodeError = ValueError
+
+PBF_AVAILABLE = _Api is not None
+
+
+def parse_api(raw: bytes):
+    """
+    Decodes a Valhalla protobuf response, i.e. one requested with ``"format": "pbf"``.
+
+    :raises ValueError: if ``raw`` isn't a valid protobuf message
+    :raises ImportError: if the protobuf package isn't installed, see ``PBF_AVAILABLE``
+    """
+    if _Api is None:
+        raise ImportError("The protobuf package is needed to decode Valhalla's pbf responses")
+
+    api = _Api()
+    try:
+        api.ParseFromString(raw)
+    except DecodeError as e:
+        raise ValueError(f"Can't decode protobuf response: {e}")
+
+    return api
+
+
+def iter_route_legs(api) -> Iterator[Tuple[str, float, float]]:
+    """Yields the (polyline6 shape, length, time) of each leg of the first route."""
+    for route in api.directions.routes[:1]:
+        for leg in route.legs:
+            yield leg.shape, leg.summary.length, leg.summary.time
+
+
+def iter_matrix_cells(api) -> Iterator[Tuple[int, int, Optional[float], Optional[int]]]:
+    """Yields (source index, target index, time, distance) of each matrix cell, None if unreachable."""
+    matrix = api.matrix
+    for source, target, time, distance in zip(
+        matrix.from_indices, matrix.to_indices, matrix.times, matrix.distances
+    ):
+        if time >= MAX_COST:
+            yield source, target, None, None
+        else:
+            yield source, target, time, distance
+
+
+def iter_isochrone_rings(api) -> Iterator[Tuple[str, float, List[List[Tuple[float, float]]]]]:
+    """
+    Yields (metric, metric value, rings) of each contour, the largest first like Valhalla's GeoJSON.
+    The rings are lists of lon/lat tuples, the first one is the exterior ring for polygons.
+    """
+    for interval in sorted(api.isochrone.intervals, key=lambda i: i.metric_value, reverse=True):
+        metric = ISOCHRONE_METRICS[interval.metric]
+        for contour in interval.contours:
+            rings = list()
+            for geometry in contour.geometries:
+                coords = [c / COORDINATE_PRECISION for c in geometry.coords]
+                rings.append(list(zip(coords[::2], coords[1::2])))
+            yield metric, interval.metric_value, rings
@@ -0,0 +1,108 @@
+import struct
+from typing import Sequence
+
+import numpy as np
+
+# little endian WKB headers
+_WKB_LINESTRING = struct.pack("<BI", 1, 2)
+_WKB_POLYGON = struct.pack("<BI", 1, 3)
+_WKB_LINESTRING_ZM = struct.pack("<BI", 1, 3002)
+
+
+def decode_polyline_array(encoded: str, precision: int = 6) -> np.ndarray:
+    """
+    Decodes an encoded polyline, e.g. Valhalla's shapes, all at once with NumPy instead of value
+    by value in Python.
+
+    :param encoded: the encoded polyline, in lat/lon order
+    :param precision: 6 for Valhalla's polyline6, 5 for Google's polyline
+    :returns: array of shape (n, 2) in lon/lat order
+    :raises ValueError: if ``encoded`` isn't a valid polyline
+    """
+    data = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    if not data.size:
+        return np.empty((0, 2))
+    if data.min() < 0 or data.max() > 63:
+        raise ValueError(f"Invalid character in polyline {encoded!r}")
+
+    # each value is split into 5 bit chunks, all but its last chunk have the 0x20 bit set
+    ends = np.flatnonzero((data & 0x20) == 0)
+    if not ends.size or ends[-1] != data.size - 1 or ends.size % 2:
+        raise ValueError(f"Incomplete polyline {encoded!r}")
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    chunk_positions = np.arange(data.size) - np.repeat(starts, ends - starts + 1)
+    values = np.add.reduceat((data & 0x1F) << (5 * chunk_positions), starts)
+
+    # zigzag decoding of the deltas, which are summed up to the actual coordinates
+    deltas = (values >> 1) ^ -(values & 1)
+    latlon = np.cumsum(deltas.reshape(-1, 2), axis=0) / 10**precision
+
+    return latlon[:, ::-1]
+
+
+def encode_polyline_array(coords: Sequence, precision: int = 6) -> str:
+    """
+    Encodes coordinates as a polyline, e.g. for Valhalla's ``encoded_polyline`` parameter, all at
+    once with NumPy, see :func:`decode_polyline_array`.
+
+    :param coords: array-like of shape (n, 2) in lon/lat order, any further dimension, e.g. the z
+        of 3D layers, is dropped
+    :param precision: 6 for Valhalla's polyline6, 5 for Google's polyline
+    """
+    coords = np.atleast_2d(np.asarray(coords, dtype=float))[..., :2].reshape(-1, 2)
+    if not coords.size:
+        return ""
+
+    latlon = np.round(coords[:, ::-1] * 10**precision).astype(np.int64)
+    deltas = np.diff(latlon, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    # zigzag encoding, so small negative deltas need few chunks as well
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    # each value is split into 5 bit chunks, least significant first, all but its last chunk get
+    # the 0x20 bit set
+    width = max(1, (int(values.max()).bit_length() + 4) // 5)
+    shifts = 5 * np.arange(width)
+    chunks = (values[:, None] >> shifts) & 0x1F
+    counts = 1 + ((values[:, None] >> shifts[1:]) > 0).sum(axis=1)
+    positions = np.arange(width)
+    chars = chunks | np.where(positions < (counts - 1)[:, None], 0x20, 0)
+
+    return (chars[positions < counts[:, None]] + 63).astype(np.uint8).tobytes().decode("ascii")
+
+
+def _points_wkb(coords: Sequence, dimensions: int = 2) -> bytes:
+    """Returns the number of points and their doubles, any further dimension is dropped."""
+    coords = np.asarray(coords, dtype=float)
+    if not coords.size:
+        coords = np.empty((0, dimensions))
+    coords = np.ascontiguousarray(coords[:, :dimensions], dtype="<f8")
+
+    return struct.pack("<I", len(coords)) + coords.tobytes()
+
+
+def linestring_wkb(coords: Sequence) -> bytes:
+    """
+    Returns the little endian WKB of a 2D line string, e.g. for QgsGeometry.fromWkb(), which
+    spares creating a Python object per vertex.
+
+    :param coords: array-like of shape (n, 2) or (n, 3), the third dimension is dropped
+    """
+    return _WKB_LINESTRING + _points_wkb(coords)
+
+
+def linestring_zm_wkb(coords: Sequence) -> bytes:
+    """
+    Returns the little endian ISO WKB of a line string with z & m values, see :func:`linestring_wkb`.
+
+    :param coords: array-like of shape (n, 4), i.e. x, y, z & m
+    """
+    return _WKB_LINESTRING_ZM + _points_wkb(coords, dimensions=4)
+
+
+def polygon_wkb(rings: Sequence[Sequence]) -> bytes:
+    """
+    Returns the little endian WKB of a 2D polygon.
+
+    :param rings: the closed rings, the first one is the exterior ring, see :func:`linestring_wkb`
+    """
+    return _WKB_POLYGON + struct.pack("<I", len(rings)) + b"".join(_points_wkb(ring) for ring in rings)
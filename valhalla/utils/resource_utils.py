@@ -6,6 +6,7 @@ import shlex
 import stat
 import subprocess
 import zipfile
+import zlib
 from enum import Enum
 from pathlib import Path
 from shutil import rmtree
@@ -20,10 +21,11 @@ from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
 
 from .. import RESOURCE_PATH
-from ..core.settings import ValhallaSettings, get_settings_dir
+from ..core.settings import ValhallaSettings, get_settings_dir, get_settings_snapshot
 from ..exceptions import ValhallaCmdError
 from ..global_definitions import PYTHON_EXE, PyPiPkg, PyPiState
 from ..third_party.routingpy.routingpy import exceptions
+from .json_utils import loads
 
 PYPI_URL = "https://pypi.org/pypi/{pkg_name}/json"
 
@@ -69,7 +71,7 @@ def get_local_lib_version() -> Optional[str]:
         return None
 
     try:
-        exe_path = ValhallaSettings().get_binary_dir().joinpath("valhalla_service")
+        exe_path = get_settings_snapshot().binary_dir.joinpath("valhalla_service")
         proc: subprocess.CompletedProcess = exec_cmd(f"{exe_path.absolute()} --version")
     except (ValhallaCmdError, subprocess.CalledProcessError):
         return None
@@ -150,6 +152,34 @@ def exec_cmd(cmd: str) -> subprocess.CompletedProcess:
     return subprocess.run(cmd_split, text=True, check=True, capture_output=True, shell=False)
 
 
+def get_response_body(response: QgsNetworkReplyContent) -> bytes:
+    """
+    Returns the response's body, decompressed if the server sent it gzip/deflate encoded, which
+    only happens if we set the Accept-Encoding header ourselves (else Qt decodes transparently).
+
+    :param response: The full response
+    :raises routingpy.exceptions.RouterError: If the body can't be decompressed
+    """
+    raw = bytes(response.content())
+    encoding = response.rawHeader(b"Content-Encoding").data().decode().strip().lower()
+    if not raw or encoding not in ("gzip", "deflate"):
+        return raw
+
+    try:
+        if encoding == "gzip":
+            return zlib.decompress(raw, wbits=zlib.MAX_WBITS | 16)
+        try:
+            return zlib.decompress(raw)
+        except zlib.error:
+            # some servers send raw deflate streams without the zlib header
+            return zlib.decompress(raw, wbits=-zlib.MAX_WBITS)
+    except zlib.error as e:
+        raise exceptions.RouterError(
+            response.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute),
+            f"Can't decompress {encoding} response: {e}",
+        )
+
+
 def get_json_body(response: QgsNetworkReplyContent) -> dict:
     """
     Parse the response and return the JSON body.
@@ -165,7 +195,11 @@ def get_json_body(response: QgsNetworkReplyContent) -> dict:
 
     error_code = response.error()
 
-    if error_code == QNetworkReply.NetworkError.TimeoutError:
+    # Qt aborts requests exceeding their transfer timeout as canceled
+    if error_code in (
+        QNetworkReply.NetworkError.TimeoutError,
+        QNetworkReply.NetworkError.OperationCanceledError,
+    ):
         raise exceptions.Timeout("Request timed out.")
 
     status_code = response.attribute(QNetworkRequest.Attribute.HttpStatusCodeAttribute)
@@ -173,10 +207,10 @@ def get_json_body(response: QgsNetworkReplyContent) -> dict:
         msg = f"{response.errorString()} for URL {response.request().url().toString()}"
         raise exceptions.RouterError(response.error(), msg)
 
-    raw = bytes(response.content())
+    raw = get_response_body(response)
     try:
-        body = json.loads(raw or b"{}")
-    except json.decoder.JSONDecodeError:
+        body = loads(raw or b"{}")
+    except ValueError:
         # non-JSON body (e.g. upstream returned plain text like "The server didn't
         # respond in time"). Only treat this as a parse error on 200 OK; otherwise
         # surface the raw text via the appropriate RouterError subclass.
@@ -249,7 +283,7 @@ def create_valhalla_config(force=False):
 
 
 def check_valhalla_installation() -> bool:
-    current_bin_dir = ValhallaSettings().get_binary_dir()
+    current_bin_dir = get_settings_snapshot().binary_dir
 
     if current_bin_dir is None:
         return False
@@ -0,0 +1,48 @@
+import math
+from typing import Dict, Hashable, List, Optional, Sequence
+
+METERS_PER_DEGREE = 111320.0  # of latitude
+
+
+def snap_key(location: Optional[dict], tolerance: float = 0) -> Optional[Hashable]:
+    """
+    Returns what identifies where a location snapped to, given its /locate result: the correlated
+    ways & sides of the street and the correlated position, on a grid of ``tolerance`` meters.
+
+    :param location: one location of a /locate response, None for a skipped API error
+    :param tolerance: the grid size in meters, 0 for Valhalla's 6 decimals
+    :returns: the key, None if the location didn't snap to any edge
+    """
+    edges = location.get("edges") if location else None
+    if not edges:
+        return None
+
+    lon, lat = edges[0]["correlated_lon"], edges[0]["correlated_lat"]
+    if tolerance > 0:
+        cell = tolerance / METERS_PER_DEGREE
+        position = (round(lon * math.cos(math.radians(lat)) / cell), round(lat / cell))
+    else:
+        position = (round(lon, 6), round(lat, 6))
+    ways = frozenset((edge.get("way_id"), edge.get("side_of_street")) for edge in edges)
+
+    return ways, position
+
+
+def group_locations(keys: Sequence[Optional[Hashable]]) -> List[List[int]]:
+    """
+    Groups the indices of equal keys, see snap_key(), in the order of each group's first index.
+    Locations without a key get a group of their own.
+    """
+    groups: List[List[int]] = list()
+    groups_by_key: Dict[Hashable, List[int]] = dict()
+    for idx, key in enumerate(keys):
+        if key is None:
+            groups.append([idx])
+            continue
+        group = groups_by_key.get(key)
+        if group is None:
+            group = groups_by_key[key] = list()
+            groups.append(group)
+        group.append(idx)
+
+    return groups
@@ -0,0 +1,172 @@
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS = 6371008.8  # meters
+# the matched line near a cut is searched within this factor of the trace's distance plus the margin
+# in meters, since the match may be longer than the trace, e.g. where points snap to a parallel road
+CUT_SEARCH_FACTOR = 2
+CUT_SEARCH_MARGIN = 100
+
+
+class TracePart(NamedTuple):
+    """A matched line of a trace with its duration in seconds and distance in meters."""
+
+    coords: np.ndarray  # (n, 2) lon/lat
+    duration: float
+    distance: float
+
+
+def _segment_lengths(coords: np.ndarray) -> np.ndarray:
+    """Returns the haversine lengths in meters of the segments between consecutive lon/lat coordinates."""
+    lon, lat = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    a = (
+        np.sin(np.diff(lat) / 2) ** 2
+        + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def line_length(coords: np.ndarray) -> float:
+    """Returns the length in meters of a lon/lat line."""
+    if len(coords) < 2:
+        return 0.0
+
+    return float(_segment_lengths(coords).sum())
+
+
+def split_trace(
+    coords: Sequence, max_points: int, overlap: int = 0, max_distance: float = 0
+) -> List[Tuple[int, int]]:
+    """
+    Splits a trace into windows which fit the server's trace limits, i.e. Valhalla's
+    ``service_limits.trace.max_shape`` & ``max_distance``.
+
+    :param coords: the trace's lon/lat coordinates
+    :param max_points: the maximum number of points per window, at least 2
+    :param overlap: the number of points consecutive windows share, capped at half a window
+    :param max_distance: the maximum length of a window in meters, 0 for no limit
+    :returns: the windows as (start, stop) indices of ``coords``
+    :raises ValueError: if ``max_points`` is less than 2
+    """
+    if max_points < 2:
+        raise ValueError(f"A trace window needs at least 2 points, not {max_points}")
+    coords = np.asarray(coords, dtype=float)
+    count = len(coords)
+    if count <= 2:
+        return [(0, count)]
+
+    cumulative = None
+    if max_distance:
+        cumulative = np.concatenate(([0.0], np.cumsum(_segment_lengths(coords))))
+
+    windows = list()
+    start = 0
+    while True:
+        stop = min(start + max_points, count)
+        if cumulative is not None:
+            reachable = int(np.searchsorted(cumulative, cumulative[start] + max_distance, side="right"))
+            stop = min(stop, max(reachable, start + 2))
+        windows.append((start, stop))
+        if stop >= count:
+            return windows
+        # half a window at most, so each window advances
+        start = stop - min(overlap, (stop - start) // 2)
+
+
+def cut_indices(windows: Sequence[Tuple[int, int]]) -> List[Optional[int]]:
+    """
+    Returns the index of the trace point each window's match is cut at to be stitched with the
+    next window's match, i.e. the middle of their overlap, None if they don't overlap and the last.
+    """
+    cuts: List[Optional[int]] = list()
+    for (_, stop), (next_start, _) in zip(windows, windows[1:]):
+        cuts.append((next_start + stop - 1) // 2 if next_start < stop else None)
+
+    return cuts + [None]
+
+
+def locate_point(
+    coords: np.ndarray, point: Sequence[float], segments: Optional[range] = None
+) -> Tuple[int, np.ndarray]:
+    """
+    Returns the index of the line's segment closest to ``point`` and the point projected onto it,
+    in the plane with the longitudes scaled to the point's latitude.
+
+    :param coords: the line's lon/lat coordinates, at least 2
+    :param segments: the indices of the segments to search, all if not given
+    """
+    if segments is None:
+        segments = range(len(coords) - 1)
+    scale = np.array([np.cos(np.radians(point[1])), 1.0])
+    starts = coords[segments.start : segments.stop] * scale
+    ends = coords[segments.start + 1 : segments.stop + 1] * scale
+    target = np.asarray(point, dtype=float) * scale
+
+    vectors = ends - starts
+    squared = (vectors**2).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fractions = np.clip(((target - starts) * vectors).sum(axis=1) / squared, 0, 1)
+    fractions[squared == 0] = 0
+    projected = starts + vectors * fractions[:, None]
+    idx = int(((projected - target) ** 2).sum(axis=1).argmin())
+
+    return segments.start + idx, projected[idx] / scale
+
+
+def cut_segments(coords: np.ndarray, keep_head: bool, within: Optional[float]) -> range:
+    """
+    Returns the segments of a matched line which are searched for the cut, see :func:`cut_part`:
+    the ones reachable from the end which is cut off, so a line passing the same place twice, e.g.
+    a loop or an out & back trip, isn't cut on the wrong pass.
+
+    :param within: the distance in meters along the trace between the cut and the end which is cut
+        off, None to search all segments
+    """
+    count = len(coords) - 1
+    if within is None:
+        return range(count)
+
+    reach = within * CUT_SEARCH_FACTOR + CUT_SEARCH_MARGIN
+    cumulative = np.concatenate(([0.0], np.cumsum(_segment_lengths(coords))))
+    if keep_head:
+        # the tail is cut off: the segments ending within reach of the line's end
+        first = int(np.searchsorted(cumulative[1:], cumulative[-1] - reach, side="left"))
+        return range(min(first, count - 1), count)
+
+    # the head is cut off: the segments starting within reach of the line's start
+    return range(max(1, min(int(np.searchsorted(cumulative, reach, side="right")), count)))
+
+
+def cut_part(
+    part: TracePart, point: Sequence[float], keep_head: bool, within: Optional[float] = None
+) -> TracePart:
+    """
+    Cuts a matched line where it's closest to ``point`` and returns the part before (``keep_head``)
+    or after it. Duration & distance are shared in proportion to the lines' lengths.
+
+    :param within: the distance in meters along the trace between ``point`` and the end which is
+        cut off, which limits where the line is cut, see :func:`cut_segments`
+    """
+    if len(part.coords) < 2:
+        return part
+    idx, projected = locate_point(part.coords, point, cut_segments(part.coords, keep_head, within))
+    if keep_head:
+        coords = np.vstack((part.coords[: idx + 1], projected))
+    else:
+        coords = np.vstack((projected, part.coords[idx + 1 :]))
+
+    total = line_length(part.coords)
+    share = line_length(coords) / total if total else 0.0
+
+    return TracePart(coords, part.duration * share, part.distance * share)
+
+
+def join_parts(head: TracePart, tail: TracePart) -> TracePart:
+    """Joins two consecutive matched lines, e.g. the cut parts of overlapping windows."""
+    return TracePart(
+        np.vstack((head.coords, tail.coords)),
+        head.duration + tail.duration,
+        head.distance + tail.distance,
+    )